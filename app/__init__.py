@@ -29,11 +29,19 @@ def create_app(config_overrides=None):
     if config_overrides:
         app.config.update(config_overrides)
 
+    from app.json_provider import json_provider_class
+
+    app.json = json_provider_class(app.config["JSON_PROVIDER"])(app)
+
     if not os.path.exists(app.config["UPLOAD_FOLDER"]):
         os.makedirs(app.config["UPLOAD_FOLDER"])
 
     CORS(app)
 
+    from app.compression import init_compression
+
+    init_compression(app)
+
     from app.models import db
 
     db.init_app(app)
@@ -48,4 +56,8 @@ def create_app(config_overrides=None):
     app.register_blueprint(auth_bp, url_prefix="/api")
     app.register_blueprint(profiles_bp, url_prefix="/api")
 
+    from app.cli import matches_cli
+
+    app.cli.add_command(matches_cli)
+
     return app
@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class CacheBackend:
+    """
+    Interface of the response caches.
+
+    Values are bytes. Counters live alongside the values and are used as
+    generation numbers: bumping a counter that is part of a cache key
+    invalidates every entry built with the old value.
+    """
+
+    def get(self, key):
+        """Return the bytes stored under a key, or None"""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """Store bytes under a key, for at most `ttl` seconds if given"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def get_counter(self, name):
+        """Return the current value of a counter, 0 if it was never bumped"""
+        raise NotImplementedError
+
+    def incr(self, name):
+        """Bump a counter and return its new value"""
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """Cache that stores nothing, used when caching is disabled"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def get_counter(self, name):
+        return 0
+
+    def incr(self, name):
+        return 0
+
+
+class LocalCache(CacheBackend):
+    """
+    In-process LRU cache bounded by the total size of its keys and values.
+    Entries stored with a TTL are dropped when read after they expire.
+
+    Each process has its own entries and counters, so this backend is only
+    suitable for tests and single-process deployments.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Counters are kept apart so they are never evicted
+        self._counters = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        entry_size = len(key) + len(value)
+        if entry_size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, expires_at)
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(key) + len(entry[0])
+
+    def get_counter(self, name):
+        return self._counters.get(name, 0)
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return self._counters[name]
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache shared by every worker through Redis.
+
+    The byte budget and eviction policy are configured on the Redis server
+    (`maxmemory` with `volatile-lru`); values are written with a TTL and
+    counters without one, so counters are never evicted.
+    """
+
+    def __init__(self, url, prefix="info3180:", ttl=86400):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis cache backend requires the redis package")
+
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._ttl = ttl
+
+    def get(self, key):
+        return self._client.get(self._prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self._prefix + key, value, ex=ttl or self._ttl)
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    def get_counter(self, name):
+        return int(self._client.get(f"{self._prefix}counter:{name}") or 0)
+
+    def incr(self, name):
+        return self._client.incr(f"{self._prefix}counter:{name}")
+
+
+def _create_cache(config):
+    backend = config["CACHE_BACKEND"]
+    if backend == "local":
+        return LocalCache(config["CACHE_MAX_BYTES"])
+    if backend == "redis":
+        return RedisCache(config["CACHE_REDIS_URL"])
+    if backend in (None, "", "null"):
+        return NullCache()
+
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+def get_cache():
+    """
+    Get the cache configured for the current app
+
+    Returns:
+        CacheBackend: Cache instance, shared for the lifetime of the app
+    """
+    extensions = current_app.extensions
+    if "cache" not in extensions:
+        extensions["cache"] = _create_cache(current_app.config)
+
+    return extensions["cache"]
+
+
+def profiles_generation():
+    """Return the generation number of the profiles table"""
+    return get_cache().get_counter("profiles")
+
+
+def bump_profiles_generation():
+    """Invalidate every cache entry derived from the profiles table"""
+    return get_cache().incr("profiles")
+
+
+def favourites_generation(user_id):
+    """Return the generation number of a user's favourites"""
+    return get_cache().get_counter(f"favourites:{user_id}")
+
+
+def bump_favourites_generation(user_id):
+    """Invalidate every cache entry derived from a user's favourites"""
+    return get_cache().incr(f"favourites:{user_id}")
+
+
+def cached_response(body, key=None, ttl=None):
+    """
+    Build a JSON response from cached body bytes
+
+    Args:
+        body (bytes): Cached response body
+        key (str, optional): Cache key of the body. Compressed variants of the
+            response are cached under keys derived from it.
+        ttl (int, optional): Seconds the compressed variants are cached for
+
+    Returns:
+        flask.Response: JSON response
+    """
+    response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+    response.cache_key = key
+    response.cache_ttl = ttl
+
+    return response
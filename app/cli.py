@@ -0,0 +1,56 @@
+import time
+
+import click
+from flask.cli import AppGroup
+
+from app.match_rebuild import rebuild_matches
+from app.matching import backfill_matches
+
+matches_cli = AppGroup("matches", help="Manage the materialized profile matches.")
+
+
+@matches_cli.command("backfill")
+@click.option(
+    "--batch-size",
+    default=500,
+    show_default=True,
+    help="Number of source profiles per transaction.",
+)
+def backfill(batch_size):
+    """Recompute profile_matches for all existing profiles"""
+    written = backfill_matches(batch_size=batch_size, echo=click.echo)
+    click.echo(f"Done: {written} matches written")
+
+
+@matches_cli.command("rebuild")
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Number of worker processes. Defaults to the number of CPUs.",
+)
+@click.option(
+    "--band-size",
+    default=5,
+    show_default=True,
+    help="Number of birth years scored per task.",
+)
+def rebuild(workers, band_size):
+    """Recompute profile_matches for all profiles in parallel"""
+    start = time.perf_counter()
+    stats = rebuild_matches(workers=workers, band_size=band_size, echo=click.echo)
+    elapsed = time.perf_counter() - start
+
+    total_pairs = 0
+    for pid, worker in sorted(stats.items()):
+        total_pairs += worker["pairs"]
+        rate = worker["pairs"] / worker["seconds"] if worker["seconds"] else 0
+        click.echo(
+            f"Worker {pid}: {worker['pairs']} pairs in {worker['seconds']:.2f}s "
+            f"({rate:,.0f} pairs/sec)"
+        )
+
+    click.echo(
+        f"Done: {total_pairs} matches written in {elapsed:.2f}s "
+        f"({total_pairs / elapsed if elapsed else 0:,.0f} pairs/sec overall)"
+    )
@@ -0,0 +1,178 @@
+"""
+Compression of API responses, negotiated with the client's Accept-Encoding.
+
+- "zstd": Zstandard, when the zstandard package is installed
+- "br": Brotli, when the brotli package is installed
+- "gzip": always available
+
+Bodies smaller than COMPRESSION_MIN_SIZE are sent as they are, since the
+framing overhead outweighs the saving. Responses built from a cache entry
+with cached_response() keep their compressed variants in the cache next to
+it, so hot responses are compressed once rather than on every request.
+"""
+
+import gzip
+
+from flask import current_app, request
+
+from app.cache import get_cache
+
+try:
+    import brotli
+except ImportError:  # Only the "br" encoding needs brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Only the "zstd" encoding needs zstandard
+    zstandard = None
+
+# Levels favour speed, since responses are compressed on the request path
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+# Content types worth compressing; images and uploads already are
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/plain"}
+
+
+def _compress_gzip(data):
+    # A fixed mtime keeps the output, and so cached variants, reproducible
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compress_brotli(data):
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def _compress_zstd(data):
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+# Encodings COMPRESSION_ENCODINGS may list
+ENCODINGS = ("zstd", "br", "gzip")
+
+# Encodings available in this environment: Content-Encoding -> compressor
+CODECS = {"gzip": _compress_gzip}
+if brotli is not None:
+    CODECS["br"] = _compress_brotli
+if zstandard is not None:
+    CODECS["zstd"] = _compress_zstd
+
+
+def negotiate_encoding(accept_encodings, preferred):
+    """
+    Choose the content encoding of a response
+
+    Args:
+        accept_encodings (werkzeug.datastructures.Accept): Parsed
+            Accept-Encoding header of the request
+        preferred (iterable): Encodings the server offers, most preferred
+            first. Unavailable ones are skipped.
+
+    Returns:
+        str: The encoding the client rates highest, ties going to the
+            server's preference, or None to send the body as it is
+    """
+    best, best_quality = None, 0
+    for encoding in preferred:
+        if encoding not in CODECS:
+            continue
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+
+    return best
+
+
+def encoded_etag(etag, encoding):
+    """
+    Return the ETag of a response body compressed with an encoding
+
+    A strong ETag names exact bytes, so each encoding needs its own.
+
+    Args:
+        etag (str): Unquoted ETag of the uncompressed body
+        encoding (str): Content encoding
+
+    Returns:
+        str: Unquoted ETag of the compressed body
+    """
+    return f"{etag}-{encoding}"
+
+
+def compress_response(response):
+    """
+    Compress a response body if the client accepts it and it is large enough
+
+    Registered with after_request by init_compression().
+
+    Args:
+        response (flask.Response): Response to send
+
+    Returns:
+        flask.Response: The same response, compressed in place if needed
+    """
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "Content-Encoding" in response.headers
+        or response.status_code in (204, 206, 304)
+        or response.status_code < 200
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if len(response.get_data()) < current_app.config["COMPRESSION_MIN_SIZE"]:
+        return response
+
+    encoding = negotiate_encoding(
+        request.accept_encodings, current_app.config["COMPRESSION_ENCODINGS"]
+    )
+    if encoding is None:
+        return response
+
+    cache_key = getattr(response, "cache_key", None)
+    if cache_key is None:
+        body = CODECS[encoding](response.get_data())
+    else:
+        cache = get_cache()
+        body = cache.get(f"{encoding}:{cache_key}")
+        if body is None:
+            body = CODECS[encoding](response.get_data())
+            cache.set(
+                f"{encoding}:{cache_key}",
+                body,
+                ttl=getattr(response, "cache_ttl", None),
+            )
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(encoded_etag(etag, encoding))
+
+    return response
+
+
+def init_compression(app):
+    """
+    Compress the app's responses as configured with COMPRESSION_ENCODINGS,
+    a comma separated list of ENCODINGS in order of preference, or empty to
+    disable compression. Listed encodings whose package is not installed are
+    skipped.
+
+    Args:
+        app (flask.Flask): App to compress the responses of
+    """
+    encodings = app.config["COMPRESSION_ENCODINGS"]
+    if isinstance(encodings, str):
+        encodings = [name.strip() for name in encodings.split(",") if name.strip()]
+    unknown = [name for name in encodings if name not in ENCODINGS]
+    if unknown:
+        raise ValueError(f"Unknown content encodings: {', '.join(unknown)}")
+    app.config["COMPRESSION_ENCODINGS"] = encodings
+
+    if encodings:
+        app.after_request(compress_response)
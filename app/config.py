@@ -17,3 +17,16 @@ class Config(object):
     JWT_SECRET = os.environ.get("SECRET_KEY", "Som3$ec5etK*yJWT")
     JWT_EXPIRATION = 3600  # Access token expiration: 1 hour
     JWT_REFRESH_EXPIRATION = 2592000  # Refresh token expiration: 30 days
+    MATCH_ENGINE = os.environ.get("MATCH_ENGINE", "sql")  # See app/matching.py
+    NAME_SEARCH = os.environ.get("NAME_SEARCH", "auto")  # See app/search.py
+    TEXT_SEARCH = os.environ.get("TEXT_SEARCH", "auto")  # See app/search.py
+    JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "auto")  # See app/json_provider.py
+    # Response cache: "null" (disabled), "local" (single process) or "redis"
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "null")
+    CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", 60))  # Seconds
+    FACETS_CACHE_TTL = int(os.environ.get("FACETS_CACHE_TTL", 10))  # Seconds
+    # Response compression, see app/compression.py. Empty disables it.
+    COMPRESSION_ENCODINGS = os.environ.get("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))  # Bytes
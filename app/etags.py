@@ -0,0 +1,82 @@
+"""
+Strong ETags for responses about rows that never change.
+
+Profiles and users are not updated or deleted after they are created, so a
+response about one is identified by the row's identity: its ID, plus the
+join time of the user it belongs to, since IDs start over when the database
+is recreated. ETAG_VERSION stands for the response's shape and is bumped
+whenever an unchanged row would serialize differently, such as when a field
+is added.
+
+Routes compare If-None-Match with the ETag built from a query of the
+identity columns alone, and answer 304 Not Modified on a match without
+loading or serializing the row.
+"""
+
+import hashlib
+
+from flask import current_app, request
+
+from app.compression import ENCODINGS, encoded_etag
+
+ETAG_VERSION = 1
+
+
+def row_etag(kind, *identity):
+    """
+    Build the ETag of a response about a row
+
+    Args:
+        kind (str): Kind of response, such as "profile"
+        *identity: Values identifying the row
+
+    Returns:
+        str: Unquoted strong ETag
+    """
+    key = repr((kind, ETAG_VERSION, *identity)).encode()
+
+    return f"{kind}-{hashlib.blake2b(key, digest_size=12).hexdigest()}"
+
+
+def with_etag(response, etag):
+    """
+    Set the ETag of a response, asking clients to revalidate before reuse
+
+    Args:
+        response (flask.Response): Response to send
+        etag (str): Unquoted ETag of the response
+
+    Returns:
+        flask.Response: The same response
+    """
+    response.set_etag(etag)
+    # Responses depend on the requester's token, so only their browser may
+    # keep them, and revalidating costs at most a 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+
+    return response
+
+
+def not_modified(etag):
+    """
+    Answer a conditional request whose copy of the response is current
+
+    Args:
+        etag (str): Unquoted ETag of the current response
+
+    Returns:
+        flask.Response: 304 response if If-None-Match holds the ETag, or the
+            ETag of the response in any content encoding, otherwise None
+    """
+    if not request.if_none_match:
+        return None
+
+    for variant in [etag, *(encoded_etag(etag, encoding) for encoding in ENCODINGS)]:
+        if request.if_none_match.contains_weak(variant):
+            response = with_etag(current_app.response_class(status=304), variant)
+            if current_app.config["COMPRESSION_ENCODINGS"]:
+                response.vary.add("Accept-Encoding")
+            return response
+
+    return None
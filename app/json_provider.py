@@ -0,0 +1,135 @@
+"""
+JSON providers for jsonify() and current_app.json.
+
+- "orjson": encodes with orjson, several times faster than the stdlib on the
+  large match and search arrays
+- "stdlib": Flask's json module based provider, used when orjson is missing
+
+Both write key-sorted UTF-8 and encode dates and times as ISO 8601, so
+responses are byte-for-byte the same whichever provider is used.
+"""
+
+import dataclasses
+import decimal
+import uuid
+from datetime import date, time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Only the "orjson" provider needs orjson
+    orjson = None
+
+
+def _default(o):
+    """Encode the types JSON has no representation for"""
+    if isinstance(o, (date, time)):
+        return o.isoformat()
+
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider, with ISO 8601 dates and unescaped UTF-8"""
+
+    name = "stdlib"
+    default = staticmethod(_default)
+    ensure_ascii = False
+
+
+class OrjsonJSONProvider(StdlibJSONProvider):
+    """
+    Encodes with orjson. Encoding options orjson does not support are handed
+    to the stdlib provider.
+    """
+
+    name = "orjson"
+
+    def __init__(self, app):
+        if orjson is None:
+            raise RuntimeError("The orjson JSON provider requires the orjson package")
+        super().__init__(app)
+
+    def _options(self, indent=None, separators=None, sort_keys=None, **kwargs):
+        """
+        Translate json.dumps() arguments into orjson options
+
+        Returns:
+            int: orjson options, or None if the arguments need the stdlib
+        """
+        # orjson only writes compact separators, or the stdlib's with indent=2
+        if kwargs or indent not in (None, 2):
+            return None
+        if separators is not None and (indent or tuple(separators) != (",", ":")):
+            return None
+
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys if sort_keys is None else sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+
+        return options
+
+    def dumps_bytes(self, obj, **kwargs):
+        """Serialize data as UTF-8 JSON bytes"""
+        options = self._options(**kwargs)
+        if options is None:
+            return super().dumps(obj, **kwargs).encode()
+
+        return orjson.dumps(obj, default=self.default, option=options)
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, **kwargs).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Like DefaultJSONProvider.response(), without decoding the bytes"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = None
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            indent = 2
+
+        return self._app.response_class(
+            self.dumps_bytes(obj, indent=indent) + b"\n", mimetype=self.mimetype
+        )
+
+
+JSON_PROVIDERS = {
+    provider.name: provider for provider in (OrjsonJSONProvider, StdlibJSONProvider)
+}
+
+
+def json_provider_class(name="auto"):
+    """
+    Return the JSON provider class configured with JSON_PROVIDER
+
+    Args:
+        name (str): A key of JSON_PROVIDERS, or "auto" for orjson when it is
+            installed and the stdlib otherwise
+
+    Returns:
+        type: A flask.json.provider.JSONProvider subclass
+    """
+    if name == "auto":
+        return OrjsonJSONProvider if orjson is not None else StdlibJSONProvider
+
+    try:
+        return JSON_PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown JSON provider: {name}")
@@ -0,0 +1,197 @@
+"""
+Offline recomputation of the profile_matches table.
+
+Profiles are partitioned into birth-year bands. Each band is scored in a
+worker process against the profiles of its own and adjacent years, so the
+workers never touch the database: the parent process reads the match
+columns once and bulk-writes the results band by band. Profiles created
+while the rebuild runs are missing from that snapshot, so their matches are
+stored again once every band is written.
+"""
+
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sqlalchemy import delete, insert, select
+
+from app.matching import (
+    BIRTH_YEAR_RANGE,
+    MatchIndex,
+    match_rows_after,
+    materialize_matches,
+)
+from app.models import Profile, ProfileMatch, db
+
+
+def score_band(band_rows, neighbour_rows):
+    """
+    Compute the matches of every profile in a birth-year band
+
+    Runs in a worker process, so it only uses plain tuples.
+
+    Args:
+        band_rows (list): Match rows of the profiles to find matches for
+        neighbour_rows (list): Match rows of every profile born within
+            BIRTH_YEAR_RANGE years of the band, including the band itself
+
+    Returns:
+        tuple: (match rows, worker process ID, seconds spent)
+    """
+    start = time.perf_counter()
+    index = MatchIndex()
+    for profile_id, user_id, birth_year, height, *traits in neighbour_rows:
+        index.add(profile_id, user_id, birth_year, height, traits)
+
+    matches = [
+        (source[0], *hit)
+        for source in band_rows
+        for hit in index.find_matches(source[0])
+    ]
+
+    return matches, os.getpid(), time.perf_counter() - start
+
+
+def birth_year_bands(rows, band_size):
+    """
+    Split match rows into birth-year bands with their scoring neighbours
+
+    Args:
+        rows (list): Match rows of every profile
+        band_size (int): Number of birth years per band
+
+    Returns:
+        list: (band rows, neighbour rows) tuples
+    """
+    by_year = defaultdict(list)
+    for row in rows:
+        by_year[row[2]].append(row)
+
+    if not by_year:
+        return []
+
+    bands = []
+    first_year, last_year = min(by_year), max(by_year)
+    for band_start in range(first_year, last_year + 1, band_size):
+        band_years = range(band_start, band_start + band_size)
+        band_rows = [row for year in band_years for row in by_year.get(year, [])]
+        if not band_rows:
+            continue
+
+        neighbour_rows = [
+            row
+            for year in range(
+                band_start - BIRTH_YEAR_RANGE,
+                band_start + band_size + BIRTH_YEAR_RANGE,
+            )
+            for row in by_year.get(year, [])
+        ]
+        bands.append((band_rows, neighbour_rows))
+
+    return bands
+
+
+def replace_matches(source_ids, matches, chunk_size=500):
+    """
+    Replace the stored matches of some source profiles
+
+    Args:
+        source_ids (list): IDs of the source profiles
+        matches (list): (source ID, *MatchHit) tuples
+        chunk_size (int): Number of IDs per DELETE, to stay below the
+            database's bound parameter limit
+    """
+    for start in range(0, len(source_ids), chunk_size):
+        db.session.execute(
+            delete(ProfileMatch).where(
+                ProfileMatch.source_profile_id.in_(
+                    source_ids[start : start + chunk_size]
+                )
+            )
+        )
+
+    if matches:
+        db.session.execute(
+            insert(ProfileMatch),
+            [
+                {
+                    "source_profile_id": source_id,
+                    "target_profile_id": target_id,
+                    "score": score,
+                    "age_gap": age_gap,
+                    "height_gap": height_gap,
+                }
+                for source_id, target_id, score, age_gap, height_gap in matches
+            ],
+        )
+
+
+def rebuild_matches(workers=None, band_size=5, echo=None):
+    """
+    Recompute profile_matches for every profile using a process pool
+
+    Each band's rows are replaced and committed as soon as its worker
+    finishes, so readers see either the old or the new matches of a profile.
+
+    Args:
+        workers (int, optional): Number of worker processes, CPU count if None
+        band_size (int): Number of birth years scored per task
+        echo (callable, optional): Called with progress and throughput messages
+
+    Returns:
+        dict: Worker process ID -> {"pairs": ..., "seconds": ...}
+    """
+    rows = [tuple(row) for row in match_rows_after(db.session, 0)]
+    bands = birth_year_bands(rows, band_size)
+    stats = defaultdict(lambda: {"pairs": 0, "seconds": 0.0})
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(score_band, band_rows, neighbour_rows): band_rows
+            for band_rows, neighbour_rows in bands
+        }
+        for future in as_completed(futures):
+            matches, pid, seconds = future.result()
+            source_ids = [row[0] for row in futures[future]]
+
+            replace_matches(source_ids, matches)
+            db.session.commit()
+
+            stats[pid]["pairs"] += len(matches)
+            stats[pid]["seconds"] += seconds
+            if echo:
+                echo(
+                    f"Worker {pid}: {len(source_ids)} profiles, "
+                    f"{len(matches)} pairs in {seconds:.2f}s"
+                )
+
+    rematerialize_unscored({row[0] for row in rows}, echo=echo)
+
+    return dict(stats)
+
+
+def rematerialize_unscored(scored_ids, echo=None):
+    """
+    Store again the matches of the profiles missing from a rebuild's snapshot
+
+    Profiles created during a rebuild stored their matches in both
+    directions, but replacing a band's rows dropped the rows pointing at
+    them. Their rows are replaced one profile at a time, under the same
+    locks as profile creation.
+
+    Args:
+        scored_ids (set): IDs of the profiles the rebuild scored
+        echo (callable, optional): Called with a message if any were found
+    """
+    unscored_ids = [
+        profile_id
+        for profile_id in db.session.scalars(select(Profile.id))
+        if profile_id not in scored_ids
+    ]
+    for profile_id in unscored_ids:
+        materialize_matches(db.session.get(Profile, profile_id), replace=True)
+        db.session.commit()
+
+    if echo and unscored_ids:
+        echo(f"{len(unscored_ids)} profiles created during the rebuild rescored")
@@ -0,0 +1,1097 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import and_, case, delete, exists, func, insert, or_, select, tuple_
+from sqlalchemy.orm import aliased
+
+from app.models import Favourite, Profile, ProfileMatch, db
+from app.utils import decode_cursor, encode_cursor
+
+try:
+    import numpy as np
+except ImportError:  # Only the "numpy" match engine needs numpy
+    np = None
+
+# Matching rules shared by every engine
+BIRTH_YEAR_RANGE = 5
+MIN_HEIGHT_DIFF = 3
+MAX_HEIGHT_DIFF = 10
+MIN_COMMON_TRAITS = 3
+DEFAULT_MATCHES_LIMIT = 50
+# First key of the per-birth-year advisory locks of materialize_matches(),
+# any 32-bit constant unique to it
+MATERIALIZE_LOCK_ID = 0x70726F66
+# Seconds an ID skipped by an in-memory engine's sync is looked for again,
+# before its transaction is assumed to have rolled back
+SYNC_GAP_TIMEOUT = 300
+# Most skipped IDs looked for at once; only the newest can still commit
+MAX_SYNC_GAPS = 1000
+# Favourites are compared by lookup ID
+MATCH_FIELDS = (
+    "fav_cuisine_id",
+    "fav_colour_id",
+    "fav_school_subject_id",
+    "political",
+    "religious",
+    "family_oriented",
+)
+
+
+def count_common_traits(source_traits, candidate_traits):
+    """
+    Count how many match fields two profiles have in common
+
+    Args:
+        source_traits (tuple): Values of MATCH_FIELDS for the source profile
+        candidate_traits (tuple): Values of MATCH_FIELDS for the candidate profile
+
+    Returns:
+        int: Number of equal fields
+    """
+    return sum(1 for a, b in zip(source_traits, candidate_traits) if a == b)
+
+
+def profile_traits(profile):
+    """Return the MATCH_FIELDS values of a profile as a tuple"""
+    return tuple(getattr(profile, field) for field in MATCH_FIELDS)
+
+
+def height_in_range(source_height, candidate_height):
+    return MIN_HEIGHT_DIFF <= abs(candidate_height - source_height) <= MAX_HEIGHT_DIFF
+
+
+# A matching profile: its ID, number of common traits and distance from the source
+MatchHit = namedtuple("MatchHit", ["profile_id", "score", "age_gap", "height_gap"])
+
+
+def rank_key(hit):
+    """Sort key ranking by score, then closest age, then closest height"""
+    return (-hit.score, hit.age_gap, hit.height_gap, hit.profile_id)
+
+
+def rank_hits(hits, limit, after=None):
+    """
+    Pick the best ranked hits that come after a cursor position
+
+    Args:
+        hits (iterable): MatchHit tuples in any order
+        limit (int): Maximum number of hits to return
+        after (MatchHit, optional): Last hit of the previous page
+
+    Returns:
+        list: Up to `limit` hits, best first
+    """
+    if after is not None:
+        after_key = rank_key(after)
+        hits = (hit for hit in hits if rank_key(hit) > after_key)
+
+    return heapq.nsmallest(limit, hits, key=rank_key)
+
+
+def encode_match_cursor(hit):
+    """Encode the last hit of a page as an opaque cursor"""
+    return encode_cursor(hit)
+
+
+def decode_match_cursor(cursor):
+    """
+    Decode a cursor created by encode_match_cursor
+
+    Args:
+        cursor (str): Cursor from a previous response
+
+    Returns:
+        MatchHit: Last hit of the previous page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    values = decode_cursor(cursor)
+    if len(values) != len(MatchHit._fields) or not all(
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+        for value in values
+    ):
+        raise ValueError("Invalid cursor")
+
+    return MatchHit(*values)
+
+
+def rank_query(query, profile_id, score, age_gap, height_gap, limit, after=None):
+    """
+    Order a SQL query of hits by rank and seek past a cursor position
+
+    The seek is a keyset predicate rather than an OFFSET, so deep pages cost
+    the same as the first one.
+
+    Args:
+        query (Select): Query selecting the hit columns
+        profile_id, score, age_gap, height_gap: Column expressions of the hit
+        limit (int): Maximum number of rows to return
+        after (MatchHit, optional): Last hit of the previous page
+
+    Returns:
+        Select: The ranked, limited query
+    """
+    if after is not None:
+        query = query.where(
+            or_(
+                score < after.score,
+                and_(
+                    score == after.score,
+                    tuple_(age_gap, height_gap, profile_id)
+                    > tuple_(after.age_gap, after.height_gap, after.profile_id),
+                ),
+            )
+        )
+
+    return query.order_by(score.desc(), age_gap, height_gap, profile_id).limit(limit)
+
+
+def ranked_batch_query(source_id, profile_id, score, age_gap, height_gap, query, limit):
+    """
+    Keep the best `limit` hits per source profile of a multi-source hit query
+
+    Args:
+        source_id, profile_id, score, age_gap, height_gap: Column expressions
+        query (Select): Query selecting the columns above for several sources
+        limit (int): Maximum number of hits per source profile
+
+    Returns:
+        Select: Query of (source_id, *MatchHit) rows
+    """
+    rank = (
+        func.row_number()
+        .over(
+            partition_by=source_id,
+            order_by=(score.desc(), age_gap, height_gap, profile_id),
+        )
+        .label("rank")
+    )
+    ranked = query.add_columns(rank).subquery()
+
+    return select(*list(ranked.c)[:5]).where(ranked.c.rank <= limit)
+
+
+def group_batch_rows(source_profiles, rows):
+    """Group (source_id, *MatchHit) rows by source, keeping their order"""
+    grouped = {source.id: [] for source in source_profiles}
+    for source_id, *hit in rows:
+        grouped[source_id].append(MatchHit(*hit))
+
+    for hits in grouped.values():
+        hits.sort(key=rank_key)
+
+    return grouped
+
+
+def candidate_filters(source_profile, candidate=Profile):
+    """
+    Build the SQL filters for the age, height and owner rules
+
+    Args:
+        source_profile (Profile): Profile to find matches for
+        candidate (Profile, optional): Entity or alias of the candidate rows
+
+    Returns:
+        list: SQLAlchemy filter expressions
+    """
+    return [
+        candidate.birth_year.between(
+            source_profile.birth_year - BIRTH_YEAR_RANGE,
+            source_profile.birth_year + BIRTH_YEAR_RANGE,
+        ),
+        candidate.user_id_fk != source_profile.user_id_fk,
+        # Checked on the rows of the birth year range, which
+        # ix_profiles_birth_year_id serves. A height range would compete with
+        # it for the scan.
+        func.abs(candidate.height - source_profile.height).between(
+            MIN_HEIGHT_DIFF, MAX_HEIGHT_DIFF
+        ),
+    ]
+
+
+def common_traits_expression(source_profile, candidate=Profile):
+    """
+    Build a SQL expression counting the match fields a row shares with a profile
+
+    Args:
+        source_profile (Profile): Profile to compare against
+        candidate (Profile, optional): Entity or alias of the candidate rows
+
+    Returns:
+        ColumnElement: Summed CASE expression, usable in SELECT and WHERE
+    """
+    scores = [
+        case((getattr(candidate, field) == getattr(source_profile, field), 1), else_=0)
+        for field in MATCH_FIELDS
+    ]
+    return sum(scores[1:], scores[0])
+
+
+def ranked_sql_matches(
+    source_profile,
+    limit,
+    after=None,
+    best_per_user=False,
+    exclude_favourites_of=None,
+):
+    """
+    Find one page of matches in SQL, with the optional filters of the endpoint
+
+    Args:
+        source_profile (Profile): Profile to find matches for
+        limit (int): Maximum number of hits to return
+        after (MatchHit, optional): Last hit of the previous page
+        best_per_user (bool): Only keep the best ranked profile of each user
+        exclude_favourites_of (int, optional): ID of a user whose favourited
+            profiles are left out
+
+    Returns:
+        list: Up to `limit` MatchHit tuples
+    """
+    source = aliased(Profile, name="source")
+    candidate = aliased(Profile, name="candidate")
+    columns = (
+        candidate.id,
+        common_traits_expression(source, candidate),
+        func.abs(candidate.birth_year - source.birth_year),
+        func.abs(candidate.height - source.height),
+    )
+
+    filters = [source.id == source_profile.id, columns[1] >= MIN_COMMON_TRAITS]
+    if exclude_favourites_of is not None:
+        # Anti-join served by the unique_favourite (user_id_fk, fav_profile_id_fk)
+        # index, so favourited rows never leave the database
+        filters.append(
+            ~exists().where(
+                Favourite.user_id_fk == exclude_favourites_of,
+                Favourite.fav_profile_id_fk == candidate.id,
+            )
+        )
+
+    query = (
+        select(*columns)
+        .select_from(source)
+        .join(candidate, and_(*candidate_filters(source, candidate)))
+        .where(*filters)
+    )
+
+    if best_per_user:
+        user_rank = (
+            func.row_number()
+            .over(
+                partition_by=candidate.user_id_fk,
+                order_by=(columns[1].desc(), *columns[2:], columns[0]),
+            )
+            .label("user_rank")
+        )
+        ranked = query.add_columns(user_rank).subquery()
+        columns = tuple(ranked.c)[:4]
+        query = select(*columns).where(ranked.c.user_rank == 1)
+
+    return [
+        MatchHit(*row)
+        for row in db.session.execute(rank_query(query, *columns, limit, after))
+    ]
+
+
+def match_rows_after(session, after_id, limit=None, missing=()):
+    """
+    Load the columns used for matching for profiles created after an ID
+
+    Args:
+        session (Session): Database session
+        after_id (int): Exclusive lower bound on the profile ID
+        limit (int, optional): Maximum number of rows to load
+        missing (iterable): IDs below the bound to load as well
+
+    Returns:
+        Result: Rows of (id, user_id_fk, birth_year, height, *MATCH_FIELDS)
+    """
+    missing = list(missing)
+    id_filter = Profile.id > after_id
+    if missing:
+        id_filter = or_(id_filter, Profile.id.in_(missing))
+
+    return session.execute(
+        select(
+            Profile.id,
+            Profile.user_id_fk,
+            Profile.birth_year,
+            Profile.height,
+            *[getattr(Profile, field) for field in MATCH_FIELDS],
+        )
+        .where(id_filter)
+        .order_by(Profile.id)
+        .limit(limit)
+    )
+
+
+class ProfileFeed:
+    """
+    Reads the profiles an in-memory engine has not loaded yet.
+
+    IDs are assigned when rows are inserted, but rows only become visible
+    when their transaction commits, so with several writers a profile can
+    appear after profiles with higher IDs. Besides the highest ID read, the
+    feed keeps the lower IDs it skipped and looks for them again on every
+    read, until they show up or SYNC_GAP_TIMEOUT seconds have passed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.high_water = 0
+        self._gaps = {}  # skipped profile id -> time.monotonic() deadline
+
+    def read(self, session):
+        """
+        Load the profiles committed since the last read
+
+        Args:
+            session (Session): Database session
+
+        Returns:
+            list: Rows of (id, user_id_fk, birth_year, height, *MATCH_FIELDS)
+        """
+        with self._lock:
+            now = time.monotonic()
+            gaps = {
+                profile_id: deadline
+                for profile_id, deadline in self._gaps.items()
+                if deadline > now
+            }
+            rows = match_rows_after(session, self.high_water, missing=gaps).all()
+            for row in rows:
+                if row.id <= self.high_water:
+                    gaps.pop(row.id, None)
+                    continue
+
+                # Only the newest MAX_SYNC_GAPS skipped IDs are kept, so a
+                # large jump in IDs doesn't record every ID it skipped
+                first_gap = max(self.high_water + 1, row.id - MAX_SYNC_GAPS)
+                deadline = now + SYNC_GAP_TIMEOUT
+                gaps.update(dict.fromkeys(range(first_gap, row.id), deadline))
+                self.high_water = row.id
+
+            if len(gaps) > MAX_SYNC_GAPS:
+                gaps = dict(sorted(gaps.items())[-MAX_SYNC_GAPS:])
+            self._gaps = gaps
+
+        return rows
+
+
+class MatchEngine:
+    """
+    Base class for match engines.
+
+    Engines implement `matches`, returning every hit for a source profile.
+    Engines that can rank inside the database also override `ranked_matches`.
+    """
+
+    def matches(self, source_profile):
+        """
+        Find the profiles matching a source profile
+
+        Args:
+            source_profile (Profile): Profile to find matches for
+
+        Returns:
+            list: MatchHit tuples in no particular order
+        """
+        raise NotImplementedError
+
+    def find_matches(self, source_profile):
+        """Return the IDs of the profiles matching a source profile"""
+        return [hit.profile_id for hit in self.matches(source_profile)]
+
+    def ranked_matches(self, source_profile, limit, after=None):
+        """
+        Find one page of matches, best first
+
+        Args:
+            source_profile (Profile): Profile to find matches for
+            limit (int): Maximum number of hits to return
+            after (MatchHit, optional): Last hit of the previous page
+
+        Returns:
+            list: Up to `limit` MatchHit tuples
+        """
+        return rank_hits(self.matches(source_profile), limit, after)
+
+    def batch_matches(self, source_profiles, limit):
+        """
+        Find the best matches of several source profiles at once
+
+        Args:
+            source_profiles (list): Profiles to find matches for
+            limit (int): Maximum number of hits per source profile
+
+        Returns:
+            dict: Source profile ID -> list of MatchHit tuples, best first
+        """
+        return {
+            source.id: self.ranked_matches(source, limit) for source in source_profiles
+        }
+
+    def profile_created(self, profile):
+        """Called after a profile is committed"""
+
+
+class SqlMatchEngine(MatchEngine):
+    """Match engine that scores candidates inside the database on every lookup"""
+
+    def _hit_columns(self, source_profile):
+        return (
+            Profile.id,
+            common_traits_expression(source_profile),
+            func.abs(Profile.birth_year - source_profile.birth_year),
+            func.abs(Profile.height - source_profile.height),
+        )
+
+    def _hits_query(self, source_profile, columns):
+        return select(*columns).where(
+            *candidate_filters(source_profile), columns[1] >= MIN_COMMON_TRAITS
+        )
+
+    def matches(self, source_profile):
+        columns = self._hit_columns(source_profile)
+        return [
+            MatchHit(*row)
+            for row in db.session.execute(self._hits_query(source_profile, columns))
+        ]
+
+    def ranked_matches(self, source_profile, limit, after=None):
+        columns = self._hit_columns(source_profile)
+        query = rank_query(
+            self._hits_query(source_profile, columns), *columns, limit, after
+        )
+        return [MatchHit(*row) for row in db.session.execute(query)]
+
+    def batch_matches(self, source_profiles, limit):
+        # Join the candidates against every source at once, so the union of
+        # the sources' age/height windows is scanned in a single query
+        source = aliased(Profile, name="source")
+        columns = self._hit_columns(source)
+        query = (
+            select(source.id, *columns)
+            .select_from(Profile)
+            .join(
+                source,
+                and_(
+                    source.id.in_([profile.id for profile in source_profiles]),
+                    *candidate_filters(source),
+                ),
+            )
+            .where(columns[1] >= MIN_COMMON_TRAITS)
+        )
+        rows = db.session.execute(ranked_batch_query(source.id, *columns, query, limit))
+        return group_batch_rows(source_profiles, rows)
+
+
+class MaterializedMatchEngine(MatchEngine):
+    """Match engine that reads the profile_matches table"""
+
+    COLUMNS = (
+        ProfileMatch.target_profile_id,
+        ProfileMatch.score,
+        ProfileMatch.age_gap,
+        ProfileMatch.height_gap,
+    )
+
+    def _hits_query(self, source_profile):
+        return select(*self.COLUMNS).where(
+            ProfileMatch.source_profile_id == source_profile.id
+        )
+
+    def matches(self, source_profile):
+        return [
+            MatchHit(*row)
+            for row in db.session.execute(self._hits_query(source_profile))
+        ]
+
+    def ranked_matches(self, source_profile, limit, after=None):
+        query = rank_query(
+            self._hits_query(source_profile), *self.COLUMNS, limit, after
+        )
+        return [MatchHit(*row) for row in db.session.execute(query)]
+
+    def batch_matches(self, source_profiles, limit):
+        query = select(ProfileMatch.source_profile_id, *self.COLUMNS).where(
+            ProfileMatch.source_profile_id.in_(
+                [profile.id for profile in source_profiles]
+            )
+        )
+        rows = db.session.execute(
+            ranked_batch_query(
+                ProfileMatch.source_profile_id, *self.COLUMNS, query, limit
+            )
+        )
+        return group_batch_rows(source_profiles, rows)
+
+
+def _match_row(source_id, hit):
+    return {
+        "source_profile_id": source_id,
+        "target_profile_id": hit.profile_id,
+        "score": hit.score,
+        "age_gap": hit.age_gap,
+        "height_gap": hit.height_gap,
+    }
+
+
+def materialize_locks(dialect_name, birth_year):
+    """
+    Build the statements serializing materialize_matches() across transactions
+
+    Two profiles created concurrently would each miss the other's
+    uncommitted row, so neither would store the pair. On PostgreSQL each
+    transaction takes a transaction-level advisory lock on every birth year
+    of its match window. Profiles that can match are born within
+    BIRTH_YEAR_RANGE years of each other, so their windows share a key and
+    the second transaction waits for the first to commit; its scan, run at
+    READ COMMITTED, then sees the first profile. Profiles too far apart in
+    age to match don't wait on each other. The keys are taken in ascending
+    order, so transactions sharing several of them cannot deadlock. SQLite
+    already serializes writers, since the inserted profile holds the
+    database's write lock.
+
+    Args:
+        dialect_name (str): Name of the database dialect
+        birth_year (int): Birth year of the new profile
+
+    Returns:
+        list: Statements taking the locks, in order, empty if none are needed
+    """
+    if dialect_name != "postgresql":
+        return []
+
+    return [
+        select(func.pg_advisory_xact_lock(MATERIALIZE_LOCK_ID, year))
+        for year in range(
+            birth_year - BIRTH_YEAR_RANGE, birth_year + BIRTH_YEAR_RANGE + 1
+        )
+    ]
+
+
+def materialize_matches(profile, replace=False):
+    """
+    Store the matches of a new profile in profile_matches, in both directions
+
+    Matching is symmetric, so every match of the new profile also gains the
+    new profile as a match. Rows are added to the current transaction; the
+    caller commits them together with the profile, which releases the locks
+    taken here.
+
+    Only needed while the materialized engine is configured; switching to
+    it later starts with rebuilding the table.
+
+    Args:
+        profile (Profile): Newly created, flushed profile
+        replace (bool): Delete the rows already stored for the profile, in
+            both directions, before storing its matches
+    """
+    dialect_name = db.session.get_bind().dialect.name
+    for lock in materialize_locks(dialect_name, profile.birth_year):
+        db.session.execute(lock)
+
+    if replace:
+        db.session.execute(
+            delete(ProfileMatch).where(
+                or_(
+                    ProfileMatch.source_profile_id == profile.id,
+                    ProfileMatch.target_profile_id == profile.id,
+                )
+            )
+        )
+
+    rows = []
+    for hit in SqlMatchEngine().matches(profile):
+        rows.append(_match_row(profile.id, hit))
+        rows.append(_match_row(hit.profile_id, hit._replace(profile_id=profile.id)))
+
+    if rows:
+        db.session.execute(insert(ProfileMatch), rows)
+
+
+def backfill_matches(batch_size=500, echo=None):
+    """
+    Recompute profile_matches for every profile, one batch of sources at a time
+
+    Each batch replaces the rows of its source profiles and is committed on
+    its own, so the command can be interrupted and re-run safely.
+
+    Args:
+        batch_size (int): Number of source profiles per transaction
+        echo (callable, optional): Called with a progress message per batch
+
+    Returns:
+        int: Number of match rows written
+    """
+    engine = SqlMatchEngine()
+    last_id = 0
+    written = 0
+
+    while True:
+        sources = match_rows_after(db.session, last_id, limit=batch_size).all()
+        if not sources:
+            break
+
+        source_ids = [source.id for source in sources]
+        db.session.execute(
+            delete(ProfileMatch).where(ProfileMatch.source_profile_id.in_(source_ids))
+        )
+        rows = [
+            _match_row(source.id, hit)
+            for source in sources
+            for hit in engine.matches(source)
+        ]
+        if rows:
+            db.session.execute(insert(ProfileMatch), rows)
+
+        db.session.commit()
+        written += len(rows)
+        last_id = source_ids[-1]
+        if echo:
+            echo(f"Profiles up to {last_id}: {written} matches written")
+
+    return written
+
+
+class MatchIndex:
+    """
+    In-memory index of the columns used for matching.
+
+    Profiles are bucketed by birth year and each bucket keeps its heights
+    sorted, so a lookup is a bisect-bounded range read over at most
+    2 * BIRTH_YEAR_RANGE + 1 buckets. Profiles cannot be updated or deleted,
+    so the index only ever grows: new rows are added when they are created
+    in this process, and rows created by other processes are picked up by
+    `sync` through a ProfileFeed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # birth_year -> (sorted heights, profile ids)
+        self._profiles = {}  # profile id -> (user_id, birth_year, height, traits)
+        self._feed = ProfileFeed()
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def add(self, profile_id, user_id, birth_year, height, traits):
+        with self._lock:
+            if profile_id in self._profiles:
+                return
+
+            self._profiles[profile_id] = (user_id, birth_year, height, tuple(traits))
+            heights, ids = self._buckets.setdefault(birth_year, ([], []))
+            position = bisect_right(heights, height)
+            heights.insert(position, height)
+            ids.insert(position, profile_id)
+
+    def add_profile(self, profile):
+        self.add(
+            profile.id,
+            profile.user_id_fk,
+            profile.birth_year,
+            profile.height,
+            profile_traits(profile),
+        )
+
+    def sync(self, session):
+        """Load profiles committed since the last sync"""
+        for profile_id, user_id, birth_year, height, *traits in self._feed.read(
+            session
+        ):
+            self.add(profile_id, user_id, birth_year, height, traits)
+
+    def get(self, profile_id):
+        return self._profiles.get(profile_id)
+
+    def find_matches(self, profile_id):
+        """
+        Find the profiles matching an indexed profile
+
+        Args:
+            profile_id (int): ID of the source profile
+
+        Returns:
+            list: MatchHit tuples in no particular order
+        """
+        source = self._profiles.get(profile_id)
+        if source is None:
+            return []
+
+        user_id, birth_year, height, traits = source
+        # add() inserts into the heights and IDs of a bucket one after the
+        # other, so the windows are copied under the lock to keep them paired
+        windows = []
+        with self._lock:
+            for year in range(
+                birth_year - BIRTH_YEAR_RANGE, birth_year + BIRTH_YEAR_RANGE + 1
+            ):
+                bucket = self._buckets.get(year)
+                if not bucket:
+                    continue
+
+                heights, ids = bucket
+                # Both height windows lie inside [height - MAX, height + MAX]
+                start = bisect_left(heights, height - MAX_HEIGHT_DIFF)
+                end = bisect_right(heights, height + MAX_HEIGHT_DIFF)
+                windows.append((year, heights[start:end], ids[start:end]))
+
+        matches = []
+        for year, heights, ids in windows:
+            for candidate_height, candidate_id in zip(heights, ids):
+                if not height_in_range(height, candidate_height):
+                    continue
+
+                candidate_user_id, _, _, candidate_traits = self._profiles[candidate_id]
+                if candidate_user_id == user_id:
+                    continue
+
+                score = count_common_traits(traits, candidate_traits)
+                if score >= MIN_COMMON_TRAITS:
+                    matches.append(
+                        MatchHit(
+                            candidate_id,
+                            score,
+                            abs(year - birth_year),
+                            abs(candidate_height - height),
+                        )
+                    )
+
+        return matches
+
+
+class IndexMatchEngine(MatchEngine):
+    """Match engine backed by a per-process MatchIndex"""
+
+    def __init__(self):
+        self.index = MatchIndex()
+
+    def matches(self, source_profile):
+        self.index.sync(db.session)
+        if self.index.get(source_profile.id) is None:
+            self.index.add_profile(source_profile)
+
+        return self.index.find_matches(source_profile.id)
+
+    def profile_created(self, profile):
+        self.index.add_profile(profile)
+
+
+class ProfileSnapshot:
+    """
+    Columnar, numpy-backed copy of the columns used for matching.
+
+    Profiles are stored in one block of columns per birth year, so a lookup
+    only scores the 2 * BIRTH_YEAR_RANGE + 1 blocks of its age window, one
+    vectorized pass per block. The three boolean match fields are packed
+    into one bitmask per profile and the three categorical favourites are
+    kept as their lookup IDs. Blocks are over-allocated and grown by
+    doubling, which keeps appends amortized O(1) as profiles are created.
+    """
+
+    CATEGORICAL_FIELDS = MATCH_FIELDS[:3]
+    BOOLEAN_FIELDS = MATCH_FIELDS[3:]
+    BOOLEAN_MASK = (1 << len(BOOLEAN_FIELDS)) - 1
+
+    def __init__(self, capacity=1024):
+        if np is None:
+            raise RuntimeError("The numpy match engine requires numpy")
+
+        self._lock = threading.Lock()
+        self._capacity = capacity  # Initial rows of each block
+        self._size = 0
+        self._feed = ProfileFeed()
+        self._blocks = {}  # birth_year -> SnapshotBlock
+        self._positions = {}  # profile id -> (birth_year, row in its block)
+        # Popcount of every possible boolean bitmask
+        self._popcount = np.array(
+            [bin(bits).count("1") for bits in range(self.BOOLEAN_MASK + 1)],
+            dtype=np.int8,
+        )
+
+    def __len__(self):
+        return self._size
+
+    def _pack(self, flags):
+        bits = 0
+        for position, flag in enumerate(flags):
+            if flag:
+                bits |= 1 << position
+
+        return bits
+
+    def add(self, profile_id, user_id, birth_year, height, traits):
+        with self._lock:
+            if profile_id in self._positions:
+                return
+
+            block = self._blocks.get(birth_year)
+            if block is None:
+                block = self._blocks[birth_year] = SnapshotBlock(
+                    self.CATEGORICAL_FIELDS, self._capacity
+                )
+            row = block.append(
+                id=profile_id,
+                user_id=user_id,
+                height=height,
+                flags=self._pack(traits[len(self.CATEGORICAL_FIELDS) :]),
+                **dict(zip(self.CATEGORICAL_FIELDS, traits)),
+            )
+
+            self._positions[profile_id] = (birth_year, row)
+            self._size += 1
+
+    def add_profile(self, profile):
+        self.add(
+            profile.id,
+            profile.user_id_fk,
+            profile.birth_year,
+            profile.height,
+            profile_traits(profile),
+        )
+
+    def sync(self, session):
+        """Load profiles committed since the last sync"""
+        for profile_id, user_id, birth_year, height, *traits in self._feed.read(
+            session
+        ):
+            self.add(profile_id, user_id, birth_year, height, traits)
+
+    def _hits(self, profile_id):
+        """
+        Score the profiles in the age window of a profile in the snapshot
+
+        Returns:
+            tuple: Arrays of the matches' IDs, scores, age gaps and height
+                gaps, or None if the profile is not in the snapshot
+        """
+        position = self._positions.get(profile_id)
+        if position is None:
+            return None
+
+        birth_year, row = position
+        source = {
+            name: column[row]
+            for name, column in self._blocks[birth_year].columns().items()
+        }
+
+        parts = []
+        for year in range(
+            birth_year - BIRTH_YEAR_RANGE, birth_year + BIRTH_YEAR_RANGE + 1
+        ):
+            block = self._blocks.get(year)
+            if block is not None:
+                ids, scores, height_gaps = self._block_hits(block, source)
+                age_gaps = np.full(len(ids), abs(year - birth_year), dtype=np.int16)
+                parts.append((ids, scores, age_gaps, height_gaps))
+
+        if not parts:
+            return None
+
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def _block_hits(self, block, source):
+        """Score the profiles of one birth year against a source profile"""
+        columns = block.columns()
+
+        height_diff = np.abs(columns["height"] - source["height"])
+        in_window = np.flatnonzero(
+            (height_diff >= MIN_HEIGHT_DIFF)
+            & (height_diff <= MAX_HEIGHT_DIFF)
+            & (columns["user_id"] != source["user_id"])
+        )
+
+        # Flags that agree are the zero bits of the XOR
+        scores = self._popcount[
+            ~(columns["flags"][in_window] ^ source["flags"]) & self.BOOLEAN_MASK
+        ].astype(np.int16)
+        for field in self.CATEGORICAL_FIELDS:
+            scores += columns[field][in_window] == source[field]
+
+        matched = scores >= MIN_COMMON_TRAITS
+        rows = in_window[matched]
+        return columns["id"][rows], scores[matched], height_diff[rows]
+
+    def find_matches(self, profile_id):
+        """
+        Find the profiles matching a profile in the snapshot
+
+        Args:
+            profile_id (int): ID of the source profile
+
+        Returns:
+            list: MatchHit tuples in no particular order
+        """
+        hits = self._hits(profile_id)
+        if hits is None:
+            return []
+
+        return list(map(MatchHit, *(column.tolist() for column in hits)))
+
+    def ranked_matches(self, profile_id, limit, after=None):
+        """
+        Find one page of matches of a profile in the snapshot, best first
+
+        Hits are ranked in numpy, so MatchHit tuples are only built for the
+        page rather than for every match in a dense age band.
+
+        Args:
+            profile_id (int): ID of the source profile
+            limit (int): Maximum number of hits to return
+            after (MatchHit, optional): Last hit of the previous page
+
+        Returns:
+            list: Up to `limit` MatchHit tuples
+        """
+        hits = self._hits(profile_id)
+        if hits is None:
+            return []
+
+        ids, scores, age_gaps, height_gaps = hits
+        if after is not None:
+            # rank_key(hit) > rank_key(after), one key column at a time
+            later = (scores < after.score) | (scores == after.score) & (
+                (age_gaps > after.age_gap)
+                | (age_gaps == after.age_gap)
+                & (
+                    (height_gaps > after.height_gap)
+                    | (height_gaps == after.height_gap) & (ids > after.profile_id)
+                )
+            )
+            ids, scores, age_gaps, height_gaps = (
+                column[later] for column in (ids, scores, age_gaps, height_gaps)
+            )
+
+        # Only hits scoring at least the page's lowest score can be on it
+        if len(scores) > limit > 0:
+            lowest = -np.partition(-scores, limit - 1)[limit - 1]
+            kept = scores >= lowest
+            ids, scores, age_gaps, height_gaps = (
+                column[kept] for column in (ids, scores, age_gaps, height_gaps)
+            )
+
+        order = np.lexsort((ids, height_gaps, age_gaps, -scores))[:limit]
+        return list(
+            map(
+                MatchHit,
+                *(
+                    column[order].tolist()
+                    for column in (ids, scores, age_gaps, height_gaps)
+                ),
+            )
+        )
+
+
+class SnapshotBlock:
+    """The columns of the profiles of one birth year in a ProfileSnapshot"""
+
+    def __init__(self, categorical_fields, capacity):
+        self.size = 0
+        self._columns = {
+            "id": np.empty(capacity, dtype=np.int64),
+            "user_id": np.empty(capacity, dtype=np.int64),
+            "height": np.empty(capacity, dtype=np.float64),
+            "flags": np.empty(capacity, dtype=np.uint8),
+            # Lookup IDs, INTEGER columns in the database
+            **{
+                field: np.empty(capacity, dtype=np.int32)
+                for field in categorical_fields
+            },
+        }
+
+    def _grow(self):
+        for name, column in self._columns.items():
+            grown = np.empty(len(column) * 2, dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            self._columns[name] = grown
+
+    def append(self, **values):
+        """
+        Add a profile's values to the end of the columns
+
+        Returns:
+            int: Row of the profile in the block
+        """
+        if self.size == len(self._columns["id"]):
+            self._grow()
+
+        row = self.size
+        for name, value in values.items():
+            self._columns[name][row] = value
+        self.size += 1
+
+        return row
+
+    def columns(self):
+        """Return views of the filled part of every column, by name"""
+        size = self.size
+        return {name: column[:size] for name, column in self._columns.items()}
+
+
+class NumpyMatchEngine(MatchEngine):
+    """Match engine backed by a per-process ProfileSnapshot"""
+
+    def __init__(self):
+        self.snapshot = ProfileSnapshot()
+
+    def matches(self, source_profile):
+        self.snapshot.sync(db.session)
+        self.snapshot.add_profile(source_profile)
+
+        return self.snapshot.find_matches(source_profile.id)
+
+    def ranked_matches(self, source_profile, limit, after=None):
+        self.snapshot.sync(db.session)
+        self.snapshot.add_profile(source_profile)
+
+        return self.snapshot.ranked_matches(source_profile.id, limit, after)
+
+    def profile_created(self, profile):
+        self.snapshot.add_profile(profile)
+
+
+MATCH_ENGINES = {
+    "sql": SqlMatchEngine,
+    "index": IndexMatchEngine,
+    "numpy": NumpyMatchEngine,
+    "materialized": MaterializedMatchEngine,
+}
+
+
+def _engines():
+    return current_app.extensions.setdefault("match_engines", {})
+
+
+def get_match_engine(name=None):
+    """
+    Get the match engine configured for the current app
+
+    Args:
+        name (str, optional): Engine to use instead of MATCH_ENGINE
+
+    Returns:
+        object: Match engine instance, shared for the lifetime of the app
+    """
+    name = name or current_app.config["MATCH_ENGINE"]
+    engines = _engines()
+    if name not in engines:
+        try:
+            engines[name] = MATCH_ENGINES[name]()
+        except KeyError:
+            raise ValueError(f"Unknown match engine: {name}")
+
+    return engines[name]
+
+
+def profile_created(profile):
+    """Notify every match engine in use that a profile was committed"""
+    for engine in _engines().values():
+        engine.profile_created(profile)
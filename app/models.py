@@ -1,10 +1,22 @@
+import threading
+import time
 from datetime import datetime, timezone
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
+from sqlalchemy.sql import operators
 from werkzeug.security import generate_password_hash, check_password_hash
 
-
 db = SQLAlchemy()
 
+# Seconds a value missing from a lookup table is remembered as missing, so
+# filters on unknown values do not reload the table on every request
+LOOKUP_MISS_TTL = 60
+# Most missing values remembered per lookup table
+MAX_LOOKUP_MISSES = 1024
+
 
 class User(db.Model):
     __tablename__ = "users"
@@ -44,25 +56,348 @@ class User(db.Model):
         }
 
 
+class LookupMixin:
+    """
+    Dictionary of the distinct values of a categorical profile column.
+
+    Profiles store the integer ID of their value instead of the value
+    itself, so indexes, filters and match comparisons work on integers.
+    Values are never changed or deleted. Profiles may add any value, so the
+    IDs are full integers rather than small ones that could run out.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+
+
+class Sex(LookupMixin, db.Model):
+    __tablename__ = "sexes"
+
+    value = db.Column(db.String(20), unique=True, nullable=False)
+
+
+class Race(LookupMixin, db.Model):
+    __tablename__ = "races"
+
+    value = db.Column(db.String(100), unique=True, nullable=False)
+
+
+class Parish(LookupMixin, db.Model):
+    __tablename__ = "parishes"
+
+    value = db.Column(db.String(100), unique=True, nullable=False)
+
+
+class Cuisine(LookupMixin, db.Model):
+    __tablename__ = "cuisines"
+
+    value = db.Column(db.String(100), unique=True, nullable=False)
+
+
+class Colour(LookupMixin, db.Model):
+    __tablename__ = "colours"
+
+    value = db.Column(db.String(50), unique=True, nullable=False)
+
+
+class SchoolSubject(LookupMixin, db.Model):
+    __tablename__ = "school_subjects"
+
+    value = db.Column(db.String(100), unique=True, nullable=False)
+
+
+class Lookups:
+    """
+    In-memory copy of the lookup tables, mapping values to IDs and back.
+
+    Lookup rows never change, so cached entries cannot go stale; a miss
+    reloads the table, and a value still missing afterwards is remembered
+    as such for LOOKUP_MISS_TTL seconds. New values are inserted in the
+    caller's transaction and only cached once it has ended, so a rollback
+    cannot leave an ID in the cache that does not exist.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}  # lookup model -> {value: ID}
+        self._values = {}  # lookup model -> {ID: value}
+        self._misses = {}  # lookup model -> {value: time.monotonic() deadline}
+
+    def _load(self, lookup):
+        """Reload a lookup table, returning its rows including uncommitted ones"""
+        rows = db.session.execute(select(lookup.id, lookup.value)).all()
+        created = db.session.info.get("created_lookups", set())
+        committed = [row for row in rows if (lookup, row.id) not in created]
+        with self._lock:
+            self._ids[lookup] = {value: lookup_id for lookup_id, value in committed}
+            self._values[lookup] = {lookup_id: value for lookup_id, value in committed}
+
+        return rows
+
+    def _insert(self, lookup, value):
+        """Insert a value unless another transaction already has"""
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            statement = postgresql.insert(lookup).on_conflict_do_nothing()
+        elif dialect == "sqlite":
+            statement = sqlite.insert(lookup).on_conflict_do_nothing()
+        else:
+            statement = insert(lookup)
+
+        return db.session.execute(statement.values(value=value)).rowcount == 1
+
+    def id(self, lookup, value, create=False):
+        """
+        Encode a value as its lookup ID
+
+        Args:
+            lookup (LookupMixin): Lookup model of the column
+            value (str): Value to encode
+            create (bool): Insert the value if it is not in the table yet
+
+        Returns:
+            int: ID of the value, None if it is unknown and not created
+        """
+        if value is None:
+            return None
+
+        lookup_id = self._ids.get(lookup, {}).get(value)
+        if lookup_id is not None:
+            return lookup_id
+
+        misses = self._misses.setdefault(lookup, {})
+        if not create and misses.get(value, 0) > time.monotonic():
+            return None
+
+        ids = {row.value: row.id for row in self._load(lookup)}
+        if create and value not in ids:
+            if self._insert(lookup, value):
+                created_id = db.session.scalar(
+                    select(lookup.id).where(lookup.value == value)
+                )
+                db.session.info.setdefault("created_lookups", set()).add(
+                    (lookup, created_id)
+                )
+            ids = {row.value: row.id for row in self._load(lookup)}
+        lookup_id = ids.get(value)
+
+        with self._lock:
+            if lookup_id is not None:
+                misses.pop(value, None)
+            elif not create:
+                if len(misses) >= MAX_LOOKUP_MISSES:
+                    misses.clear()
+                misses[value] = time.monotonic() + LOOKUP_MISS_TTL
+
+        return lookup_id
+
+    def cached_id(self, lookup, value):
+        """
+        Encode a value as its lookup ID from memory alone
+
+        Args:
+            lookup (LookupMixin): Lookup model of the column
+            value (str): Value to encode
+
+        Returns:
+            int: ID of the value, None if it is not cached
+        """
+        return self._ids.get(lookup, {}).get(value)
+
+    def value(self, lookup, lookup_id):
+        """
+        Decode a lookup ID as its value
+
+        Args:
+            lookup (LookupMixin): Lookup model of the column
+            lookup_id (int): ID to decode
+
+        Returns:
+            str: The value, None if the ID is None
+        """
+        if lookup_id is None:
+            return None
+
+        value = self._values.get(lookup, {}).get(lookup_id)
+        if value is None:
+            value = {row.id: row.value for row in self._load(lookup)}[lookup_id]
+
+        return value
+
+
+@event.listens_for(db.session, "after_transaction_end")
+def _forget_created_lookups(session, transaction):
+    # Values created in the transaction are committed or gone now; either
+    # way the next cache miss reads their real state
+    if transaction.parent is None:
+        session.info.pop("created_lookups", None)
+
+
+def get_lookups():
+    """
+    Get the lookup table cache of the current app
+
+    Returns:
+        Lookups: Cache shared for the lifetime of the app
+    """
+    return current_app.extensions.setdefault("lookups", Lookups())
+
+
+class LookupComparator(Comparator):
+    """
+    Query expression of a lookup property
+
+    Selecting the property reads the value from its lookup table. Equality
+    and IN comparisons are made on the ID column, against the IDs of the
+    compared values, so they can use the column's indexes.
+    """
+
+    def __init__(self, lookup, id_column):
+        super().__init__(
+            select(lookup.value)
+            .where(lookup.id == id_column)
+            .correlate_except(lookup)
+            .scalar_subquery()
+        )
+        self.lookup = lookup
+        self.id_column = id_column
+
+    def _ids_of(self, values):
+        return select(self.lookup.id).where(self.lookup.value.in_(values))
+
+    def operate(self, op, *other, **kwargs):
+        # A value missing from the lookup table equals no row's ID
+        if op is operators.eq and other[0] is not None:
+            op, other = operators.in_op, ([other[0]],)
+        elif op is operators.ne and other[0] is not None:
+            op, other = operators.not_in_op, ([other[0]],)
+
+        if op in (operators.in_op, operators.not_in_op):
+            return op(self.id_column, self._ids_of(other[0]))
+        if op in (operators.eq, operators.ne):
+            return op(self.id_column, None)
+
+        return op(self.expression, *other, **kwargs)
+
+
+def lookup_property(lookup, id_column):
+    """
+    Expose a lookup ID column of a model as its value
+
+    Reading the property decodes the ID. Assigning a value stores its ID if
+    it is cached, and otherwise keeps the value until the next flush, which
+    looks up its ID and adds it to the lookup table if needed, so assigning
+    never queries the database. In queries the property is a
+    LookupComparator, so `Profile.sex == "Female"` filters on sex_id.
+
+    Args:
+        lookup (LookupMixin): Lookup model of the column
+        id_column (str): Name of the ID column
+
+    Returns:
+        hybrid_property: Value property
+    """
+
+    def get_value(self):
+        pending = self.__dict__.get("_pending_lookups", {})
+        if id_column in pending:
+            return pending[id_column][1]
+
+        return get_lookups().value(lookup, getattr(self, id_column))
+
+    def set_value(self, value):
+        pending = self.__dict__.setdefault("_pending_lookups", {})
+        lookup_id = get_lookups().cached_id(lookup, value)
+        if value is None or lookup_id is not None:
+            pending.pop(id_column, None)
+            setattr(self, id_column, lookup_id)
+        else:
+            pending[id_column] = (lookup, value)
+
+    def comparator(cls):
+        return LookupComparator(lookup, getattr(cls, id_column))
+
+    return hybrid_property(get_value, set_value, custom_comparator=comparator)
+
+
+@event.listens_for(db.session, "before_flush")
+def _encode_pending_lookups(session, flush_context, instances):
+    # Values assigned to lookup properties get their IDs, creating lookup
+    # rows in the flushing transaction for new values
+    for instance in [*session.new, *session.dirty]:
+        pending = instance.__dict__.pop("_pending_lookups", None)
+        for id_column, (lookup, value) in (pending or {}).items():
+            setattr(instance, id_column, get_lookups().id(lookup, value, create=True))
+
+
+def encode_lookup_fields(values):
+    """
+    Replace the lookup fields of profile column values with their IDs, for
+    bulk inserts that bypass the Profile constructor
+
+    Args:
+        values (dict): Profile column values, with lookup fields as values
+
+    Returns:
+        dict: Column values with "<field>_id" keys for lookup fields
+    """
+    lookups = get_lookups()
+    return {
+        (f"{field}_id" if field in Profile.LOOKUP_FIELDS else field): (
+            lookups.id(Profile.LOOKUP_FIELDS[field], value, create=True)
+            if field in Profile.LOOKUP_FIELDS
+            else value
+        )
+        for field, value in values.items()
+    }
+
+
 class Profile(db.Model):
     __tablename__ = "profiles"
+    __table_args__ = (
+        db.Index("ix_profiles_user_id_fk", "user_id_fk"),
+        db.Index("ix_profiles_sex_race_birth_year", "sex_id", "race_id", "birth_year"),
+        # Serve the age and height search sorts in index order, and the birth
+        # year window of the match query
+        db.Index("ix_profiles_birth_year_id", "birth_year", "id"),
+        db.Index("ix_profiles_height_id", "height", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id_fk = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     description = db.Column(db.String(255), nullable=False)
-    parish = db.Column(db.String(100), nullable=False)
+    parish_id = db.Column(db.Integer, db.ForeignKey("parishes.id"), nullable=False)
     biography = db.Column(db.Text, nullable=False)
-    sex = db.Column(db.String(20), nullable=False)
-    race = db.Column(db.String(100), nullable=False)
+    sex_id = db.Column(db.Integer, db.ForeignKey("sexes.id"), nullable=False)
+    race_id = db.Column(db.Integer, db.ForeignKey("races.id"), nullable=False)
     birth_year = db.Column(db.Integer, nullable=False)
     height = db.Column(db.Float, nullable=False)
-    fav_cuisine = db.Column(db.String(100), nullable=False)
-    fav_colour = db.Column(db.String(50), nullable=False)
-    fav_school_subject = db.Column(db.String(100), nullable=False)
+    fav_cuisine_id = db.Column(db.Integer, db.ForeignKey("cuisines.id"), nullable=False)
+    fav_colour_id = db.Column(db.Integer, db.ForeignKey("colours.id"), nullable=False)
+    fav_school_subject_id = db.Column(
+        db.Integer, db.ForeignKey("school_subjects.id"), nullable=False
+    )
     political = db.Column(db.Boolean, nullable=False)
     religious = db.Column(db.Boolean, nullable=False)
     family_oriented = db.Column(db.Boolean, nullable=False)
 
+    # Categorical fields stored as lookup IDs: field -> lookup model. The
+    # ID column of a field is named "<field>_id".
+    LOOKUP_FIELDS = {
+        "sex": Sex,
+        "race": Race,
+        "parish": Parish,
+        "fav_cuisine": Cuisine,
+        "fav_colour": Colour,
+        "fav_school_subject": SchoolSubject,
+    }
+
+    sex = lookup_property(Sex, "sex_id")
+    race = lookup_property(Race, "race_id")
+    parish = lookup_property(Parish, "parish_id")
+    fav_cuisine = lookup_property(Cuisine, "fav_cuisine_id")
+    fav_colour = lookup_property(Colour, "fav_colour_id")
+    fav_school_subject = lookup_property(SchoolSubject, "fav_school_subject_id")
+
     def __init__(
         self,
         user_id_fk,
@@ -95,23 +430,42 @@ class Profile(db.Model):
         self.religious = religious
         self.family_oriented = family_oriented
 
-    def to_dict(self):
+    # Keys of to_dict(), in order
+    DICT_FIELDS = (
+        "id",
+        "user_id",
+        "description",
+        "parish",
+        "biography",
+        "sex",
+        "race",
+        "birth_year",
+        "height",
+        "fav_cuisine",
+        "fav_colour",
+        "fav_school_subject",
+        "political",
+        "religious",
+        "family_oriented",
+    )
+
+    def to_dict(self, fields=None):
+        """
+        Convert the profile to a dictionary
+
+        Args:
+            fields (iterable, optional): Keys to include, all DICT_FIELDS by
+                default. Only these attributes are read, so columns deferred
+                with load_only() stay unloaded. Lookup fields are decoded to
+                their values.
+
+        Returns:
+            dict: Profile values
+        """
         return {
-            "id": self.id,
-            "user_id": self.user_id_fk,
-            "description": self.description,
-            "parish": self.parish,
-            "biography": self.biography,
-            "sex": self.sex,
-            "race": self.race,
-            "birth_year": self.birth_year,
-            "height": self.height,
-            "fav_cuisine": self.fav_cuisine,
-            "fav_colour": self.fav_colour,
-            "fav_school_subject": self.fav_school_subject,
-            "political": self.political,
-            "religious": self.religious,
-            "family_oriented": self.family_oriented,
+            field: getattr(self, "user_id_fk" if field == "user_id" else field)
+            for field in (self.DICT_FIELDS if fields is None else fields)
+            if field in self.DICT_FIELDS
         }
 
     def calculate_age(self):
@@ -129,9 +483,11 @@ class Favourite(db.Model):
     )
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
 
-    # Define a unique constraint to prevent duplicate favorites
+    # Define a unique constraint to prevent duplicate favorites. Its index
+    # also serves lookups by user_id_fk.
     __table_args__ = (
         db.UniqueConstraint("user_id_fk", "fav_profile_id_fk", name="unique_favourite"),
+        db.Index("ix_favourites_fav_profile_id_fk", "fav_profile_id_fk"),
     )
 
     # Relationship to get the favorited user's details
@@ -152,3 +508,38 @@ class Favourite(db.Model):
             "fav_profile_id": self.fav_profile_id_fk,
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
+
+
+class ProfileMatch(db.Model):
+    __tablename__ = "profile_matches"
+
+    # The primary key doubles as the index for lookups by source profile
+    source_profile_id = db.Column(
+        db.Integer, db.ForeignKey("profiles.id"), primary_key=True
+    )
+    target_profile_id = db.Column(
+        db.Integer, db.ForeignKey("profiles.id"), primary_key=True
+    )
+    score = db.Column(db.SmallInteger, nullable=False)
+    age_gap = db.Column(db.SmallInteger, nullable=False)
+    height_gap = db.Column(db.Float, nullable=False)
+
+    def __init__(
+        self, source_profile_id, target_profile_id, score, age_gap, height_gap
+    ):
+        self.source_profile_id = source_profile_id
+        self.target_profile_id = target_profile_id
+        self.score = score
+        self.age_gap = age_gap
+        self.height_gap = height_gap
+
+
+# Serves ranked, keyset-paginated match pages for a source profile
+db.Index(
+    "ix_profile_matches_rank",
+    ProfileMatch.source_profile_id,
+    ProfileMatch.score.desc(),
+    ProfileMatch.age_gap,
+    ProfileMatch.height_gap,
+    ProfileMatch.target_profile_id,
+)
@@ -1,22 +1,58 @@
+import json
 import os
 from flask import Blueprint, current_app, jsonify, request, g, send_from_directory
-from sqlalchemy import desc, func, select
+from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 from marshmallow import ValidationError
+from app.cache import (
+    bump_favourites_generation,
+    bump_profiles_generation,
+    cached_response,
+    favourites_generation,
+    get_cache,
+    profiles_generation,
+)
+from app.etags import not_modified, row_etag, with_etag
+from app.matching import (
+    DEFAULT_MATCHES_LIMIT,
+    decode_match_cursor,
+    encode_match_cursor,
+    get_match_engine,
+    materialize_matches,
+    profile_created,
+    ranked_sql_matches,
+)
 from app.models import Favourite, Profile, User, db
+from app.search import (
+    FACETS,
+    RELEVANCE,
+    SEARCH_SORTS,
+    decode_facet,
+    decode_search_cursor,
+    encode_search_cursor,
+    estimate_count,
+    facet_counts,
+    get_text_search,
+    search_filters,
+    sort_search,
+)
+from app.serializers import USER_FIELDS, profile_reader, profile_serializer
 from app.utils import generate_response, token_required, has_profile_required
 from app.schemas import (
     CreateProfileDto,
     FavouriteRequestSchema,
-    ProfileSchema,
     SearchRequestSchema,
     UserSchema,
     FavouriteSchema,
-    ProfileWithUserSchema,
+    MatchesRequestSchema,
+    BatchMatchesRequestSchema,
+    ProfilesRequestSchema,
 )
 
 profiles_bp = Blueprint("profiles", __name__)
 
+MAX_PROFILES_PER_USER = 3
+
 
 @profiles_bp.route("/uploads/<filename>", methods=["GET"])
 def get_upload(filename):
@@ -37,44 +73,41 @@ def handle_profiles():
         return create_profile()
 
 
-def get_self_profiles():
-    user_id = g.current_user.id
-
-    # Use eager loading to fetch the user relationship in a single query
-    profiles = db.session.scalars(
-        select(Profile)
-        .options(joinedload(Profile.user))
-        .where(Profile.user_id_fk == user_id)
+def get_self_profiles(profile_fields=None):
+    reader = profile_reader(profile_fields)
+    rows = db.session.execute(
+        reader.select().where(Profile.user_id_fk == g.current_user.id)
     ).all()
 
-    # Use ProfileWithUserSchema to include user data in the response
-    profile_schema = ProfileWithUserSchema()
-    return [
-        profile_schema.dump(
-            {
-                **profile.to_dict(),
-                "user": {
-                    "id": profile.user.id,
-                    "name": profile.user.name,
-                    "photo": profile.user.photo,
-                },
-            }
-        )
-        for profile in profiles
-    ]
+    return reader.serialize(rows)
 
 
 def get_profiles():
     """
     Get all profiles for authenticated user
+
+    `fields` restricts the returned profile fields, e.g. `fields=id,parish,user`.
     """
-    return jsonify(generate_response(data=get_self_profiles()))
+    schema = ProfilesRequestSchema()
+    try:
+        params = schema.load({"fields": request.args.get("fields")})
+    except ValidationError as err:
+        return (
+            jsonify(
+                generate_response(
+                    success=False, message="Validation error", errors=err.messages
+                )
+            ),
+            400,
+        )
+
+    return jsonify(generate_response(data=get_self_profiles(params["profile_fields"])))
 
 
 def create_profile():
     user_id = g.current_user.id
 
-    if len(get_self_profiles()) == 3:
+    if len(get_self_profiles()) == MAX_PROFILES_PER_USER:
         return (
             jsonify(
                 generate_response(
@@ -95,24 +128,20 @@ def create_profile():
 
         profile = Profile(user_id_fk=user_id, **data)
         db.session.add(profile)
+        db.session.flush()
+        # Only the materialized engine reads the stored matches
+        if current_app.config["MATCH_ENGINE"] == "materialized":
+            materialize_matches(profile)
         db.session.commit()
+        profile_created(profile)
+        bump_profiles_generation()
 
         # Fetch the profile with user data and return it
         created_profile = (
             db.session.query(Profile).options(joinedload(Profile.user)).get(profile.id)
         )
 
-        profile_schema = ProfileWithUserSchema()
-        profile_data = profile_schema.dump(
-            {
-                **created_profile.to_dict(),
-                "user": {
-                    "id": created_profile.user.id,
-                    "name": created_profile.user.name,
-                    "photo": created_profile.user.photo,
-                },
-            }
-        )
+        profile_data = profile_serializer()(created_profile)
 
         return (
             jsonify(generate_response(data=profile_data)),
@@ -132,6 +161,19 @@ def create_profile():
 @profiles_bp.route("/profiles/<profile_id>", methods=["GET"])
 @token_required
 def get_profiles_detail(profile_id):
+    # Profiles never change, so a client holding the current ETag is answered
+    # from the identity columns, without loading the biography or serializing
+    if request.if_none_match:
+        identity = db.session.execute(
+            select(Profile.id, User.id, User.date_joined)
+            .join_from(Profile, User)
+            .where(Profile.id == profile_id)
+        ).first()
+        if identity is not None:
+            response = not_modified(row_etag("profile", *identity))
+            if response is not None:
+                return response
+
     # Use joinedload to fetch the profile with its related user in a single query
     profile = (
         db.session.query(Profile).options(joinedload(Profile.user)).get(profile_id)
@@ -148,20 +190,10 @@ def get_profiles_detail(profile_id):
             404,
         )
 
-    # Use marshmallow schema to serialize the profile with user data
-    profile_schema = ProfileWithUserSchema()
-    profile_data = profile_schema.dump(
-        {
-            **profile.to_dict(),
-            "user": {
-                "id": profile.user.id,
-                "name": profile.user.name,
-                "photo": profile.user.photo,
-            },
-        }
-    )
+    profile_data = profile_serializer()(profile)
+    etag = row_etag("profile", profile.id, profile.user.id, profile.user.date_joined)
 
-    return jsonify(generate_response(data=profile_data))
+    return with_etag(jsonify(generate_response(data=profile_data)), etag)
 
 
 @profiles_bp.route("/profiles/favourite", methods=["POST"])
@@ -188,6 +220,7 @@ def add_favourite():
     )
     db.session.add(new_fav)
     db.session.commit()
+    bump_favourites_generation(g.current_user.id)
     return (
         jsonify(generate_response(data=new_fav.to_dict())),
         201,
@@ -223,12 +256,97 @@ def remove_favourite(fav_id):
 
     db.session.delete(fav)
     db.session.commit()
+    bump_favourites_generation(g.current_user.id)
     return (
         jsonify(generate_response(data={"message": "Favourite deleted successfully"})),
         200,
     )
 
 
+@profiles_bp.route("/profiles/matches", methods=["GET"])
+@token_required
+@has_profile_required
+def get_batch_profile_matches():
+    """
+    Finds the best matches for several of the current user's profiles at once.
+
+    `profile_ids` is a comma separated list of owned profile IDs and defaults
+    to all of them; `limit` caps the matches returned per profile and `fields`
+    restricts the returned profile fields. The candidates for every profile
+    are found in a single query.
+    """
+    profile_ids = request.args.get("profile_ids")
+    schema = BatchMatchesRequestSchema()
+    try:
+        params = schema.load(
+            {
+                "profile_ids": profile_ids.split(",") if profile_ids else None,
+                "limit": request.args.get("limit"),
+                "fields": request.args.get("fields"),
+            }
+        )
+    except ValidationError as err:
+        return (
+            jsonify(
+                generate_response(
+                    success=False, message="Validation error", errors=err.messages
+                )
+            ),
+            400,
+        )
+
+    # has_profile_required already loaded the user's profiles
+    owned_profiles = {profile.id: profile for profile in g.current_user.profiles}
+    # Repeated IDs are answered once, in the order first requested
+    requested_ids = list(dict.fromkeys(params["profile_ids"] or owned_profiles))
+    not_owned = [
+        profile_id for profile_id in requested_ids if profile_id not in owned_profiles
+    ]
+    if not_owned:
+        return (
+            jsonify(
+                generate_response(
+                    success=False,
+                    errors={
+                        "error": "Forbidden: You do not own profiles "
+                        + ", ".join(str(profile_id) for profile_id in not_owned)
+                    },
+                )
+            ),
+            403,
+        )
+
+    source_profiles = [owned_profiles[profile_id] for profile_id in requested_ids]
+    limit = params["limit"] or DEFAULT_MATCHES_LIMIT
+    hits_by_source = get_match_engine().batch_matches(source_profiles, limit)
+
+    # Fetch every matched profile in a single query
+    reader = profile_reader(params["profile_fields"])
+    match_ids = {hit.profile_id for hits in hits_by_source.values() for hit in hits}
+    rows_by_id = (
+        {
+            row.id: row
+            for row in db.session.execute(
+                reader.select().where(Profile.id.in_(match_ids))
+            )
+        }
+        if match_ids
+        else {}
+    )
+
+    result = [
+        {
+            "profile_id": source.id,
+            "matches": reader.serialize(
+                [rows_by_id[hit.profile_id] for hit in hits_by_source[source.id]]
+            ),
+        }
+        for source in source_profiles
+    ]
+
+    return jsonify(generate_response(data=result, meta={"limit": limit})), 200
+
+
 @profiles_bp.route("/profiles/matches/<profile_id>", methods=["GET"])
 @token_required
 @has_profile_required
@@ -241,7 +359,47 @@ def get_profile_matches(profile_id):
     3. Height difference between 3 and 10 inches (inclusive).
     4. Match on at least 3 of: fav_cuisine, fav_colour, fav_school_subject,
        political, religious, family_oriented.
+
+    Matches are ranked by the number of common fields, then by closeness in
+    age and height, and paginated with `limit` and an opaque `cursor`.
+    `fields` restricts the returned profile fields.
+    `best_per_user=true` keeps only the best ranked profile of each user and
+    `exclude_favourited=true` leaves out profiles the current user has already
+    favourited.
     """
+    schema = MatchesRequestSchema()
+    try:
+        params = schema.load(
+            {
+                "limit": request.args.get("limit"),
+                "cursor": request.args.get("cursor"),
+                "best_per_user": request.args.get("best_per_user"),
+                "exclude_favourited": request.args.get("exclude_favourited"),
+                "fields": request.args.get("fields"),
+            }
+        )
+        after = decode_match_cursor(params["cursor"]) if params["cursor"] else None
+    except ValidationError as err:
+        return (
+            jsonify(
+                generate_response(
+                    success=False, message="Validation error", errors=err.messages
+                )
+            ),
+            400,
+        )
+    except ValueError:
+        return (
+            jsonify(
+                generate_response(
+                    success=False,
+                    message="Validation error",
+                    errors={"cursor": ["Invalid cursor"]},
+                )
+            ),
+            400,
+        )
+
     source_profile = db.session.get(Profile, profile_id)
 
     if not source_profile:
@@ -266,79 +424,102 @@ def get_profile_matches(profile_id):
             403,
         )
 
-    # Requirement 1: Age Range (+/- 5 years) -> Calculate birth year range
-    min_birth_year = source_profile.birth_year - 5
-    max_birth_year = source_profile.birth_year + 5
-
-    # Requirement 3: Height Range (absolute difference 3-10 inches)
-    source_height = source_profile.height
-
-    # Requirement 4: Fields to compare for commonality
-    match_fields = [
-        "fav_cuisine",
-        "fav_colour",
-        "fav_school_subject",
-        "political",
-        "religious",
-        "family_oriented",
-    ]
-
-    # Use eager loading to fetch user data in a single query
-    potential_matches_query = Profile.query.options(joinedload(Profile.user))
-
-    potential_matches_query = potential_matches_query.filter(
-        Profile.birth_year.between(min_birth_year, max_birth_year)
-    )
-
-    potential_matches_query = potential_matches_query.filter(
-        Profile.user_id_fk != source_profile.user_id_fk
+    limit = params["limit"] or DEFAULT_MATCHES_LIMIT
+    options = {
+        "best_per_user": bool(params["best_per_user"]),
+        "exclude_favourites_of": (
+            g.current_user.id if params["exclude_favourited"] else None
+        ),
+    }
+    cache = get_cache()
+    cache_key = ":".join(
+        [
+            "matches",
+            current_app.config["MATCH_ENGINE"],
+            str(source_profile.id),
+            str(profiles_generation()),
+            str(limit),
+            params["cursor"] or "",
+            "best-per-user" if options["best_per_user"] else "",
+            (
+                f"no-favourites-{favourites_generation(g.current_user.id)}"
+                if params["exclude_favourited"]
+                else ""
+            ),
+            ",".join(params["profile_fields"] or ()),
+        ]
     )
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached_response(cached, cache_key), 200
+
+    # Fetch one extra hit to know whether there is a next page. The filtering
+    # options need joins, so they always run in SQL whatever the engine.
+    if any(options.values()):
+        hits = ranked_sql_matches(source_profile, limit + 1, after, **options)
+    else:
+        hits = get_match_engine().ranked_matches(source_profile, limit + 1, after)
+    next_cursor = encode_match_cursor(hits[limit - 1]) if len(hits) > limit else None
+    hits = hits[:limit]
 
-    potential_matches_query = potential_matches_query.filter(
-        func.abs(Profile.height - source_height).between(3, 10)
+    # Fetch the matched profiles with their user data in a single query
+    reader = profile_reader(params["profile_fields"])
+    rows_by_id = (
+        {
+            row.id: row
+            for row in db.session.execute(
+                reader.select().where(Profile.id.in_([hit.profile_id for hit in hits]))
+            )
+        }
+        if hits
+        else {}
     )
 
-    candidate_profiles = potential_matches_query.all()
-
-    final_matches = []
-    for candidate in candidate_profiles:
-        match_count = 0
-        for field in match_fields:
-            if getattr(source_profile, field) == getattr(candidate, field):
-                match_count += 1
-
-        if match_count >= 3:
-            final_matches.append(candidate)
-
-    # Transform the results into the expected format
-    detailed_results = []
-    for profile in final_matches:
-        profile_dict = profile.to_dict()
-        user_info = profile.user.to_dict()
-        profile_dict["user"] = {
-            "name": user_info.get("name"),
-            "photo": user_info.get("photo"),
-            "id": user_info.get("id"),
-        }
-        detailed_results.append(profile_dict)
+    # Serialize the results, keeping the rank order
+    result = reader.serialize([rows_by_id[hit.profile_id] for hit in hits])
 
-    # Use the schema to validate and serialize the data
-    schema = ProfileWithUserSchema(many=True)
-    result = schema.dump(detailed_results)
+    body = jsonify(
+        generate_response(
+            data=result, meta={"limit": limit, "next_cursor": next_cursor}
+        )
+    ).get_data()
+    cache.set(cache_key, body)
 
-    return jsonify(data=result), 200
+    # Served as a cache hit would be, so compressed variants are cached too
+    return cached_response(body, cache_key), 200
 
 
 @profiles_bp.route("/search", methods=["GET"])
 @token_required
 def search_profiles():
-    """Search profiles by name, birth year, sex, race or combination"""
+    """
+    Search profiles by name, birth year, age, height, sex, race, free text or
+    combination
+
+    `q` matches the words of profile descriptions and biographies through a
+    full-text index. `min_age`/`max_age` and `min_height`/`max_height` are
+    inclusive ranges. Results are ordered by `sort` (relevance with `q`,
+    profile ID otherwise; newest, youngest or shortest first on request) and,
+    when `limit` is given, paginated with the opaque `cursor` returned in the
+    meta. With `count=true` the meta also carries a cheap estimate of the
+    total number of results. `fields` restricts the returned profile fields.
+    """
     # Get query parameters
     query_params = {
         "name": request.args.get("name"),
         "birth_year": request.args.get("birth_year"),
         "sex": request.args.get("sex"),
         "race": request.args.get("race"),
+        "min_age": request.args.get("min_age"),
+        "max_age": request.args.get("max_age"),
+        "min_height": request.args.get("min_height"),
+        "max_height": request.args.get("max_height"),
+        "q": request.args.get("q"),
+        "limit": request.args.get("limit"),
+        "cursor": request.args.get("cursor"),
+        "sort": request.args.get("sort"),
+        "count": request.args.get("count"),
+        "fields": request.args.get("fields"),
     }
 
     # Convert birth_year to int if it exists
@@ -361,6 +542,14 @@ def search_profiles():
     schema = SearchRequestSchema()
     try:
         validated_params = schema.load(query_params)
+        sort = validated_params.get("sort") or (
+            "relevance" if validated_params.get("q") else "id"
+        )
+        after = (
+            decode_search_cursor(sort, validated_params["cursor"])
+            if validated_params.get("cursor")
+            else None
+        )
     except ValidationError as err:
         return (
             jsonify(
@@ -370,52 +559,222 @@ def search_profiles():
             ),
             400,
         )
+    except ValueError:
+        return (
+            jsonify(
+                generate_response(
+                    success=False,
+                    message="Validation error",
+                    errors={"cursor": ["Invalid cursor"]},
+                )
+            ),
+            400,
+        )
 
-    # Build query filters
-    query = Profile.query.join(User).options(
-        joinedload(Profile.user)
-    )  # Eager load user data
-    filters = []
+    # Build query filters. The requester's own profiles are removed after the
+    # cache lookup, so cached results are shared between users. Rows carry
+    # their sort key, to build the cursors.
+    profile_fields = validated_params.get("profile_fields")
+    reader = profile_reader(
+        profile_fields,
+        [col.key for col in SEARCH_SORTS[sort].columns if col is not RELEVANCE],
+    )
+    query = reader.select(join_user=True).where(*search_filters(validated_params))
+    limit = validated_params.get("limit")
+
+    # Names are matched case-insensitively, so they are normalized in the key
+    cache_params = {
+        key: value
+        for key, value in validated_params.items()
+        if value is not None and key != "count"
+    }
+    if "name" in cache_params:
+        cache_params["name"] = cache_params["name"].lower()
+    cache = get_cache()
+    cache_key = "search:{}:{}".format(
+        profiles_generation(), json.dumps(cache_params, sort_keys=True)
+    )
 
-    if validated_params.get("name"):
-        filters.append(User.name.ilike(f"%{validated_params['name']}%"))
-    if validated_params.get("birth_year"):
-        filters.append(Profile.birth_year == validated_params["birth_year"])
-    if validated_params.get("sex"):
-        filters.append(Profile.sex == validated_params["sex"])
-    if validated_params.get("race"):
-        filters.append(Profile.race == validated_params["race"])
+    cached = cache.get(cache_key)
+    if cached is not None:
+        cache.incr("search:hits")
+        rows = current_app.json.loads(cached)
+    else:
+        cache.incr("search:misses")
+        # A user owns at most MAX_PROFILES_PER_USER profiles, so fetching that
+        # many extra rows still leaves a full page, plus one row to know
+        # whether there is a next page, once the requester's are removed
+        relevance = None
+        if sort == "relevance":
+            # Ranking filters by the text query too, so it is not applied twice
+            ranked_query, relevance = get_text_search().rank(
+                reader.select(join_user=True).where(
+                    *search_filters(validated_params, text=False)
+                ),
+                validated_params["q"],
+            )
+            ranked_query = ranked_query.add_columns(relevance.label("relevance"))
+        else:
+            ranked_query = query
+        results = db.session.execute(
+            sort_search(
+                ranked_query,
+                sort,
+                limit + 1 + MAX_PROFILES_PER_USER if limit else None,
+                after,
+                relevance,
+            )
+        ).all()
+
+        # Rows are cached with their owner and the cursor pointing after them,
+        # since neither is necessarily part of the requested fields
+        rows = [
+            [
+                result.user_id_fk,
+                (
+                    encode_search_cursor(
+                        sort,
+                        result,
+                        result.relevance if relevance is not None else None,
+                    )
+                    if limit
+                    else None
+                ),
+                row,
+            ]
+            for result, row in zip(results, reader.serialize(results))
+        ]
+        cache.set(
+            cache_key,
+            current_app.json.dumps(rows).encode(),
+            ttl=current_app.config["SEARCH_CACHE_TTL"],
+        )
 
-    filters.append(Profile.user_id_fk != g.current_user.id)
+    rows = [row for row in rows if row[0] != g.current_user.id]
+    profile_data = [row for _, _, row in rows]
 
-    # Apply filters and execute query
-    q = query.filter(*filters)
+    meta = {"limit": limit, "sort": sort, "next_cursor": None}
+    if limit and len(profile_data) > limit:
+        profile_data = profile_data[:limit]
+        meta["next_cursor"] = rows[limit - 1][1]
 
-    if validated_params.get("limit"):
-        q = q.limit(validated_params["limit"])
+    message = f"Found {len(profile_data)} matching profiles"
+    if validated_params.get("count"):
+        total, exact = estimate_count(
+            query.with_only_columns(Profile.id).where(
+                Profile.user_id_fk != g.current_user.id
+            )
+        )
+        meta["total_estimate"] = total
+        meta["total_exact"] = exact
+        message = f"{'Found' if exact else 'About'} {total} matching profiles"
 
-    results = q.all()
+    return jsonify(generate_response(data=profile_data, message=message, meta=meta))
 
-    # Use marshmallow schema to serialize the results with user data
-    profile_schema = ProfileWithUserSchema(many=True)
-    profile_data = profile_schema.dump(
-        [
-            {
-                **profile.to_dict(),
-                "user": {
-                    "id": profile.user.id,
-                    "name": profile.user.name,
-                    "photo": profile.user.photo,
-                },
+
+@profiles_bp.route("/search/facets", methods=["GET"])
+@token_required
+def get_search_facets():
+    """
+    Count the profiles matching the search filters per sex, race, parish and
+    birth decade, excluding the current user's own profiles
+    """
+    schema = SearchRequestSchema(
+        only=(
+            "name",
+            "birth_year",
+            "sex",
+            "race",
+            "min_age",
+            "max_age",
+            "min_height",
+            "max_height",
+            "q",
+        )
+    )
+    try:
+        params = schema.load(
+            {field: request.args.get(field) for field in schema.fields}
+        )
+    except ValidationError as err:
+        return (
+            jsonify(
+                generate_response(
+                    success=False, message="Validation error", errors=err.messages
+                )
+            ),
+            400,
+        )
+
+    filters = search_filters(params)
+
+    # Counts are cached for every user; the requester's own profiles are
+    # subtracted afterwards
+    cache_params = {key: value for key, value in params.items() if value is not None}
+    if "name" in cache_params:
+        cache_params["name"] = cache_params["name"].lower()
+    cache = get_cache()
+    cache_key = "facets:{}:{}".format(
+        profiles_generation(), json.dumps(cache_params, sort_keys=True)
+    )
+
+    cached = cache.get(cache_key)
+    if cached is not None:
+        counts = current_app.json.loads(cached)
+    else:
+        counts = {
+            facet: list(values.items())
+            for facet, values in facet_counts(filters).items()
+        }
+        cache.set(
+            cache_key,
+            current_app.json.dumps(counts).encode(),
+            ttl=current_app.config["FACETS_CACHE_TTL"],
+        )
+
+    counts = {facet: dict(values) for facet, values in counts.items()}
+    own_profiles = db.session.execute(
+        select(*[expression.label(facet) for facet, expression in FACETS.items()])
+        .select_from(Profile)
+        .join(User)
+        .where(*filters, Profile.user_id_fk == g.current_user.id)
+    )
+    for row in own_profiles:
+        for facet, value in row._mapping.items():
+            counts[facet][decode_facet(facet, value)] -= 1
+
+    return jsonify(
+        generate_response(
+            data={
+                facet: [
+                    {"value": value, "count": count}
+                    for value, count in sorted(
+                        values.items(), key=lambda item: (-item[1], item[0])
+                    )
+                    if count > 0
+                ]
+                for facet, values in counts.items()
             }
-            for profile in results
-        ]
+        )
     )
 
+
+@profiles_bp.route("/search/cache", methods=["GET"])
+@token_required
+def get_search_cache_stats():
+    """Get the hit and miss counters of the search result cache"""
+    cache = get_cache()
+    hits = cache.get_counter("search:hits")
+    misses = cache.get_counter("search:misses")
+
     return jsonify(
         generate_response(
-            data=profile_data,
-            message=f"Found {len(results)} matching profiles",
+            data={
+                "backend": current_app.config["CACHE_BACKEND"],
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else None,
+            }
         )
     )
 
@@ -424,6 +783,16 @@ def search_profiles():
 @token_required
 def get_user(user_id):
     """Get details of a specific user"""
+    # Users never change either, see get_profiles_detail()
+    if request.if_none_match:
+        identity = db.session.execute(
+            select(User.id, User.date_joined).where(User.id == user_id)
+        ).first()
+        if identity is not None:
+            response = not_modified(row_etag("user", *identity))
+            if response is not None:
+                return response
+
     user = db.session.scalars(select(User).where(User.id == user_id)).first()
 
     if not user:
@@ -441,7 +810,7 @@ def get_user(user_id):
     user_schema = UserSchema()
     user_data = user_schema.dump(user)
 
-    return jsonify(
+    response = jsonify(
         generate_response(
             data={
                 "name": user_data["name"],
@@ -453,6 +822,8 @@ def get_user(user_id):
         )
     )
 
+    return with_etag(response, row_etag("user", user.id, user.date_joined))
+
 
 @profiles_bp.route("/users/favourites", methods=["GET"])
 @token_required
@@ -489,27 +860,21 @@ def get_top_favourites(threshold):
     # Get top favoured profiles with count
     fav_profiles = db.session.scalars(
         select(Favourite)
-        .options(joinedload(Favourite.favourited_profile))
+        .options(joinedload(Favourite.favourited_profile).joinedload(Profile.user))
         .where(Favourite.user_id_fk == user_id)
         .limit(threshold)
     ).all()
 
-    # Use the schema to validate and serialize the data
-    schema = ProfileSchema(many=True)
+    # Each profile is returned at the top level and again with its user
+    serialize = profile_serializer(user_fields=USER_FIELDS + ("username",))
     result = []
-
-    for profile in fav_profiles:
-        profile_dict = profile.favourited_profile.to_dict()
-        profile_user_dict = profile.favourited_profile.user.to_dict()
-        profile_dict["profile"] = {
-            **profile.favourited_profile.to_dict(),
-            "user": {
-                "name": profile_user_dict.get("name"),
-                "photo": profile_user_dict.get("photo"),
-                "id": profile_user_dict.get("id"),
-                "username": profile_user_dict.get("username"),
-            },
-        }
-        result.append(profile_dict)
+    for favourite in fav_profiles:
+        profile_data = serialize(favourite.favourited_profile)
+        result.append(
+            {
+                **{key: value for key, value in profile_data.items() if key != "user"},
+                "profile": profile_data,
+            }
+        )
 
     return jsonify(generate_response(data=result))
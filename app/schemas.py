@@ -1,5 +1,13 @@
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import (
+    Schema,
+    fields,
+    validate,
+    validates,
+    validates_schema,
+    ValidationError,
+)
 from datetime import datetime, timezone
+from app.search import SEARCH_SORTS
 
 
 class UserSchema(Schema):
@@ -121,6 +129,26 @@ class ProfileWithUserSchema(Schema):
     user = fields.Nested(UserInfoSchema)
 
 
+# Fields of ProfileWithUserSchema that clients can select with `fields=`
+PROFILE_FIELDS = tuple(ProfileWithUserSchema._declared_fields)
+
+
+class ProfileFields(fields.Field):
+    """Comma separated list of PROFILE_FIELDS, deserialized to a tuple"""
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if not isinstance(value, str):
+            raise ValidationError("Must be a comma separated list of fields")
+
+        names = tuple(dict.fromkeys(name.strip() for name in value.split(",")))
+        unknown = [name for name in names if name not in PROFILE_FIELDS]
+        if unknown:
+            raise ValidationError(f"Unknown fields: {', '.join(unknown)}")
+
+        # The ID is always returned, it identifies the profile
+        return ("id",) + tuple(name for name in names if name != "id")
+
+
 # Request schemas
 class RegistrationRequestSchema(Schema):
     """Schema for registration request"""
@@ -152,4 +180,56 @@ class SearchRequestSchema(Schema):
     birth_year = fields.Int(allow_none=True)
     sex = fields.Str(allow_none=True)
     race = fields.Str(allow_none=True)
-    limit = fields.Int(allow_none=True)
+    min_age = fields.Int(allow_none=True, validate=validate.Range(min=0, max=150))
+    max_age = fields.Int(allow_none=True, validate=validate.Range(min=0, max=150))
+    min_height = fields.Float(allow_none=True, validate=validate.Range(min=0, max=300))
+    max_height = fields.Float(allow_none=True, validate=validate.Range(min=0, max=300))
+    q = fields.Str(allow_none=True, validate=validate.Length(max=200))
+    limit = fields.Int(allow_none=True, validate=validate.Range(min=1, max=100))
+    cursor = fields.Str(allow_none=True)
+    sort = fields.Str(allow_none=True, validate=validate.OneOf(list(SEARCH_SORTS)))
+    count = fields.Bool(allow_none=True)
+    profile_fields = ProfileFields(allow_none=True, data_key="fields")
+
+    @validates_schema
+    def _validate_sort(self, data, **kwargs):
+        """Relevance is only defined for text queries"""
+        if data.get("sort") == "relevance" and not data.get("q"):
+            raise ValidationError("Sorting by relevance requires q", "sort")
+
+    @validates_schema
+    def _validate_ranges(self, data, **kwargs):
+        """Range bounds must not be reversed"""
+        for low, high in (("min_age", "max_age"), ("min_height", "max_height")):
+            if (
+                data.get(low) is not None
+                and data.get(high) is not None
+                and data[low] > data[high]
+            ):
+                raise ValidationError(f"Must not exceed {high}", low)
+
+
+class MatchesRequestSchema(Schema):
+    """Schema for profile matches query parameters"""
+
+    limit = fields.Int(allow_none=True, validate=validate.Range(min=1, max=100))
+    cursor = fields.Str(allow_none=True)
+    best_per_user = fields.Bool(allow_none=True)
+    exclude_favourited = fields.Bool(allow_none=True)
+    profile_fields = ProfileFields(allow_none=True, data_key="fields")
+
+
+class ProfilesRequestSchema(Schema):
+    """Schema for the query parameters of the current user's profiles"""
+
+    profile_fields = ProfileFields(allow_none=True, data_key="fields")
+
+
+class BatchMatchesRequestSchema(Schema):
+    """Schema for batch profile matches query parameters"""
+
+    profile_ids = fields.List(
+        fields.Int(), allow_none=True, validate=validate.Length(min=1, max=3)
+    )
+    limit = fields.Int(allow_none=True, validate=validate.Range(min=1, max=100))
+    profile_fields = ProfileFields(allow_none=True, data_key="fields")
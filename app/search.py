@@ -0,0 +1,634 @@
+"""
+Name and text search backends, sort orders, count estimates and facets for
+the search endpoints.
+
+A plain `ILIKE '%name%'` cannot use a B-tree index, so every search scans
+the users table. The backends here answer the same substring query from a
+trigram index instead:
+
+- "trigram": PostgreSQL, a pg_trgm GIN index that serves ILIKE directly
+- "fts5": SQLite, an FTS5 trigram shadow table kept in sync by triggers
+- "like": the unindexed ILIKE, used when neither is available
+
+Free text queries over profile descriptions and biographies are ranked by
+relevance through a full-text index in the same way:
+
+- "tsvector": PostgreSQL, a GIN index on the profiles' English tsvector
+- "fts5": SQLite, an FTS5 shadow table ranked with bm25()
+- "like": unranked ILIKE on both columns
+"""
+
+import re
+import sqlite3
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import (
+    DDL,
+    Double,
+    Integer,
+    cast,
+    column,
+    event,
+    false,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+    tuple_,
+    union_all,
+)
+
+from app.models import Profile, Race, Sex, User, db, get_lookups
+from app.utils import decode_cursor, encode_cursor
+
+# Trigram indexes cannot match fewer than three characters
+MIN_TRIGRAM_LENGTH = 3
+
+PG_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_name_trgm "
+    "ON users USING gin (name gin_trgm_ops)",
+]
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_name_fts USING fts5("
+    "name, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_name_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_name_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_name_fts_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_name_fts(users_name_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_name_fts_au AFTER UPDATE OF name ON users "
+    "BEGIN "
+    "INSERT INTO users_name_fts(users_name_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); "
+    "INSERT INTO users_name_fts(rowid, name) VALUES (new.id, new.name); END",
+]
+
+users_name_fts = table("users_name_fts", column("rowid"), column("users_name_fts"))
+
+
+def _sqlite_has_trigram(ddl, target, bind, **kw):
+    # The trigram tokenizer was added in SQLite 3.34
+    return sqlite3.sqlite_version_info >= (3, 34)
+
+
+# Create the search structures together with the users table, so databases
+# built with db.create_all() get them too. Migrations create them otherwise.
+for statement in PG_TRGM_DDL:
+    event.listen(
+        User.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql")
+    )
+for statement in SQLITE_FTS_DDL:
+    event.listen(
+        User.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="sqlite", callable_=_sqlite_has_trigram),
+    )
+
+
+class NameSearch:
+    """Unindexed substring search, available on every database"""
+
+    name = "like"
+
+    def filter(self, name):
+        """
+        Build the SQL filter for users whose name contains a string
+
+        Args:
+            name (str): Case-insensitive substring to look for
+
+        Returns:
+            ColumnElement: Filter expression on the users table
+        """
+        return User.name.ilike(f"%{name}%")
+
+
+class TrigramNameSearch(NameSearch):
+    """
+    PostgreSQL search served by the ix_users_name_trgm GIN index.
+
+    pg_trgm indexes ILIKE patterns themselves, so the filter is unchanged;
+    the planner picks the index once it exists.
+    """
+
+    name = "trigram"
+
+
+class Fts5NameSearch(NameSearch):
+    """SQLite search through the users_name_fts trigram table"""
+
+    name = "fts5"
+
+    def filter(self, name):
+        if len(name) < MIN_TRIGRAM_LENGTH:
+            return super().filter(name)
+
+        # Quoted as a single FTS5 string, which the trigram tokenizer matches
+        # as a case-insensitive substring
+        phrase = '"{}"'.format(name.replace('"', '""'))
+        return User.id.in_(
+            select(users_name_fts.c.rowid).where(
+                users_name_fts.c.users_name_fts.match(phrase)
+            )
+        )
+
+
+NAME_SEARCH_BACKENDS = {
+    backend.name: backend for backend in (NameSearch, TrigramNameSearch, Fts5NameSearch)
+}
+
+
+def _sqlite_table_exists(name):
+    with db.engine.connect() as connection:
+        return (
+            connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+            ).first()
+            is not None
+        )
+
+
+def _detect_backend():
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        return TrigramNameSearch
+    if dialect == "sqlite" and _sqlite_table_exists("users_name_fts"):
+        return Fts5NameSearch
+
+    return NameSearch
+
+
+def get_name_search():
+    """
+    Get the name search backend of the current app
+
+    NAME_SEARCH selects a backend by name; "auto" uses the best one the
+    database supports.
+
+    Returns:
+        NameSearch: Backend instance, shared for the lifetime of the app
+    """
+    extensions = current_app.extensions
+    if "name_search" not in extensions:
+        name = current_app.config["NAME_SEARCH"]
+        if name == "auto":
+            backend = _detect_backend()
+        else:
+            try:
+                backend = NAME_SEARCH_BACKENDS[name]
+            except KeyError:
+                raise ValueError(f"Unknown name search backend: {name}")
+        extensions["name_search"] = backend()
+
+    return extensions["name_search"]
+
+
+PG_TEXT_SEARCH_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_profiles_text_search ON profiles "
+    "USING gin (to_tsvector('english', description || ' ' || biography))",
+]
+
+SQLITE_TEXT_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS profiles_text_fts USING fts5("
+    "description, biography, content='profiles', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS profiles_text_fts_ai AFTER INSERT ON profiles "
+    "BEGIN "
+    "INSERT INTO profiles_text_fts(rowid, description, biography) "
+    "VALUES (new.id, new.description, new.biography); END",
+    "CREATE TRIGGER IF NOT EXISTS profiles_text_fts_ad AFTER DELETE ON profiles "
+    "BEGIN "
+    "INSERT INTO profiles_text_fts(profiles_text_fts, rowid, description, biography) "
+    "VALUES ('delete', old.id, old.description, old.biography); END",
+    "CREATE TRIGGER IF NOT EXISTS profiles_text_fts_au "
+    "AFTER UPDATE OF description, biography ON profiles BEGIN "
+    "INSERT INTO profiles_text_fts(profiles_text_fts, rowid, description, biography) "
+    "VALUES ('delete', old.id, old.description, old.biography); "
+    "INSERT INTO profiles_text_fts(rowid, description, biography) "
+    "VALUES (new.id, new.description, new.biography); END",
+]
+
+profiles_text_fts = table(
+    "profiles_text_fts", column("rowid"), column("rank"), column("profiles_text_fts")
+)
+
+for statement in PG_TEXT_SEARCH_DDL:
+    event.listen(
+        Profile.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+for statement in SQLITE_TEXT_FTS_DDL:
+    event.listen(
+        Profile.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+
+
+class TextSearch:
+    """Unindexed, unranked text search, available on every database"""
+
+    name = "like"
+
+    def filter(self, text):
+        """
+        Build the SQL filter for profiles whose description or biography
+        matches a text query
+
+        Args:
+            text (str): Text query
+
+        Returns:
+            ColumnElement: Filter expression on the profiles table
+        """
+        pattern = f"%{text}%"
+        return or_(Profile.description.ilike(pattern), Profile.biography.ilike(pattern))
+
+    def rank(self, query, text):
+        """
+        Restrict a query of profiles to the matches of a text query and rank
+        them
+
+        Args:
+            query (Select): Query of profiles, not filtered with filter()
+            text (str): Text query
+
+        Returns:
+            tuple: (query, relevance expression), where higher relevance
+                values are more relevant
+        """
+        return query.where(self.filter(text)), literal_column("0.0", Double)
+
+
+class TsvectorTextSearch(TextSearch):
+    """
+    PostgreSQL search served by the ix_profiles_text_search GIN index.
+
+    The document expression must stay identical to the indexed one, or the
+    planner cannot use the index.
+    """
+
+    name = "tsvector"
+
+    document = func.to_tsvector(
+        literal_column("'english'"),
+        Profile.description.op("||")(literal_column("' '")).op("||")(Profile.biography),
+    )
+
+    def _query(self, text):
+        return func.websearch_to_tsquery(literal_column("'english'"), text)
+
+    def filter(self, text):
+        return self.document.op("@@")(self._query(text))
+
+    def rank(self, query, text):
+        # ts_rank() is a real; as a double its exact value survives the round
+        # trip through a cursor
+        return query.where(self.filter(text)), cast(
+            func.ts_rank(self.document, self._query(text)), Double
+        )
+
+
+class Fts5TextSearch(TextSearch):
+    """SQLite search through the profiles_text_fts table, ranked with bm25()"""
+
+    name = "fts5"
+
+    def _match(self, text):
+        # Every word is quoted, so FTS5 query syntax in user input is taken
+        # literally, and all of them must match
+        words = re.findall(r"\w+", text)
+        if not words:
+            return None
+        return profiles_text_fts.c.profiles_text_fts.match(
+            " ".join(f'"{word}"' for word in words)
+        )
+
+    def filter(self, text):
+        match = self._match(text)
+        if match is None:
+            return false()
+        return Profile.id.in_(select(profiles_text_fts.c.rowid).where(match))
+
+    def rank(self, query, text):
+        match = self._match(text)
+        if match is None:
+            return super().rank(query, text)
+
+        # FTS5 only computes rank, its bm25() score where lower is better,
+        # while scanning a MATCH, so the matches are ranked in one pass and
+        # joined rather than looked up per profile. The join is the filter.
+        matches = (
+            select(
+                profiles_text_fts.c.rowid.label("profile_id"),
+                (-profiles_text_fts.c.rank).label("relevance"),
+            )
+            .where(match)
+            .subquery("text_matches")
+        )
+        return (
+            query.join(matches, matches.c.profile_id == Profile.id),
+            matches.c.relevance,
+        )
+
+
+TEXT_SEARCH_BACKENDS = {
+    backend.name: backend
+    for backend in (TextSearch, TsvectorTextSearch, Fts5TextSearch)
+}
+
+
+def _detect_text_backend():
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        return TsvectorTextSearch
+    if dialect == "sqlite" and _sqlite_table_exists("profiles_text_fts"):
+        return Fts5TextSearch
+
+    return TextSearch
+
+
+def get_text_search():
+    """
+    Get the text search backend of the current app
+
+    TEXT_SEARCH selects a backend by name; "auto" uses the best one the
+    database supports.
+
+    Returns:
+        TextSearch: Backend instance, shared for the lifetime of the app
+    """
+    extensions = current_app.extensions
+    if "text_search" not in extensions:
+        name = current_app.config["TEXT_SEARCH"]
+        if name == "auto":
+            backend = _detect_text_backend()
+        else:
+            try:
+                backend = TEXT_SEARCH_BACKENDS[name]
+            except KeyError:
+                raise ValueError(f"Unknown text search backend: {name}")
+        extensions["text_search"] = backend()
+
+    return extensions["text_search"]
+
+
+# Sort orders of search results. Every order ends with the profile ID, so the
+# sort key is unique and can be used as a keyset cursor. Column sorts are
+# served in order by the (column, id) indexes of the profiles table, so pages
+# are read from the index rather than sorted.
+SearchSort = namedtuple("SearchSort", ["columns", "descending"])
+
+# Placeholder for the relevance of a text query, which depends on the query
+RELEVANCE = literal_column("relevance", Double)
+
+SEARCH_SORTS = {
+    "id": SearchSort((Profile.id,), False),
+    "newest": SearchSort((Profile.id,), True),
+    # Youngest first
+    "age": SearchSort((Profile.birth_year, Profile.id), True),
+    # Shortest first
+    "height": SearchSort((Profile.height, Profile.id), False),
+    "relevance": SearchSort((RELEVANCE, Profile.id), True),
+}
+
+# Counts stop at this many rows when no planner estimate is available
+SEARCH_COUNT_CAP = 1000
+
+
+def sort_search(query, sort_name, limit=None, after=None, relevance=None):
+    """
+    Order a search query and seek past a cursor position
+
+    Args:
+        query (Select): Query of profiles
+        sort_name (str): Key of SEARCH_SORTS
+        limit (int, optional): Maximum number of rows to return
+        after (tuple, optional): Sort key of the last row of the previous page
+        relevance (ColumnElement, optional): Relevance expression of the text
+            query, required by the "relevance" sort
+
+    Returns:
+        Select: The ordered, limited query
+    """
+    sort = SEARCH_SORTS[sort_name]
+    columns = [relevance if col is RELEVANCE else col for col in sort.columns]
+    if after is not None:
+        key, position = tuple_(*columns), tuple_(*after)
+        query = query.where(key < position if sort.descending else key > position)
+
+    order_by = [col.desc() if sort.descending else col for col in columns]
+    return query.order_by(*order_by).limit(limit)
+
+
+def encode_search_cursor(sort_name, profile, relevance=None):
+    """
+    Encode the sort key of the last profile of a page as an opaque cursor
+
+    Args:
+        sort_name (str): Key of SEARCH_SORTS
+        profile (Profile): Last profile of the page
+        relevance (float, optional): Relevance of the profile to the text
+            query, required by the "relevance" sort
+
+    Returns:
+        str: Cursor for the next page
+    """
+    return encode_cursor(
+        [
+            relevance if col is RELEVANCE else getattr(profile, col.key)
+            for col in SEARCH_SORTS[sort_name].columns
+        ]
+    )
+
+
+def decode_search_cursor(sort_name, cursor):
+    """
+    Decode a cursor created by encode_search_cursor
+
+    Args:
+        sort_name (str): Key of SEARCH_SORTS the cursor was created for
+        cursor (str): Cursor from a previous response
+
+    Returns:
+        tuple: Sort key of the last profile of the previous page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    values = decode_cursor(cursor)
+    columns = SEARCH_SORTS[sort_name].columns
+    if len(values) != len(columns) or not all(
+        _is_column_value(col, value) for col, value in zip(columns, values)
+    ):
+        raise ValueError("Invalid cursor")
+
+    return tuple(values)
+
+
+def _is_column_value(col, value):
+    python_type = col.type.python_type
+    if python_type is float:
+        python_type = (int, float)
+
+    return isinstance(value, python_type) and not isinstance(value, bool)
+
+
+def estimate_count(query, cap=SEARCH_COUNT_CAP):
+    """
+    Estimate the number of rows of a query without a full COUNT(*)
+
+    PostgreSQL returns the planner's row estimate. Other databases count at
+    most `cap` + 1 rows, so the result is exact up to the cap.
+
+    Args:
+        query (Select): Unordered, unlimited query
+        cap (int): Maximum number of rows to count
+
+    Returns:
+        tuple: (estimated count, whether the count is exact)
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        compiled = query.compile(dialect=connection.dialect)
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+        ).scalar()
+        return int(plan[0]["Plan"]["Plan Rows"]), False
+
+    count = db.session.scalar(
+        select(func.count()).select_from(query.limit(cap + 1).subquery())
+    )
+    return min(count, cap), count <= cap
+
+
+def search_filters(params, text=True):
+    """
+    Build the SQL filters of the search parameters shared by the search
+    endpoints
+
+    Args:
+        params (dict): Validated SearchRequestSchema fields
+        text (bool): Whether to filter by the text query `q`. Queries ranked
+            with TextSearch.rank() are filtered by it already.
+
+    Returns:
+        list: Filter expressions on profiles joined with users
+    """
+    filters = []
+
+    if params.get("name"):
+        filters.append(get_name_search().filter(params["name"]))
+    if params.get("birth_year"):
+        filters.append(Profile.birth_year == params["birth_year"])
+    # Ages are ranges of birth years, so they can use the birth_year indexes
+    current_year = datetime.now(timezone.utc).year
+    if params.get("min_age") is not None:
+        filters.append(Profile.birth_year <= current_year - params["min_age"])
+    if params.get("max_age") is not None:
+        filters.append(Profile.birth_year >= current_year - params["max_age"])
+    if params.get("min_height") is not None:
+        filters.append(Profile.height >= params["min_height"])
+    if params.get("max_height") is not None:
+        filters.append(Profile.height <= params["max_height"])
+    # Unknown values have no lookup ID, and match nothing
+    lookups = get_lookups()
+    if params.get("sex"):
+        filters.append(Profile.sex_id == lookups.id(Sex, params["sex"]))
+    if params.get("race"):
+        filters.append(Profile.race_id == lookups.id(Race, params["race"]))
+    if text and params.get("q"):
+        filters.append(get_text_search().filter(params["q"]))
+
+    return filters
+
+
+# Inlined rather than bound, so PostgreSQL sees the same decade expression in
+# the select list and in GROUPING SETS
+_TEN = literal_column("10", Integer)
+
+# Facets of the search results: name -> expression the profiles are grouped by.
+# Lookup fields are grouped by ID and decoded with decode_facet().
+FACETS = {
+    "sex": Profile.sex_id,
+    "race": Profile.race_id,
+    "parish": Profile.parish_id,
+    "birth_decade": (Profile.birth_year // _TEN) * _TEN,
+}
+
+
+def decode_facet(name, value):
+    """
+    Decode a value of a FACETS expression for display
+
+    Args:
+        name (str): Key of FACETS
+        value: Value of the facet's expression
+
+    Returns:
+        The lookup value for lookup fields, the value itself otherwise
+    """
+    lookup = Profile.LOOKUP_FIELDS.get(name)
+    return get_lookups().value(lookup, value) if lookup else value
+
+
+def facet_counts(filters):
+    """
+    Count the profiles matching some filters per value of every facet
+
+    All facets are computed in a single grouped query: GROUPING SETS on
+    PostgreSQL, and one UNION ALL branch per facet elsewhere.
+
+    Args:
+        filters (list): Filter expressions on profiles joined with users
+
+    Returns:
+        dict: Facet name -> {value: count}
+    """
+    counts = {name: {} for name in FACETS}
+
+    if db.session.connection().dialect.name == "postgresql":
+        columns = [expression.label(name) for name, expression in FACETS.items()]
+        query = (
+            select(*columns, func.count().label("count"))
+            .select_from(Profile)
+            .join(User)
+            .where(*filters)
+            .group_by(
+                func.grouping_sets(
+                    *[tuple_(expression) for expression in FACETS.values()]
+                )
+            )
+        )
+        for row in db.session.execute(query):
+            # Facet columns are never NULL, so the one that is set tells which
+            # grouping set the row belongs to
+            for name in FACETS:
+                value = getattr(row, name)
+                if value is not None:
+                    counts[name][decode_facet(name, value)] = row.count
+                    break
+    else:
+        query = union_all(
+            *[
+                select(
+                    literal(name).label("facet"),
+                    expression.label("value"),
+                    func.count().label("count"),
+                )
+                .select_from(Profile)
+                .join(User)
+                .where(*filters)
+                .group_by(expression)
+                for name, expression in FACETS.items()
+            ]
+        )
+        for facet, value, count in db.session.execute(query):
+            counts[facet][decode_facet(facet, value)] = count
+
+    return counts
@@ -0,0 +1,262 @@
+"""
+Profile serializers built once per response shape.
+
+ProfileWithUserSchema describes the profile responses, but dumping through
+marshmallow builds the schema and walks its fields for every row, after the
+route has already copied the profile into a dict. Instead, the schema is
+turned once per selection of fields into a plain function that reads the
+response values straight from a profile's attributes with one attrgetter and
+applies the same type conversions as the schema.
+
+Read-only list endpoints skip the ORM altogether: a ProfileReader selects the
+columns of a response shape and serializes the result rows by position,
+without building Profile and User instances or registering them in the
+session.
+"""
+
+import functools
+import operator
+
+from marshmallow import fields
+from sqlalchemy import select
+
+from app.models import Profile, User, get_lookups
+from app.schemas import PROFILE_FIELDS, ProfileWithUserSchema, UserInfoSchema
+
+# Public user details nested in profile responses
+USER_FIELDS = tuple(UserInfoSchema._declared_fields)
+
+# Conversions the schema applies to values that may not already have their
+# JSON type. Integers and strings are read from typed, non-null columns, so
+# they are passed through.
+_CONVERSIONS = {fields.Float: float, fields.Bool: bool}
+
+
+def _ordered_fields(profile_fields):
+    """Put selected fields in declaration order, so equal selections share a key"""
+    if profile_fields is None:
+        return None
+
+    return tuple(field for field in PROFILE_FIELDS if field in profile_fields)
+
+
+def profile_column(field):
+    """
+    Return the name of the Profile column a profile field is read from
+
+    Args:
+        field (str): A PROFILE_FIELDS name other than "user"
+
+    Returns:
+        str: Column name, the ID column for lookup fields
+    """
+    if field == "user_id":
+        return "user_id_fk"
+    if field in Profile.LOOKUP_FIELDS:
+        return f"{field}_id"
+
+    return field
+
+
+def _getter(make_getter, keys):
+    """
+    Return a function that reads several keys of an object as a tuple
+
+    Args:
+        make_getter (callable): operator.attrgetter or operator.itemgetter
+        keys (tuple): Attribute names or item positions
+
+    Returns:
+        callable: Takes an object and returns a tuple of its values
+    """
+    if not keys:
+        return lambda source: ()
+    if len(keys) == 1:
+        get_value = make_getter(*keys)
+        return lambda source: (get_value(source),)
+
+    return make_getter(*keys)
+
+
+def _build_dict(keys, values, conversions):
+    """
+    Convert values in place and pair them with their keys
+
+    Args:
+        keys (tuple): Keys of the dict, in order
+        values (list): Values of the keys, in the same order
+        conversions (list): (position, function) pairs to apply to values
+
+    Returns:
+        dict: The response dict
+    """
+    for position, convert in conversions:
+        values[position] = convert(values[position])
+
+    return dict(zip(keys, values))
+
+
+def profile_serializer(profile_fields=None, user_fields=USER_FIELDS):
+    """
+    Return the function that serializes profiles with the given fields
+
+    Args:
+        profile_fields (tuple, optional): PROFILE_FIELDS to return, all if None
+        user_fields (tuple): User attributes nested under "user"
+
+    Returns:
+        callable: Takes a profile, or any object with its attributes, and
+            returns the same dict as ProfileWithUserSchema(only=...).dump()
+    """
+    return _profile_serializer(_ordered_fields(profile_fields), tuple(user_fields))
+
+
+@functools.lru_cache(maxsize=256)
+def _profile_serializer(profile_fields, user_fields):
+    selected = PROFILE_FIELDS if profile_fields is None else profile_fields
+    get_user_values = _getter(operator.attrgetter, user_fields)
+
+    def serialize_user(user):
+        return dict(zip(user_fields, get_user_values(user)))
+
+    attributes = []
+    conversions = []
+    for position, name in enumerate(selected):
+        if name == "user":
+            attributes.append("user")
+            conversions.append((position, serialize_user))
+            continue
+
+        field = ProfileWithUserSchema._declared_fields[name]
+        attributes.append(field.attribute or name)
+        conversion = _CONVERSIONS.get(type(field))
+        if conversion:
+            conversions.append((position, conversion))
+    get_values = _getter(operator.attrgetter, tuple(attributes))
+
+    def serialize(profile):
+        return _build_dict(selected, list(get_values(profile)), conversions)
+
+    return serialize
+
+
+class ProfileReader:
+    """
+    Selects the columns of a profile response shape and serializes the rows
+
+    The rows are SQLAlchemy Row tuples. Their attributes are the selected
+    Profile column names, and "user_<field>" for the user's details, so
+    sort keys can be read from them as from profiles.
+    """
+
+    def __init__(self, profile_fields, columns):
+        selected = PROFILE_FIELDS if profile_fields is None else profile_fields
+
+        # The ID and owner are always selected, list endpoints filter on them
+        names = ["id", "user_id_fk"]
+        fields_columns = [
+            profile_column(field) for field in selected if field != "user"
+        ]
+        for column in [*fields_columns, *columns]:
+            if column not in names:
+                names.append(column)
+        self.columns = [getattr(Profile, name) for name in names]
+
+        self.with_user = "user" in selected
+        if self.with_user:
+            self.columns.extend(
+                getattr(User, field).label(f"user_{field}") for field in USER_FIELDS
+            )
+
+        # Positions of the response values in a row. Lookup fields hold IDs
+        # until they are decoded, and the user dict is built from the user
+        # columns at the end of the row.
+        positions = []
+        lookups = []
+        conversions = []
+        user_position = None
+        for position, name in enumerate(selected):
+            if name == "user":
+                positions.append(0)  # Replaced by the user dict
+                user_position = position
+                continue
+
+            field = ProfileWithUserSchema._declared_fields[name]
+            positions.append(names.index(profile_column(name)))
+            if name in Profile.LOOKUP_FIELDS:
+                lookups.append((position, Profile.LOOKUP_FIELDS[name]))
+            conversion = _CONVERSIONS.get(type(field))
+            if conversion:
+                conversions.append((position, conversion))
+        get_values = _getter(operator.itemgetter, tuple(positions))
+        get_user_values = _getter(
+            operator.itemgetter, tuple(range(len(names), len(self.columns)))
+        )
+
+        def serialize(rows, value):
+            row_conversions = [
+                *(
+                    (position, functools.partial(value, lookup))
+                    for position, lookup in lookups
+                ),
+                *conversions,
+            ]
+            serialized = []
+            for row in rows:
+                values = list(get_values(row))
+                if user_position is not None:
+                    values[user_position] = dict(zip(USER_FIELDS, get_user_values(row)))
+                serialized.append(_build_dict(selected, values, row_conversions))
+
+            return serialized
+
+        self._serialize = serialize
+
+    def select(self, join_user=False):
+        """
+        Start a query for the reader's columns
+
+        Args:
+            join_user (bool): Join the users table even if no user details
+                are selected, to filter on it
+
+        Returns:
+            Select: Query over profiles, joined with their users if needed
+        """
+        query = select(*self.columns)
+        if join_user or self.with_user:
+            return query.join_from(Profile, User)
+
+        return query.select_from(Profile)
+
+    def serialize(self, rows):
+        """
+        Serialize rows selected by the reader's columns
+
+        Args:
+            rows (iterable): Result rows of a query from select()
+
+        Returns:
+            list: The same dicts profile_serializer() returns for the profiles
+        """
+        return self._serialize(rows, get_lookups().value)
+
+
+def profile_reader(profile_fields=None, columns=()):
+    """
+    Return the reader of a profile response shape
+
+    Args:
+        profile_fields (tuple, optional): PROFILE_FIELDS to return, all if None
+        columns (iterable): Names of other Profile columns to select, such as
+            sort keys
+
+    Returns:
+        ProfileReader: Reader built once per shape
+    """
+    return _profile_reader(_ordered_fields(profile_fields), tuple(columns))
+
+
+@functools.lru_cache(maxsize=256)
+def _profile_reader(profile_fields, columns):
+    return ProfileReader(profile_fields, columns)
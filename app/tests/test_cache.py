@@ -0,0 +1,169 @@
+import json
+from app.cache import LocalCache, get_cache
+from app.models import Profile, db
+from app.tests.test_matching import NEW_PROFILE
+
+
+def test_local_cache_lru_byte_budget():
+    """Test that the local cache evicts least recently used entries by size."""
+    cache = LocalCache(max_bytes=30)
+    cache.set("a", b"x" * 9)
+    cache.set("b", b"x" * 9)
+    cache.set("c", b"x" * 9)
+    assert cache.size == 30
+
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == b"x" * 9
+    cache.set("d", b"x" * 9)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.size <= 30
+
+    # Entries larger than the whole budget are never stored
+    cache.set("huge", b"x" * 100)
+    assert cache.get("huge") is None
+
+
+def test_local_cache_counters_are_not_evicted():
+    """Test that generation counters survive eviction."""
+    cache = LocalCache(max_bytes=10)
+    assert cache.incr("profiles") == 1
+    cache.set("a", b"x" * 9)
+    cache.set("b", b"x" * 9)
+
+    assert cache.get_counter("profiles") == 1
+
+
+def test_matches_served_from_cache(app, client, auth_headers):
+    """Test that repeated match requests hit the cache until a profile is created."""
+    app.config["CACHE_BACKEND"] = "local"
+    first = client.get("/api/profiles/matches/1", headers=auth_headers)
+    assert len(get_cache()) == 1
+
+    # A profile inserted behind the app's back is not seen until invalidation
+    db.session.add(Profile(user_id_fk=4, **NEW_PROFILE))
+    db.session.commit()
+    cached = client.get("/api/profiles/matches/1", headers=auth_headers)
+    assert cached.data == first.data
+
+    # Creating a profile through the API bumps the generation
+    from app.utils import generate_token
+
+    response = client.post(
+        "/api/profiles",
+        data=json.dumps(NEW_PROFILE),
+        content_type="application/json",
+        headers={"Authorization": f"Bearer {generate_token(5)}"},
+    )
+    assert response.status_code == 201
+
+    fresh = client.get("/api/profiles/matches/1", headers=auth_headers).json
+    assert sorted(match["user"]["id"] for match in fresh["data"]) == [3, 4, 5, 7]
+
+
+def test_cached_matches_still_check_ownership(app, client, auth_headers):
+    """Test that cached matches are not served to other users."""
+    app.config["CACHE_BACKEND"] = "local"
+    client.get("/api/profiles/matches/1", headers=auth_headers)
+
+    from app.utils import generate_token
+
+    response = client.get(
+        "/api/profiles/matches/1",
+        headers={"Authorization": f"Bearer {generate_token(2)}"},
+    )
+    assert response.status_code == 403
+
+
+def test_local_cache_ttl(monkeypatch):
+    """Test that entries stored with a TTL expire."""
+    import app.cache
+
+    now = [100.0]
+    monkeypatch.setattr(app.cache.time, "monotonic", lambda: now[0])
+    cache = LocalCache(max_bytes=100)
+    cache.set("short", b"x", ttl=5)
+    cache.set("forever", b"y")
+
+    now[0] += 4
+    assert cache.get("short") == b"x"
+    now[0] += 2
+    assert cache.get("short") is None
+    assert cache.get("forever") == b"y"
+    assert cache.size == len("forever") + 1
+
+
+def _search_user_ids(client, headers, query="limit=50"):
+    response = client.get(f"/api/search?{query}", headers=headers)
+    assert response.status_code == 200
+    return sorted(profile["user"]["id"] for profile in response.json["data"])
+
+
+def _search_stats(client, headers):
+    return client.get("/api/search/cache", headers=headers).json["data"]
+
+
+def test_search_results_cached_across_users(app, client, auth_headers):
+    """Test that one cached search serves every user, minus their own profiles."""
+    from app.utils import generate_token
+
+    app.config["CACHE_BACKEND"] = "local"
+    other_headers = {"Authorization": f"Bearer {generate_token(2)}"}
+
+    first = _search_user_ids(client, auth_headers)
+    assert 1 not in first
+
+    # Same parameters with a differently cased name normalize to one entry
+    assert _search_user_ids(client, other_headers) == sorted(
+        [user_id for user_id in first + [1] if user_id != 2]
+    )
+    _search_user_ids(client, auth_headers, "limit=50&name=TEST")
+    _search_user_ids(client, other_headers, "limit=50&name=Test")
+
+    assert _search_stats(client, auth_headers) == {
+        "backend": "local",
+        "hits": 2,
+        "misses": 2,
+        "hit_rate": 0.5,
+    }
+
+
+def test_search_cache_pages_exclude_own_profiles(app, client, auth_headers):
+    """Test that cached pages stay full after the requester's profiles are removed."""
+    app.config["CACHE_BACKEND"] = "local"
+    uncached = [
+        profile["id"]
+        for profile in client.get("/api/search?limit=3", headers=auth_headers).json[
+            "data"
+        ]
+    ]
+
+    from app.utils import generate_token
+
+    # User 2 warms the cache for the same page, including user 1's profile
+    client.get(
+        "/api/search?limit=3",
+        headers={"Authorization": f"Bearer {generate_token(2)}"},
+    )
+    cached = client.get("/api/search?limit=3", headers=auth_headers).json
+    assert [profile["id"] for profile in cached["data"]] == uncached
+    assert cached["meta"]["next_cursor"] is not None
+
+
+def test_search_cache_invalidated_on_profile_creation(app, client, auth_headers):
+    """Test that creating a profile invalidates cached search results."""
+    from app.utils import generate_token
+
+    app.config["CACHE_BACKEND"] = "local"
+    before = _search_user_ids(client, auth_headers)
+
+    response = client.post(
+        "/api/profiles",
+        data=json.dumps(NEW_PROFILE),
+        content_type="application/json",
+        headers={"Authorization": f"Bearer {generate_token(4)}"},
+    )
+    assert response.status_code == 201
+
+    assert _search_user_ids(client, auth_headers) == sorted(before + [4])
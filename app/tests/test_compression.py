@@ -0,0 +1,124 @@
+import gzip
+import pytest
+from werkzeug.http import parse_accept_header
+from app import compression, create_app
+from app.cache import get_cache
+from app.compression import ENCODINGS, negotiate_encoding
+
+
+def _decompress(encoding, data):
+    if encoding == "br":
+        return pytest.importorskip("brotli").decompress(data)
+    if encoding == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    return gzip.decompress(data)
+
+
+def _get(client, url, headers, accept_encoding):
+    return client.get(url, headers={**headers, "Accept-Encoding": accept_encoding})
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_compressed_responses_round_trip(app, client, auth_headers, encoding):
+    """Test that each encoding decompresses to the uncompressed body."""
+    if encoding not in compression.CODECS:
+        pytest.skip(f"{encoding} is not installed")
+    app.config["COMPRESSION_MIN_SIZE"] = 0
+    plain = client.get("/api/profiles/matches/1", headers=auth_headers)
+    response = _get(client, "/api/profiles/matches/1", auth_headers, encoding)
+
+    assert plain.headers.get("Content-Encoding") is None
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) == len(response.data)
+    assert _decompress(encoding, response.data) == plain.data
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip", "gzip"),
+        ("gzip, deflate, br, zstd", "zstd"),
+        ("gzip;q=1.0, br;q=0.5, zstd;q=0.1", "gzip"),
+        ("br, zstd;q=0", "br"),
+        ("*", "zstd"),
+        ("deflate", None),
+        ("gzip;q=0, identity", None),
+    ],
+)
+def test_negotiate_encoding(monkeypatch, header, expected):
+    """Test that the client's quality values win, then the server's preference."""
+    monkeypatch.setattr(compression, "CODECS", dict.fromkeys(ENCODINGS))
+    accept = parse_accept_header(header)
+
+    assert negotiate_encoding(accept, ["zstd", "br", "gzip"]) == expected
+    assert negotiate_encoding(accept, []) is None
+
+
+def test_negotiate_skips_unavailable_encodings(monkeypatch):
+    """Test that encodings whose package is missing are never chosen."""
+    monkeypatch.setattr(compression, "CODECS", {"gzip": None})
+
+    accept = parse_accept_header("zstd, br, gzip;q=0.5")
+    assert negotiate_encoding(accept, ENCODINGS) == "gzip"
+
+
+def test_small_responses_are_not_compressed(app, client, auth_headers):
+    """Test that bodies under the size threshold are sent as they are."""
+    app.config["COMPRESSION_MIN_SIZE"] = 10_000
+    response = _get(client, "/api/profiles/1", auth_headers, "gzip")
+
+    assert response.headers.get("Content-Encoding") is None
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.json["data"]["id"] == 1
+
+
+def test_uploads_are_not_compressed(app, client, auth_headers, tmp_path):
+    """Test that files served from the upload folder are left alone."""
+    app.config["COMPRESSION_MIN_SIZE"] = 0
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    (tmp_path / "photo.jpg").write_bytes(b"\xff\xd8" + b"x" * 4096)
+
+    response = _get(client, "/api/uploads/photo.jpg", auth_headers, "gzip")
+
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") is None
+    assert response.data.startswith(b"\xff\xd8")
+
+
+def test_cached_matches_are_compressed_once(app, client, auth_headers, monkeypatch):
+    """Test that compressed variants of cached responses are reused."""
+    app.config["CACHE_BACKEND"] = "local"
+    app.config["COMPRESSION_MIN_SIZE"] = 0
+    compressed = []
+    monkeypatch.setitem(
+        compression.CODECS,
+        "gzip",
+        lambda data: compressed.append(data) or gzip.compress(data, mtime=0),
+    )
+
+    first = _get(client, "/api/profiles/matches/1", auth_headers, "gzip")
+    second = _get(client, "/api/profiles/matches/1", auth_headers, "gzip")
+
+    assert len(compressed) == 1
+    assert first.data == second.data
+    assert len(get_cache()) == 2
+
+    plain = client.get("/api/profiles/matches/1", headers=auth_headers)
+    assert gzip.decompress(second.data) == plain.data
+
+
+def test_compression_can_be_disabled(tmp_path):
+    """Test that an empty encoding list turns compression off, and typos fail."""
+    config = {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "UPLOAD_FOLDER": str(tmp_path),
+    }
+    app = create_app(config_overrides={**config, "COMPRESSION_ENCODINGS": ""})
+    assert app.config["COMPRESSION_ENCODINGS"] == []
+
+    with pytest.raises(ValueError):
+        create_app(config_overrides={**config, "COMPRESSION_ENCODINGS": "gzip,lz4"})
@@ -0,0 +1,104 @@
+import gzip
+import pytest
+from sqlalchemy import event
+from app.etags import row_etag
+from app.models import db
+from app.tests.test_serializers import loaded_profiles
+
+
+@pytest.fixture
+def statements(app):
+    """Record the SQL statements the app runs."""
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.parametrize("url", ["/api/profiles/1", "/api/users/1"])
+def test_unchanged_responses_are_not_modified(client, auth_headers, url):
+    """Test that a request with the current ETag is answered with a 304."""
+    response = client.get(url, headers=auth_headers)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert not etag.startswith("W/")
+    assert "no-cache" in response.headers["Cache-Control"]
+
+    again = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_not_modified_profile_skips_the_biography(client, auth_headers, statements):
+    """Test that a 304 for a profile neither loads nor reads the profile row."""
+    etag = client.get("/api/profiles/1", headers=auth_headers).headers["ETag"]
+    statements.clear()
+
+    with loaded_profiles() as loaded:
+        response = client.get(
+            "/api/profiles/1", headers={**auth_headers, "If-None-Match": etag}
+        )
+
+    assert response.status_code == 304
+    assert loaded == []
+    assert not any("biography" in statement for statement in statements)
+
+
+@pytest.mark.parametrize(
+    "url, other",
+    [("/api/profiles/1", "/api/profiles/2"), ("/api/users/1", "/api/users/2")],
+)
+def test_etags_identify_rows(client, auth_headers, url, other):
+    """Test that another row's ETag does not validate a response."""
+    etag = client.get(other, headers=auth_headers).headers["ETag"]
+
+    response = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json["data"]["id"] == 1
+
+
+def test_etags_change_with_version(monkeypatch):
+    """Test that bumping the version invalidates every ETag."""
+    etag = row_etag("profile", 1, 1, None)
+    monkeypatch.setattr("app.etags.ETAG_VERSION", 2)
+
+    assert row_etag("profile", 1, 1, None) != etag
+    assert row_etag("user", 1, None) != row_etag("profile", 1, None)
+
+
+def test_missing_rows_are_never_not_modified(client, auth_headers):
+    """Test that a conditional request for a missing row is still a 404."""
+    headers = {**auth_headers, "If-None-Match": "*"}
+
+    assert client.get("/api/profiles/999", headers=headers).status_code == 404
+    assert client.get("/api/users/999", headers=headers).status_code == 404
+    assert client.get("/api/profiles/1", headers=headers).status_code == 304
+
+
+def test_compressed_responses_have_their_own_etag(app, client, auth_headers):
+    """Test that each content encoding of a response gets a distinct strong ETag."""
+    app.config["COMPRESSION_MIN_SIZE"] = 0
+    plain = client.get("/api/profiles/1", headers=auth_headers)
+    compressed = client.get(
+        "/api/profiles/1", headers={**auth_headers, "Accept-Encoding": "gzip"}
+    )
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+
+    response = client.get(
+        "/api/profiles/1",
+        headers={
+            **auth_headers,
+            "Accept-Encoding": "gzip",
+            "If-None-Match": compressed.headers["ETag"],
+        },
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == compressed.headers["ETag"]
+    assert "Accept-Encoding" in response.headers["Vary"]
@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app.models import Favourite, db
+
+
+@contextmanager
+def captured_selects():
+    """Record the SELECT statements sent to the database."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def query_plans(statements):
+    """Return the SQLite query plan of each captured statement as one string."""
+    plans = []
+    with db.engine.connect() as connection:
+        for statement, parameters in statements:
+            rows = connection.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ).all()
+            plans.append(" | ".join(row[-1] for row in rows))
+
+    return plans
+
+
+def request_plans(client, url, headers):
+    with captured_selects() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+
+    return query_plans(statements)
+
+
+@pytest.mark.parametrize(
+    "url, index",
+    [
+        ("/api/profiles", "ix_profiles_user_id_fk"),
+        ("/api/search?sex=Female&race=Black", "ix_profiles_sex_race_birth_year"),
+        (
+            "/api/search?sex=Female&race=Black&birth_year=1992",
+            "ix_profiles_sex_race_birth_year",
+        ),
+        ("/api/users/favourites", "sqlite_autoindex_favourites_1"),
+        (
+            "/api/profiles/matches/1?exclude_favourited=true",
+            "sqlite_autoindex_favourites_1",
+        ),
+    ],
+)
+def test_hot_queries_use_indexes(app, client, auth_headers, url, index):
+    """Test that the queries behind hot endpoints are served by an index."""
+    app.config["MATCH_ENGINE"] = "sql"
+
+    plans = request_plans(client, url, auth_headers)
+
+    assert any(index in plan for plan in plans), plans
+
+
+def test_match_query_uses_birth_year_index(app, client, auth_headers):
+    """Test that the match query scans the birth year window through its index."""
+    app.config["MATCH_ENGINE"] = "sql"
+
+    with captured_selects() as statements:
+        response = client.get("/api/profiles/matches/1", headers=auth_headers)
+    assert response.status_code == 200
+
+    match_statements = [
+        (statement, parameters)
+        for statement, parameters in statements
+        if "birth_year BETWEEN" in statement
+    ]
+    assert len(match_statements) == 1
+    plan = query_plans(match_statements)[0]
+    index = "USING INDEX ix_profiles_birth_year_id (birth_year>? AND birth_year<?)"
+    assert index in plan, plan
+
+
+def test_favourited_by_uses_index(app):
+    """Test that looking up who favourited a profile uses an index."""
+    with captured_selects() as statements:
+        Favourite.query.filter_by(fav_profile_id_fk=1).all()
+
+    assert "ix_favourites_fav_profile_id_fk" in query_plans(statements)[0]
@@ -0,0 +1,88 @@
+from datetime import date, datetime, timezone
+import pytest
+from sqlalchemy import select
+import app.json_provider
+from app.json_provider import (
+    OrjsonJSONProvider,
+    StdlibJSONProvider,
+    json_provider_class,
+)
+from app.models import Favourite, User, db
+
+PAYLOAD = {
+    "success": True,
+    "data": [
+        {
+            "id": 1,
+            "name": "Zoë Brown",
+            "height": 172.5,
+            "political": False,
+            "photo": None,
+            "date_joined": datetime(2024, 5, 1, 9, 30, 15, 250000),
+            "created_at": datetime(2024, 5, 1, 9, 30, tzinfo=timezone.utc),
+        }
+    ],
+    "meta": {"limit": 20, "next_cursor": None, "day": date(2024, 5, 1)},
+}
+
+
+def test_auto_prefers_orjson(app):
+    """Test that orjson is used when it is installed."""
+    assert type(app.json) is OrjsonJSONProvider
+    assert json_provider_class("auto") is OrjsonJSONProvider
+
+
+def test_auto_falls_back_to_stdlib(monkeypatch):
+    """Test that the stdlib provider is used without orjson."""
+    monkeypatch.setattr(app.json_provider, "orjson", None)
+
+    assert json_provider_class("auto") is StdlibJSONProvider
+    with pytest.raises(RuntimeError):
+        json_provider_class("orjson")(None)
+
+
+def test_unknown_json_provider():
+    """Test that a misconfigured provider name is reported."""
+    with pytest.raises(ValueError):
+        json_provider_class("ujson")
+
+
+@pytest.mark.parametrize("debug", [False, True])
+def test_json_providers_write_identical_responses(app, debug):
+    """Test that both providers encode responses to the same bytes."""
+    app.debug = debug
+    orjson_body = OrjsonJSONProvider(app).response(PAYLOAD).get_data()
+    stdlib_body = StdlibJSONProvider(app).response(PAYLOAD).get_data()
+
+    assert orjson_body == stdlib_body
+    body = orjson_body.decode().replace(" ", "")
+    assert '"name":"ZoëBrown"' in body
+    assert '"date_joined":"2024-05-01T09:30:15.250000"' in body
+    assert '"created_at":"2024-05-01T09:30:00+00:00"' in body
+
+
+def test_json_provider_round_trip(app):
+    """Test that dumps() and loads() are inverse, with stdlib-only arguments too."""
+    provider = OrjsonJSONProvider(app)
+    data = {"b": [1, 2.5, None], "a": "x"}
+
+    assert provider.dumps(data) == '{"a":"x","b":[1,2.5,null]}'
+    assert provider.loads(provider.dumps(data)) == data
+    assert provider.loads(provider.dumps(data, indent=4)) == data
+
+
+def test_user_date_joined_is_iso_8601(client, auth_headers):
+    """Test that datetimes reach responses in ISO 8601."""
+    response = client.get("/api/users/1", headers=auth_headers)
+
+    joined = response.json["data"]["date_joined"]
+    assert datetime.fromisoformat(joined).year >= 2024
+
+
+def test_to_dict_formats_datetimes(app):
+    """Test that model dicts carry ISO 8601 strings, whatever encodes them."""
+    user = db.session.get(User, 1)
+    favourite = db.session.scalars(select(Favourite)).first()
+
+    assert user.to_dict()["date_joined"] == user.date_joined.isoformat()
+    assert favourite.to_dict()["created_at"] == favourite.created_at.isoformat()
@@ -0,0 +1,154 @@
+import json
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+from app.models import Cuisine, Profile, Race, Sex, db, get_lookups
+from app.tests.test_indexes import captured_selects
+from app.tests.test_matching import NEW_PROFILE
+from app.utils import generate_token
+
+
+def test_profiles_store_lookup_ids(app):
+    """Test that categorical fields are stored once per distinct value."""
+    profile = db.session.get(Profile, 3)
+
+    assert profile.race == "Black"
+    assert profile.race_id == db.session.scalar(
+        select(Race.id).where(Race.value == "Black")
+    )
+    assert db.session.scalar(select(func.count()).select_from(Sex)) == 2
+    assert profile.to_dict(["sex", "race", "fav_cuisine"]) == {
+        "sex": "Female",
+        "race": "Black",
+        "fav_cuisine": "Italian",
+    }
+
+
+def test_new_values_are_added_to_lookups(client):
+    """Test that a profile with an unseen value creates its lookup row."""
+    response = client.post(
+        "/api/profiles",
+        data=json.dumps({**NEW_PROFILE, "fav_cuisine": "Ethiopian"}),
+        content_type="application/json",
+        headers={"Authorization": f"Bearer {generate_token(4)}"},
+    )
+    assert response.status_code == 201
+    assert response.json["data"]["fav_cuisine"] == "Ethiopian"
+
+    profile = db.session.get(Profile, response.json["data"]["id"])
+    cuisine = db.session.get(Cuisine, profile.fav_cuisine_id)
+    assert cuisine.value == "Ethiopian"
+
+
+def test_rolled_back_values_are_not_cached(app):
+    """Test that values created in a rolled back transaction are forgotten."""
+    db.session.add(Profile(user_id_fk=4, **{**NEW_PROFILE, "race": "Taino"}))
+    db.session.rollback()
+
+    assert get_lookups().id(Race, "Taino") is None
+
+    profile = Profile(user_id_fk=4, **{**NEW_PROFILE, "race": "Taino"})
+    db.session.add(profile)
+    db.session.commit()
+    assert db.session.get(Race, profile.race_id).value == "Taino"
+    assert get_lookups().id(Race, "Taino") == profile.race_id
+
+
+def test_search_filters_compare_ids(client, auth_headers):
+    """Test that equality filters are sent to the database as integers."""
+    with captured_selects() as statements:
+        response = client.get(
+            "/api/search?sex=Female&race=Black&fields=sex,race", headers=auth_headers
+        )
+    assert {(p["sex"], p["race"]) for p in response.json["data"]} == {
+        ("Female", "Black")
+    }
+
+    sql, parameters = [
+        statement for statement in statements if "FROM profiles" in statement[0]
+    ][-1]
+    assert "profiles.sex_id = ?" in sql and "profiles.race_id = ?" in sql
+    assert not any(isinstance(value, str) for value in parameters)
+
+
+def test_unknown_filter_value_matches_nothing(client, auth_headers):
+    """Test that filtering by a value no profile has returns no results."""
+    response = client.get("/api/search?race=Martian", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json["data"] == []
+
+
+def test_lookups_decoded_from_memory(app):
+    """Test that decoding values does not query the database once cached."""
+    profiles = Profile.query.all()
+    [(profile.sex, profile.race) for profile in profiles]
+
+    with captured_selects() as statements:
+        values = {(profile.sex, profile.race) for profile in profiles}
+
+    assert ("Male", "Black") in values
+    assert statements == []
+
+
+def test_lookup_properties_in_queries(app):
+    """Test that lookup properties compare their ID columns in queries."""
+
+    def ids(*filters):
+        return set(db.session.scalars(select(Profile.id).where(*filters)))
+
+    female_ids = ids(Profile.sex_id == get_lookups().id(Sex, "Female"))
+
+    assert female_ids and ids(Profile.sex == "Female") == female_ids
+    assert ids(Profile.sex.in_(["Female", "Martian"])) == female_ids
+    assert ids(Profile.sex != "Martian") == ids()
+    assert ids(Profile.sex == "Martian") == set()
+    assert set(db.session.scalars(select(Profile.sex).select_from(Profile))) == {
+        "Female",
+        "Male",
+    }
+    assert "profiles.sex_id IN" in str(select(Profile.id).where(Profile.sex == "Male"))
+
+
+def test_assigning_values_does_not_query(app):
+    """Test that lookup IDs of new values are only resolved on flush."""
+    with captured_selects() as statements:
+        profile = Profile(user_id_fk=4, **{**NEW_PROFILE, "fav_cuisine": "Ethiopian"})
+    assert statements == []
+    assert profile.fav_cuisine == "Ethiopian"
+    assert (
+        db.session.scalar(select(Cuisine).where(Cuisine.value == "Ethiopian")) is None
+    )
+
+    db.session.add(profile)
+    db.session.flush()
+    assert db.session.get(Cuisine, profile.fav_cuisine_id).value == "Ethiopian"
+    assert profile.fav_cuisine == "Ethiopian"
+    db.session.rollback()
+
+
+def test_unknown_values_are_remembered(client, auth_headers):
+    """Test that filtering by an unknown value does not reload the lookup table."""
+    client.get("/api/search?race=Martian", headers=auth_headers)
+
+    with captured_selects() as statements:
+        response = client.get("/api/search?race=Martian", headers=auth_headers)
+    assert response.json["data"] == []
+    assert not any("FROM races" in statement for statement, _ in statements)
+
+    # A value created since is found once it is looked up with create=True
+    db.session.add(Profile(user_id_fk=4, **{**NEW_PROFILE, "race": "Martian"}))
+    db.session.commit()
+    assert get_lookups().id(Race, "Martian") is not None
+
+
+def test_lookup_ids_are_full_integers():
+    """Test that lookup IDs cannot run out after 32767 distinct values."""
+    ddl = "\n".join(
+        str(CreateTable(table).compile(dialect=postgresql.dialect()))
+        for table in (Cuisine.__table__, Profile.__table__)
+    )
+
+    assert "id SERIAL NOT NULL" in ddl
+    assert "fav_cuisine_id INTEGER NOT NULL" in ddl
+    assert "SMALL" not in ddl
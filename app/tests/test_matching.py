@@ -0,0 +1,578 @@
+import json
+import pytest
+from sqlalchemy import func, select
+from app.matching import (
+    MatchIndex,
+    ProfileFeed,
+    ProfileSnapshot,
+    get_match_engine,
+    rank_hits,
+)
+from app.models import Profile, db
+
+NEW_PROFILE = {
+    "description": "New profile",
+    "parish": "Kingston",
+    "biography": "A new biography",
+    "sex": "Female",
+    "race": "Black",
+    "birth_year": 1991,
+    "height": 174.0,
+    "fav_cuisine": "Italian",
+    "fav_colour": "Blue",
+    "fav_school_subject": "Mathematics",
+    "political": True,
+    "religious": False,
+    "family_oriented": True,
+}
+
+
+def _synced_index():
+    index = MatchIndex()
+    index.sync(db.session)
+    return index
+
+
+def _match_user_ids(client, auth_headers, profile_id=1):
+    response = client.get(f"/api/profiles/matches/{profile_id}", headers=auth_headers)
+    assert response.status_code == 200
+    return sorted(match["user"]["id"] for match in json.loads(response.data)["data"])
+
+
+@pytest.mark.parametrize("engine", ["sql", "index", "numpy"])
+def test_match_engines_agree(app, client, auth_headers, engine):
+    """Test that every engine returns the same matches."""
+    app.config["MATCH_ENGINE"] = engine
+
+    assert _match_user_ids(client, auth_headers) == [3, 7]
+
+
+@pytest.mark.parametrize("engine", ["index", "numpy"])
+def test_match_index_updates_on_create(app, client, auth_headers, engine):
+    """Test that in-memory engines pick up profiles created through the API."""
+    app.config["MATCH_ENGINE"] = engine
+    assert _match_user_ids(client, auth_headers) == [3, 7]
+
+    from app.utils import generate_token
+
+    headers = {"Authorization": f"Bearer {generate_token(2)}"}
+    response = client.post(
+        "/api/profiles",
+        data=json.dumps(NEW_PROFILE),
+        content_type="application/json",
+        headers=headers,
+    )
+    assert response.status_code == 201
+
+    assert _match_user_ids(client, auth_headers) == [2, 3, 7]
+
+
+@pytest.mark.parametrize("engine", ["index", "numpy"])
+def test_match_index_syncs_external_inserts(app, client, auth_headers, engine):
+    """Test that profiles committed outside this process are picked up."""
+    app.config["MATCH_ENGINE"] = engine
+    assert _match_user_ids(client, auth_headers) == [3, 7]
+
+    # Simulates a profile created by another worker
+    db.session.add(Profile(user_id_fk=4, **NEW_PROFILE))
+    db.session.commit()
+
+    assert _match_user_ids(client, auth_headers) == [3, 4, 7]
+
+
+@pytest.mark.parametrize("store", [MatchIndex, ProfileSnapshot])
+def test_match_index_syncs_out_of_order_commits(app, store):
+    """Test that a profile committed after one with a higher ID is still loaded."""
+    index = store()
+    index.sync(db.session)
+    last_id = db.session.scalar(select(func.max(Profile.id)))
+
+    # Another worker's transaction holds last_id + 1 while last_id + 2 commits
+    later = Profile(user_id_fk=4, **NEW_PROFILE)
+    later.id = last_id + 2
+    db.session.add(later)
+    db.session.commit()
+    index.sync(db.session)
+    assert len(index) == last_id + 1
+
+    earlier = Profile(user_id_fk=5, **NEW_PROFILE)
+    earlier.id = last_id + 1
+    db.session.add(earlier)
+    db.session.commit()
+    index.sync(db.session)
+    assert len(index) == last_id + 2
+    assert sorted(index.find_matches(last_id + 1)) == sorted(
+        _synced_index().find_matches(last_id + 1)
+    )
+
+
+def test_profile_feed_gives_up_on_old_gaps(app, monkeypatch):
+    """Test that skipped IDs are only looked for until SYNC_GAP_TIMEOUT."""
+    feed = ProfileFeed()
+    feed.read(db.session)
+    last_id = feed.high_water
+    later = Profile(user_id_fk=4, **NEW_PROFILE)
+    later.id = last_id + 2
+    db.session.add(later)
+    db.session.commit()
+
+    monkeypatch.setattr("app.matching.SYNC_GAP_TIMEOUT", 0)
+    assert [row.id for row in feed.read(db.session)] == [last_id + 2]
+
+    # The gap has expired, so a late commit into it is no longer looked for
+    earlier = Profile(user_id_fk=5, **NEW_PROFILE)
+    earlier.id = last_id + 1
+    db.session.add(earlier)
+    db.session.commit()
+    assert feed.read(db.session) == []
+
+
+def test_profile_feed_keeps_only_recent_gaps(app, monkeypatch):
+    """Test that a jump in IDs only records the newest MAX_SYNC_GAPS gaps."""
+    monkeypatch.setattr("app.matching.MAX_SYNC_GAPS", 3)
+    feed = ProfileFeed()
+    feed.read(db.session)
+    last_id = feed.high_water
+    later = Profile(user_id_fk=4, **NEW_PROFILE)
+    later.id = last_id + 5_000_000
+    db.session.add(later)
+    db.session.commit()
+    assert [row.id for row in feed.read(db.session)] == [later.id]
+
+    # Only the three IDs below the jump are still looked for
+    for user_id, offset in [(5, 1), (6, 4_999_997)]:
+        earlier = Profile(user_id_fk=user_id, **NEW_PROFILE)
+        earlier.id = last_id + offset
+        db.session.add(earlier)
+    db.session.commit()
+    assert [row.id for row in feed.read(db.session)] == [last_id + 4_999_997]
+
+
+def test_match_index_height_window():
+    """Test the inclusive 3-10 height window on both sides of the source."""
+    index = MatchIndex()
+    traits = (1, 2, 3, True, False, True)
+    index.add(1, 1, 1990, 170.0, traits)
+    for profile_id, height in enumerate(
+        [159.9, 160.0, 165.0, 167.0, 168.0, 172.0, 173.0, 180.0, 180.1], start=2
+    ):
+        index.add(profile_id, profile_id, 1990, height, traits)
+
+    matched_heights = sorted(
+        index.get(hit.profile_id)[2] for hit in index.find_matches(1)
+    )
+    assert matched_heights == [160.0, 165.0, 167.0, 173.0, 180.0]
+
+
+def test_match_index_birth_year_window():
+    """Test that only birth years within +/- 5 years are matched."""
+    index = MatchIndex()
+    traits = (1, 2, 3, True, False, True)
+    index.add(1, 1, 1990, 170.0, traits)
+    for profile_id, birth_year in enumerate([1984, 1985, 1995, 1996], start=2):
+        index.add(profile_id, profile_id, birth_year, 175.0, traits)
+
+    matched_years = sorted(
+        index.get(hit.profile_id)[1] for hit in index.find_matches(1)
+    )
+    assert matched_years == [1985, 1995]
+
+
+def test_sql_engine_scores_in_database(app):
+    """Test that the SQL engine only returns profiles meeting the trait rule."""
+    source = db.session.get(Profile, 1)
+
+    # Profiles 5 and 6 are inside the age window, but 5 fails on height
+    # and 6 shares only two traits, so neither row should come back
+    assert sorted(get_match_engine("sql").find_matches(source)) == [3, 7]
+
+
+def test_numpy_snapshot_matches_index():
+    """Test that the vectorized snapshot agrees with the bisect index."""
+    import random
+
+    rng = random.Random(0)
+    index = MatchIndex()
+    snapshot = ProfileSnapshot(capacity=8)
+    for profile_id in range(1, 501):
+        row = (
+            profile_id,
+            rng.randint(1, 400),
+            rng.randint(1980, 2000),
+            round(rng.gauss(170, 8), 1),
+            (
+                # Lookup IDs of the cuisine, colour and school subject, past
+                # the 16-bit range for the cuisine
+                rng.randint(40001, 40003),
+                rng.randint(1, 2),
+                rng.randint(1, 3),
+                rng.random() < 0.5,
+                rng.random() < 0.5,
+                rng.random() < 0.5,
+            ),
+        )
+        index.add(*row)
+        snapshot.add(*row)
+
+    assert len(snapshot) == 500
+    for profile_id in range(1, 501, 7):
+        assert sorted(snapshot.find_matches(profile_id)) == sorted(
+            index.find_matches(profile_id)
+        )
+
+        # Paging through the numpy ranking gives rank_hits' pages
+        after = None
+        while True:
+            page = snapshot.ranked_matches(profile_id, 4, after)
+            assert page == rank_hits(index.find_matches(profile_id), 4, after)
+            if len(page) < 4:
+                break
+            after = page[-1]
+
+
+def test_materialized_matches_written_on_create(app, client, auth_headers):
+    """Test that creating a profile stores its matches in both directions."""
+    from app.models import ProfileMatch
+    from app.utils import generate_token
+
+    app.config["MATCH_ENGINE"] = "materialized"
+    headers = {"Authorization": f"Bearer {generate_token(2)}"}
+    response = client.post(
+        "/api/profiles",
+        data=json.dumps(NEW_PROFILE),
+        content_type="application/json",
+        headers=headers,
+    )
+    assert response.status_code == 201
+    new_id = response.json["data"]["id"]
+
+    forward = {
+        row.target_profile_id
+        for row in ProfileMatch.query.filter_by(source_profile_id=new_id)
+    }
+    backward = {
+        row.source_profile_id
+        for row in ProfileMatch.query.filter_by(target_profile_id=new_id)
+    }
+    assert 1 in forward
+    assert forward == backward
+    assert 2 in _match_user_ids(client, auth_headers)
+
+
+def test_materialized_matches_lock_the_birth_year_window():
+    """Test that PostgreSQL transactions lock each birth year of their window."""
+    from sqlalchemy.dialects import postgresql
+    from app.matching import MATERIALIZE_LOCK_ID, materialize_locks
+
+    locks = materialize_locks("postgresql", 1990)
+    assert [list(lock.compile().params.values()) for lock in locks] == [
+        [MATERIALIZE_LOCK_ID, year] for year in range(1985, 1996)
+    ]
+    assert "pg_advisory_xact_lock" in str(
+        locks[0].compile(dialect=postgresql.dialect())
+    )
+    assert materialize_locks("sqlite", 1990) == []
+
+
+def test_matches_not_materialized_for_other_engines(app, client):
+    """Test that profile creation only stores matches for the materialized engine."""
+    from app.models import ProfileMatch
+    from app.utils import generate_token
+
+    headers = {"Authorization": f"Bearer {generate_token(2)}"}
+    response = client.post(
+        "/api/profiles",
+        data=json.dumps(NEW_PROFILE),
+        content_type="application/json",
+        headers=headers,
+    )
+    assert response.status_code == 201
+    assert db.session.scalar(select(func.count()).select_from(ProfileMatch)) == 0
+
+
+def test_matches_backfill_command(app, client, auth_headers):
+    """Test that the backfill command populates the materialized engine."""
+    app.config["MATCH_ENGINE"] = "materialized"
+    assert _match_user_ids(client, auth_headers) == []
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["matches", "backfill", "--batch-size", "2"])
+    assert result.exit_code == 0
+    assert "Done" in result.output
+
+    assert _match_user_ids(client, auth_headers) == [3, 7]
+
+    # Re-running replaces rows instead of duplicating them
+    result = runner.invoke(args=["matches", "backfill"])
+    assert result.exit_code == 0
+    assert _match_user_ids(client, auth_headers) == [3, 7]
+
+
+def _add_candidates(count):
+    """Add profiles in profile 1's age/height window with varying scores."""
+    for offset in range(count):
+        db.session.add(
+            Profile(
+                user_id_fk=2 + offset % 6,
+                **{
+                    **NEW_PROFILE,
+                    "birth_year": 1988 + offset % 5,
+                    "height": 171.0 + offset % 7,
+                    "fav_colour": "Blue" if offset % 2 else "Red",
+                    "fav_school_subject": "Mathematics" if offset % 3 else "Art",
+                },
+            )
+        )
+    db.session.commit()
+
+
+@pytest.mark.parametrize("engine", ["sql", "index", "numpy", "materialized"])
+def test_matches_paginated_by_rank(app, client, auth_headers, engine):
+    """Test that cursor pages cover every match once, in rank order."""
+    _add_candidates(20)
+    app.config["MATCH_ENGINE"] = engine
+    if engine == "materialized":
+        app.test_cli_runner().invoke(args=["matches", "backfill"])
+
+    full = client.get("/api/profiles/matches/1", headers=auth_headers).json
+    assert full["success"] is True
+    assert full["meta"]["next_cursor"] is None
+    assert len(full["data"]) == 22
+
+    paged = []
+    cursor = None
+    while True:
+        url = "/api/profiles/matches/1?limit=3"
+        if cursor:
+            url += f"&cursor={cursor}"
+        response = client.get(url, headers=auth_headers).json
+        assert len(response["data"]) <= 3
+        paged.extend(response["data"])
+        cursor = response["meta"]["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [match["id"] for match in paged] == [match["id"] for match in full["data"]]
+
+    # Best matches share all six fields with profile 1
+    source = client.get("/api/profiles/1", headers=auth_headers).json["data"]
+    first = paged[0]
+    assert all(
+        first[field] == source[field]
+        for field in ["fav_cuisine", "fav_colour", "fav_school_subject"]
+    )
+
+
+def test_matches_ranking_order(app):
+    """Test that hits are ordered by score, then age and height closeness."""
+    from app.matching import MatchHit, rank_hits
+
+    hits = [
+        MatchHit(1, 3, 0, 3.0),
+        MatchHit(2, 5, 4, 9.0),
+        MatchHit(3, 5, 1, 9.0),
+        MatchHit(4, 5, 1, 4.0),
+        MatchHit(5, 4, 0, 3.0),
+    ]
+    assert [hit.profile_id for hit in rank_hits(hits, 10)] == [4, 3, 2, 5, 1]
+    assert [hit.profile_id for hit in rank_hits(hits, 2, after=hits[3])] == [3, 2]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "limit=0",
+        "limit=101",
+        "limit=abc",
+        "cursor=not-a-cursor",
+        "cursor=WzFd",
+        # [2**70, 1, 1, 1], out of the range of a database integer
+        "cursor=WzExODA1OTE2MjA3MTc0MTEzMDM0MjQsMSwxLDFd",
+    ],
+)
+def test_matches_invalid_pagination(client, auth_headers, query):
+    """Test that bad limits and cursors are rejected."""
+    response = client.get(f"/api/profiles/matches/1?{query}", headers=auth_headers)
+
+    assert response.status_code == 400
+    assert response.json["success"] is False
+
+
+def _create_profile(client, headers, **overrides):
+    response = client.post(
+        "/api/profiles",
+        data=json.dumps({**NEW_PROFILE, **overrides}),
+        content_type="application/json",
+        headers=headers,
+    )
+    assert response.status_code == 201
+    return response.json["data"]["id"]
+
+
+@pytest.mark.parametrize("engine", ["sql", "index", "numpy", "materialized"])
+def test_batch_matches(app, client, auth_headers, engine):
+    """Test that batch matches equal the per-profile results, grouped by source."""
+    _add_candidates(8)
+    second_id = _create_profile(
+        client, auth_headers, birth_year=1985, height=166.0, fav_colour="Red"
+    )
+    app.config["MATCH_ENGINE"] = engine
+    if engine == "materialized":
+        app.test_cli_runner().invoke(args=["matches", "backfill"])
+
+    response = client.get(
+        f"/api/profiles/matches?profile_ids=1,{second_id}&limit=5",
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    data = response.json["data"]
+    assert [group["profile_id"] for group in data] == [1, second_id]
+    assert all(group["matches"] for group in data)
+
+    for group in data:
+        single = client.get(
+            f"/api/profiles/matches/{group['profile_id']}?limit=5",
+            headers=auth_headers,
+        ).json["data"]
+        assert group["matches"] == single
+
+    # Without profile_ids every owned profile is included
+    response = client.get("/api/profiles/matches", headers=auth_headers)
+    assert [group["profile_id"] for group in response.json["data"]] == [1, second_id]
+
+    # Repeated IDs are answered once, in the order first requested
+    response = client.get(
+        f"/api/profiles/matches?profile_ids={second_id},1,{second_id}",
+        headers=auth_headers,
+    )
+    assert [group["profile_id"] for group in response.json["data"]] == [second_id, 1]
+
+
+def test_batch_matches_rejects_unowned_profiles(client, auth_headers):
+    """Test that batch matches only accept the current user's profiles."""
+    response = client.get("/api/profiles/matches?profile_ids=1,2", headers=auth_headers)
+    assert response.status_code == 403
+
+    response = client.get("/api/profiles/matches?profile_ids=1,x", headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_matches_rebuild_command(app, client, auth_headers):
+    """Test that the parallel rebuild writes the same matches as the backfill."""
+    _add_candidates(8)
+    app.config["MATCH_ENGINE"] = "materialized"
+    runner = app.test_cli_runner()
+
+    runner.invoke(args=["matches", "backfill"])
+    expected = _match_user_ids(client, auth_headers)
+
+    result = runner.invoke(
+        args=["matches", "rebuild", "--workers", "2", "--band-size", "2"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "pairs/sec" in result.output
+
+    assert _match_user_ids(client, auth_headers) == expected
+
+
+def test_matches_rebuild_keeps_profiles_created_during_it(
+    app, client, auth_headers, monkeypatch
+):
+    """Test that profiles created after the rebuild's snapshot keep their matches."""
+    from app import match_rebuild
+    from app.matching import match_rows_after
+    from app.utils import generate_token
+
+    app.config["MATCH_ENGINE"] = "materialized"
+    runner = app.test_cli_runner()
+    runner.invoke(args=["matches", "backfill"])
+
+    def snapshot_then_create(session, after_id, **kwargs):
+        rows = match_rows_after(session, after_id, **kwargs).all()
+        session.commit()
+        response = client.post(
+            "/api/profiles",
+            data=json.dumps(NEW_PROFILE),
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {generate_token(2)}"},
+        )
+        assert response.status_code == 201
+        return rows
+
+    monkeypatch.setattr(match_rebuild, "match_rows_after", snapshot_then_create)
+    result = runner.invoke(args=["matches", "rebuild", "--workers", "2"])
+    assert result.exit_code == 0, result.output
+
+    assert 2 in _match_user_ids(client, auth_headers)
+
+
+def test_birth_year_bands_include_neighbours():
+    """Test that each band is scored against every year within range of it."""
+    from app.match_rebuild import birth_year_bands
+
+    rows = [(year, year, year, 170.0) for year in range(1980, 2000)]
+    bands = birth_year_bands(rows, 5)
+
+    assert [len(band_rows) for band_rows, _ in bands] == [5, 5, 5, 5]
+    assert sorted(row[2] for row in bands[0][1]) == list(range(1980, 1990))
+    assert sorted(row[2] for row in bands[1][1]) == list(range(1980, 1995))
+    assert sorted(row[2] for row in bands[0][0]) == list(range(1980, 1985))
+
+
+def test_matches_best_per_user(app, client, auth_headers):
+    """Test that only the best ranked profile of each user is returned."""
+    _add_candidates(20)
+
+    full = client.get("/api/profiles/matches/1?limit=100", headers=auth_headers).json
+    response = client.get(
+        "/api/profiles/matches/1?limit=100&best_per_user=true", headers=auth_headers
+    )
+    assert response.status_code == 200
+    collapsed = response.json["data"]
+
+    user_ids = [match["user"]["id"] for match in collapsed]
+    assert (
+        len(user_ids)
+        == len(set(user_ids))
+        == len({match["user"]["id"] for match in full["data"]})
+    )
+
+    # The kept profile is the first one of its user in the full ranking
+    first_by_user = {}
+    for match in full["data"]:
+        first_by_user.setdefault(match["user"]["id"], match["id"])
+    assert sorted(match["id"] for match in collapsed) == sorted(first_by_user.values())
+    ranked_ids = [match["id"] for match in full["data"]]
+    assert [match["id"] for match in collapsed] == sorted(
+        (match["id"] for match in collapsed), key=ranked_ids.index
+    )
+
+
+def test_matches_exclude_favourited(app, client, auth_headers):
+    """Test that favourited profiles are left out and the cache follows changes."""
+    from app.cache import LocalCache
+
+    app.extensions["cache"] = LocalCache(1024 * 1024)
+    url = "/api/profiles/matches/1?exclude_favourited=true"
+
+    def match_ids():
+        return [
+            match["id"] for match in client.get(url, headers=auth_headers).json["data"]
+        ]
+
+    all_ids = match_ids()
+    assert len(all_ids) == 2
+
+    response = client.post(
+        "/api/profiles/favourite",
+        data=json.dumps({"profileId": all_ids[0]}),
+        content_type="application/json",
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    assert match_ids() == all_ids[1:]
+
+    client.delete(
+        f"/api/profiles/favourite/{response.json['data']['id']}", headers=auth_headers
+    )
+    assert match_ids() == all_ids
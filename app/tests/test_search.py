@@ -0,0 +1,444 @@
+from datetime import datetime, timezone
+import pytest
+from app.models import Profile, User, db
+from app.search import (
+    Fts5NameSearch,
+    Fts5TextSearch,
+    NameSearch,
+    get_name_search,
+    get_text_search,
+)
+from app.tests.test_indexes import captured_selects, request_plans
+
+
+def _search_user_ids(client, auth_headers, name):
+    response = client.get(f"/api/search?name={name}", headers=auth_headers)
+    assert response.status_code == 200
+    return sorted(profile["user"]["id"] for profile in response.json["data"])
+
+
+def test_sqlite_uses_fts5_name_search(app):
+    """Test that the FTS5 backend is picked when the shadow table exists."""
+    assert isinstance(get_name_search(), Fts5NameSearch)
+
+
+@pytest.mark.parametrize("backend", ["fts5", "like"])
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("User 3", [3]),
+        ("user 3", [3]),
+        ("test", [2, 3, 4, 5, 6, 7]),
+        ("ser", [2, 3, 4, 5, 6, 7]),
+        ("5", [5]),
+        ("nobody", []),
+    ],
+)
+def test_name_search_backends_agree(app, client, auth_headers, backend, name, expected):
+    """Test that every backend finds the same case-insensitive substrings."""
+    app.config["NAME_SEARCH"] = backend
+    app.extensions.pop("name_search", None)
+
+    assert _search_user_ids(client, auth_headers, name) == expected
+
+
+def test_fts5_name_search_follows_user_changes(app, client, auth_headers):
+    """Test that the triggers keep the FTS5 table in sync with users."""
+    user = db.session.get(User, 2)
+    user.name = "Renamed Person"
+    db.session.commit()
+
+    assert _search_user_ids(client, auth_headers, "Renamed") == [2]
+    assert _search_user_ids(client, auth_headers, "User 2") == []
+
+
+def test_fts5_name_search_uses_index(app, client, auth_headers):
+    """Test that name searches read the FTS5 table instead of scanning users."""
+    plans = request_plans(client, "/api/search?name=User", auth_headers)
+
+    assert any("users_name_fts VIRTUAL TABLE INDEX" in plan for plan in plans), plans
+
+
+def test_like_name_search_is_fallback(app):
+    """Test that an explicitly configured backend is honoured."""
+    app.config["NAME_SEARCH"] = "like"
+
+    assert type(get_name_search()) is NameSearch
+
+
+def _search_pages(client, auth_headers, query):
+    ids = []
+    cursor = None
+    while True:
+        url = f"/api/search?{query}"
+        if cursor:
+            url += f"&cursor={cursor}"
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        ids.extend(profile["id"] for profile in response.json["data"])
+        cursor = response.json["meta"]["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort, descending", [("id", False), ("newest", True)])
+def test_search_keyset_pagination(client, auth_headers, sort, descending):
+    """Test that cursor pages cover every result once, in sort order."""
+    everything = client.get(f"/api/search?sort={sort}", headers=auth_headers).json
+    expected = [profile["id"] for profile in everything["data"]]
+    assert expected == sorted(expected, reverse=descending)
+    assert everything["meta"]["next_cursor"] is None
+
+    assert _search_pages(client, auth_headers, f"sort={sort}&limit=2") == expected
+
+
+@pytest.mark.parametrize(
+    "sort, key",
+    [
+        ("age", lambda profile: (-profile["birth_year"], -profile["id"])),
+        ("height", lambda profile: (profile["height"], profile["id"])),
+    ],
+)
+def test_search_column_sorts(client, auth_headers, sort, key):
+    """Test that age and height sorts order and paginate by their column."""
+    everything = client.get(f"/api/search?sort={sort}", headers=auth_headers).json
+    expected = sorted(everything["data"], key=key)
+    assert everything["data"] == expected
+    assert everything["meta"]["sort"] == sort
+
+    assert _search_pages(client, auth_headers, f"sort={sort}&limit=2") == [
+        profile["id"] for profile in expected
+    ]
+
+
+def _search_ids(client, auth_headers, query):
+    response = client.get(f"/api/search?{query}", headers=auth_headers)
+    assert response.status_code == 200
+    return [profile["id"] for profile in response.json["data"]]
+
+
+def test_search_ranges(client, auth_headers):
+    """Test that age and height ranges are inclusive."""
+    everything = client.get("/api/search", headers=auth_headers).json["data"]
+    current_year = datetime.now(timezone.utc).year
+
+    assert _search_ids(
+        client,
+        auth_headers,
+        f"min_age={current_year - 1993}&max_age={current_year - 1990}",
+    ) == [
+        profile["id"] for profile in everything if 1990 <= profile["birth_year"] <= 1993
+    ]
+    assert _search_ids(client, auth_headers, "min_height=173&max_height=175") == [
+        profile["id"] for profile in everything if 173 <= profile["height"] <= 175
+    ]
+
+
+@pytest.mark.parametrize(
+    "query, index",
+    [
+        ("sort=id", "USING INTEGER PRIMARY KEY"),
+        ("sort=newest", "USING INTEGER PRIMARY KEY"),
+        ("sort=age", "USING INDEX ix_profiles_birth_year_id"),
+        ("sort=age&min_age=30&max_age=40", "USING INDEX ix_profiles_birth_year_id"),
+        ("sort=height", "USING INDEX ix_profiles_height_id"),
+        ("sort=height&min_height=170", "USING INDEX ix_profiles_height_id"),
+    ],
+)
+def test_search_sorts_read_in_index_order(client, auth_headers, query, index):
+    """Test that every sort is served by an index without sorting the results."""
+    url = f"/api/search?{query}&limit=2"
+    cursor = client.get(url, headers=auth_headers).json["meta"]["next_cursor"]
+
+    for page_url in (url, f"{url}&cursor={cursor}"):
+        plan = next(
+            plan
+            for plan in request_plans(client, page_url, auth_headers)
+            if "profiles" in plan
+        )
+        assert index in plan, plan
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
+
+
+def test_search_limit_is_applied(client, auth_headers):
+    """Test that limit caps the number of returned profiles."""
+    response = client.get("/api/search?limit=2", headers=auth_headers)
+
+    assert len(response.json["data"]) == 2
+    assert response.json["meta"]["limit"] == 2
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "limit=0",
+        "limit=101",
+        "sort=random",
+        "sort=relevance",
+        "min_age=40&max_age=30",
+        "min_height=-1",
+        "max_age=old",
+        "cursor=abc",
+        "cursor=WyJ4Il0",
+        # [2**70], out of the range of a database integer
+        "limit=2&cursor=WzExODA1OTE2MjA3MTc0MTEzMDM0MjRd",
+    ],
+)
+def test_search_invalid_pagination(client, auth_headers, query):
+    """Test that bad limits, sorts and cursors are rejected."""
+    response = client.get(f"/api/search?{query}", headers=auth_headers)
+
+    assert response.status_code == 400
+
+
+def test_search_total_estimate(client, auth_headers):
+    """Test that count=true reports the total size of the result set."""
+    response = client.get("/api/search?limit=2&count=true", headers=auth_headers)
+
+    meta = response.json["meta"]
+    assert meta["total_estimate"] == 6
+    assert meta["total_exact"] is True
+    assert response.json["message"] == "Found 6 matching profiles"
+
+
+def test_estimate_count_is_capped(app):
+    """Test that counting stops at the cap instead of scanning everything."""
+    from sqlalchemy import select
+    from app.models import Profile
+    from app.search import estimate_count
+
+    assert estimate_count(select(Profile.id), cap=3) == (3, False)
+    assert estimate_count(select(Profile.id), cap=100) == (7, True)
+
+
+def _facets(client, auth_headers, query=""):
+    response = client.get(f"/api/search/facets?{query}", headers=auth_headers)
+    assert response.status_code == 200
+    return {
+        facet: {item["value"]: item["count"] for item in items}
+        for facet, items in response.json["data"].items()
+    }
+
+
+def _expected_facets(profiles):
+    from collections import Counter
+
+    return {
+        "sex": dict(Counter(p["sex"] for p in profiles)),
+        "race": dict(Counter(p["race"] for p in profiles)),
+        "parish": dict(Counter(p["parish"] for p in profiles)),
+        "birth_decade": dict(Counter(p["birth_year"] // 10 * 10 for p in profiles)),
+    }
+
+
+@pytest.mark.parametrize("query", ["", "sex=Female", "name=User&race=Black"])
+def test_search_facets_match_search_results(client, auth_headers, query):
+    """Test that facet counts equal counting the search results client-side."""
+    results = client.get(f"/api/search?{query}", headers=auth_headers).json["data"]
+
+    assert _facets(client, auth_headers, query) == _expected_facets(results)
+
+
+def test_search_facets_cached_per_filter_set(app, client, auth_headers):
+    """Test that cached facets are shared between users minus their own profiles."""
+    from app.cache import LocalCache
+    from app.utils import generate_token
+
+    app.extensions["cache"] = LocalCache(1024 * 1024)
+    other_headers = {"Authorization": f"Bearer {generate_token(2)}"}
+
+    assert _facets(client, auth_headers) == _expected_facets(
+        client.get("/api/search", headers=auth_headers).json["data"]
+    )
+    cache = app.extensions["cache"]
+    assert [key for key in cache._entries if key.startswith("facets:")] == [
+        "facets:0:{}"
+    ]
+
+    assert _facets(client, other_headers) == _expected_facets(
+        client.get("/api/search", headers=other_headers).json["data"]
+    )
+
+
+def test_search_facets_sqlite_single_query(app, client, auth_headers):
+    """Test that every facet is counted by one UNION ALL statement."""
+    from app.tests.test_indexes import captured_selects
+
+    with captured_selects() as statements:
+        client.get("/api/search/facets?sex=Female", headers=auth_headers)
+
+    grouped = [sql for sql, _ in statements if "GROUP BY" in sql]
+    assert len(grouped) == 1
+    assert grouped[0].count("UNION ALL") == 3
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/search?fields=parish,user",
+        "/api/profiles?fields=parish,user",
+        "/api/profiles/matches/1?fields=parish,user",
+    ],
+)
+def test_sparse_fieldsets(client, auth_headers, url):
+    """Test that fields= returns only the requested keys and skips biography."""
+    full = client.get(url.split("fields=")[0].rstrip("?&"), headers=auth_headers)
+
+    with captured_selects() as statements:
+        response = client.get(url, headers=auth_headers)
+    assert response.status_code == 200
+
+    data = response.json["data"]
+    assert data
+    assert all(set(profile) == {"id", "parish", "user"} for profile in data)
+    assert data == [
+        {key: profile[key] for key in ("id", "parish", "user")}
+        for profile in full.json["data"]
+    ]
+
+    # The last profiles query loads the listed profiles; earlier ones load the
+    # requester's own profiles for the ownership checks
+    profile_selects = [sql for sql, _ in statements if "FROM profiles" in sql]
+    assert "biography" not in profile_selects[-1]
+
+
+def test_sparse_fieldsets_without_user(client, auth_headers):
+    """Test that the users table is not joined when user is not requested."""
+    with captured_selects() as statements:
+        response = client.get("/api/search?fields=sex,race", headers=auth_headers)
+
+    assert all(
+        set(profile) == {"id", "sex", "race"} for profile in response.json["data"]
+    )
+    assert not any(
+        "users.photo" in sql for sql, _ in statements if "FROM profiles" in sql
+    )
+
+
+@pytest.mark.parametrize("fields", ["password", "parish,nope", ""])
+def test_sparse_fieldsets_rejects_unknown_fields(client, auth_headers, fields):
+    """Test that unknown field names are rejected."""
+    response = client.get(f"/api/search?fields={fields}", headers=auth_headers)
+
+    assert response.status_code == 400
+
+
+def test_sparse_fieldsets_paginate(client, auth_headers):
+    """Test that cursors still work when the sort key is not a requested field."""
+    expected = [
+        profile["id"]
+        for profile in client.get("/api/search", headers=auth_headers).json["data"]
+    ]
+
+    assert _search_pages(client, auth_headers, "limit=2&fields=parish") == expected
+
+
+TEXT_PROFILES = {
+    4: ("Hiking and cooking", "Hiking trails every weekend, hiking is my life"),
+    5: ("Avid reader", "I go hiking once a year and love jazz music"),
+    6: ("Music lover", "Jazz, reggae and cooking for friends"),
+}
+
+
+@pytest.fixture
+def text_profiles(app):
+    """Profiles with distinctive descriptions and biographies."""
+    from app.tests.test_matching import NEW_PROFILE
+
+    ids = {}
+    for user_id, (description, biography) in TEXT_PROFILES.items():
+        profile = Profile(
+            user_id_fk=user_id,
+            **{**NEW_PROFILE, "description": description, "biography": biography},
+        )
+        db.session.add(profile)
+        db.session.flush()
+        ids[user_id] = profile.id
+    db.session.commit()
+
+    return ids
+
+
+def _text_search_ids(client, auth_headers, query):
+    response = client.get(f"/api/search?{query}", headers=auth_headers)
+    assert response.status_code == 200
+    return [profile["id"] for profile in response.json["data"]]
+
+
+def test_sqlite_uses_fts5_text_search(app):
+    """Test that the FTS5 text backend is picked when the shadow table exists."""
+    assert isinstance(get_text_search(), Fts5TextSearch)
+
+
+@pytest.mark.parametrize("backend", ["fts5", "like"])
+@pytest.mark.parametrize(
+    "q, users", [("hiking", [4, 5]), ("JAZZ", [5, 6]), ("cooking", [4, 6])]
+)
+def test_text_search_backends_agree(
+    app, client, auth_headers, text_profiles, backend, q, users
+):
+    """Test that every backend finds the profiles mentioning a word."""
+    app.config["TEXT_SEARCH"] = backend
+    app.extensions.pop("text_search", None)
+
+    found = _text_search_ids(client, auth_headers, f"q={q}")
+    assert sorted(found) == sorted(text_profiles[user_id] for user_id in users)
+
+
+def test_text_search_ranked_by_relevance(client, auth_headers, text_profiles):
+    """Test that profiles mentioning the query more often come first."""
+    assert _text_search_ids(client, auth_headers, "q=hiking") == [
+        text_profiles[4],
+        text_profiles[5],
+    ]
+    # Words are stemmed and all of them must match
+    assert _text_search_ids(client, auth_headers, "q=cooks+jazz") == [text_profiles[6]]
+
+
+def test_text_search_relevance_pagination(client, auth_headers, text_profiles):
+    """Test that relevance cursors page through every result once."""
+    expected = _text_search_ids(client, auth_headers, "q=jazz")
+    assert len(expected) == 2
+
+    assert _search_pages(client, auth_headers, "q=jazz&limit=1") == expected
+
+
+@pytest.mark.parametrize("q", ['"', "hiking*", "NOT AND (", "%25"])
+def test_text_search_query_syntax_is_literal(client, auth_headers, text_profiles, q):
+    """Test that FTS5 query syntax in the text query is not interpreted."""
+    response = client.get(f"/api/search?q={q}", headers=auth_headers)
+
+    assert response.status_code == 200
+
+
+def test_text_search_follows_profile_creation(client, auth_headers, text_profiles):
+    """Test that profiles created through the API are searchable immediately."""
+    import json
+    from app.tests.test_matching import NEW_PROFILE
+    from app.utils import generate_token
+
+    response = client.post(
+        "/api/profiles",
+        data=json.dumps({**NEW_PROFILE, "biography": "Snorkelling in Negril"}),
+        content_type="application/json",
+        headers={"Authorization": f"Bearer {generate_token(7)}"},
+    )
+    assert response.status_code == 201
+
+    assert _text_search_ids(client, auth_headers, "q=snorkelling") == [
+        response.json["data"]["id"]
+    ]
+
+
+def test_text_search_uses_index(client, auth_headers, text_profiles):
+    """Test that text searches read the FTS5 table instead of scanning profiles."""
+    plans = request_plans(client, "/api/search?q=hiking", auth_headers)
+
+    assert any("profiles_text_fts VIRTUAL TABLE INDEX" in plan for plan in plans)
+
+
+def test_text_search_facets(client, auth_headers, text_profiles):
+    """Test that facets count the profiles matching the text query."""
+    results = client.get("/api/search?q=hiking", headers=auth_headers).json["data"]
+
+    assert _facets(client, auth_headers, "q=hiking") == _expected_facets(results)
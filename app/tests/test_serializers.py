@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.orm import joinedload
+from app.models import Profile, db
+from app.schemas import ProfileWithUserSchema
+from app.serializers import profile_reader, profile_serializer
+
+
+def _profiles():
+    return db.session.scalars(
+        select(Profile).options(joinedload(Profile.user)).order_by(Profile.id)
+    ).all()
+
+
+@pytest.mark.parametrize(
+    "profile_fields",
+    [None, ("id",), ("id", "parish", "height", "user"), ("id", "user_id", "sex")],
+)
+def test_compiled_serializer_matches_schema(app, profile_fields):
+    """Test that compiled serializers produce the schema's output."""
+    profiles = _profiles()
+    serialize = profile_serializer(profile_fields)
+
+    assert [serialize(profile) for profile in profiles] == ProfileWithUserSchema(
+        many=True, only=profile_fields
+    ).dump(profiles)
+
+
+def test_compiled_serializer_converts_types(app):
+    """Test that values are converted to the schema's field types."""
+    profile = _profiles()[0]
+    profile.height = 180
+    profile.political = 1
+
+    data = profile_serializer(("id", "height", "political"))(profile)
+
+    assert data == {"id": profile.id, "height": 180.0, "political": True}
+    assert type(data["height"]) is float
+    db.session.rollback()
+
+
+def test_compiled_serializers_are_reused(app):
+    """Test that each response shape is compiled once."""
+    assert profile_serializer() is profile_serializer()
+    assert profile_serializer(("id", "user", "sex")) is profile_serializer(
+        ("sex", "id", "user")
+    )
+    assert profile_serializer(("id", "sex")) is not profile_serializer(
+        ("id", "sex"), user_fields=("id", "name", "photo", "username")
+    )
+
+
+def test_profile_responses_include_owner(client, auth_headers):
+    """Test that profile responses carry the ID of the profile's user."""
+    response = client.get("/api/profiles/1", headers=auth_headers)
+
+    assert response.json["data"]["user_id"] == response.json["data"]["user"]["id"]
+
+
+@pytest.mark.parametrize(
+    "profile_fields",
+    [None, ("id",), ("id", "parish", "height", "user"), ("id", "user_id", "sex")],
+)
+def test_profile_reader_matches_orm_serialization(app, profile_fields):
+    """Test that rows serialize to the same JSON as the profiles they came from."""
+    reader = profile_reader(profile_fields, ["birth_year"])
+    rows = db.session.execute(reader.select().order_by(Profile.id)).all()
+    serialize = profile_serializer(profile_fields)
+
+    assert app.json.dumps(reader.serialize(rows)) == app.json.dumps(
+        [serialize(profile) for profile in _profiles()]
+    )
+    assert [row.birth_year for row in rows] == [
+        profile.birth_year for profile in _profiles()
+    ]
+
+
+@contextmanager
+def loaded_profiles():
+    """Record the Profile instances loaded from the database."""
+    loaded = []
+
+    def on_load(target, context, *args):
+        loaded.append(target)
+
+    # Profiles already in the session are refreshed rather than loaded
+    event.listen(Profile, "load", on_load)
+    event.listen(Profile, "refresh", on_load)
+    try:
+        yield loaded
+    finally:
+        event.remove(Profile, "load", on_load)
+        event.remove(Profile, "refresh", on_load)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/profiles",
+        "/api/search?limit=3",
+        "/api/search?sort=height&fields=id,height",
+        "/api/search?q=test",
+    ],
+)
+def test_list_endpoints_skip_the_orm(client, auth_headers, url):
+    """Test that list endpoints return the ORM path's JSON without loading profiles."""
+    with loaded_profiles() as loaded:
+        response = client.get(url, headers=auth_headers)
+    assert response.status_code == 200
+    assert loaded == []
+
+    profiles = {profile.id: profile for profile in _profiles()}
+    fields = response.json["data"][0].keys() if response.json["data"] else ()
+    serialize = profile_serializer(tuple(fields) if "fields=" in url else None)
+    assert [
+        serialize(profiles[profile["id"]]) for profile in response.json["data"]
+    ] == response.json["data"]
@@ -1,4 +1,7 @@
 import jwt
+import json
+import base64
+import binascii
 import datetime
 from functools import wraps
 from flask import request, jsonify, g, current_app
@@ -6,7 +9,9 @@ from flask import request, jsonify, g, current_app
 from app.models import User, db
 
 
-def generate_response(success=True, message=None, data=None, errors=None):
+def generate_response(
+    success=True, message=None, data=None, errors=None, meta=None
+):
     """
     Generate a standardized API response format
 
@@ -15,6 +20,7 @@ def generate_response(success=True, message=None, data=None, errors=None):
         message (str, optional): Message to include in the response
         data (any, optional): Data to include in the response
         errors (dict, optional): Dictionary of field-level errors
+        meta (dict, optional): Pagination or other metadata about the data
 
     Returns:
         dict: Standardized API response
@@ -30,9 +36,57 @@ def generate_response(success=True, message=None, data=None, errors=None):
     if errors is not None:
         response["errors"] = errors
 
+    if meta is not None:
+        response["meta"] = meta
+
     return response
 
 
+def encode_cursor(values):
+    """
+    Encode a keyset pagination position as an opaque cursor
+
+    Args:
+        values (list): JSON-serializable sort key of the last item on a page
+
+    Returns:
+        str: URL-safe cursor
+    """
+    payload = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor created by encode_cursor
+
+    Args:
+        cursor (str): Cursor from a previous response
+
+    Returns:
+        list: The encoded sort key
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+
+    # Larger integers cannot be bound as database parameters
+    if any(
+        isinstance(value, int) and not -(2**63) <= value < 2**63 for value in values
+    ):
+        raise ValueError("Invalid cursor")
+
+    return values
+
+
 def generate_token(user_id, token_type="access"):
     """
     Generate a JWT token for authentication
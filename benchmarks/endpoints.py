@@ -0,0 +1,164 @@
+"""
+Time the hot read endpoints end-to-end through the Flask test client
+against synthetic populations, and print the results as JSON.
+
+    python -m benchmarks.endpoints --sizes 1000 100000 1000000 --output bench.json
+
+Every size gets a fresh SQLite database. The first request of each endpoint
+is reported separately as `cold_ms`, since it includes building the
+in-memory match structures.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from app import create_app
+from app.models import Favourite, Profile, db
+from app.utils import generate_token
+from benchmarks.synthetic import RACES, populate, populate_favourites
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+
+def percentile(samples, fraction):
+    """Return the sample at a fraction of the sorted samples"""
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def time_requests(client, requests):
+    """
+    Issue GET requests and summarize their latencies
+
+    Args:
+        client (FlaskClient): Test client of the benchmarked app
+        requests (list): (url, headers) tuples; the first one is the cold request
+
+    Returns:
+        dict: Latency summary in milliseconds and the number of items returned
+    """
+    timings = []
+    items = 0
+    for url, headers in requests:
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        items += len(response.json["data"])
+
+    cold, warm = timings[0], timings[1:] or timings
+    return {
+        "requests": len(timings),
+        "cold_ms": round(cold, 3),
+        "mean_ms": round(statistics.fmean(warm), 3),
+        "p50_ms": round(percentile(warm, 0.5), 3),
+        "p95_ms": round(percentile(warm, 0.95), 3),
+        "max_ms": round(max(warm), 3),
+        "items_per_request": items / len(timings),
+    }
+
+
+def benchmark_size(size, args):
+    """Populate a fresh database with `size` users and time every endpoint"""
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app(
+        config_overrides={
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            "UPLOAD_FOLDER": tempfile.gettempdir(),
+            "MATCH_ENGINE": args.engine,
+        }
+    )
+
+    try:
+        with app.app_context():
+            db.create_all()
+
+            start = time.perf_counter()
+            populate(size, seed=args.seed)
+            populate_favourites(size, per_user=args.favourites, seed=args.seed)
+            populate_seconds = time.perf_counter() - start
+
+            if args.engine == "materialized":
+                app.test_cli_runner().invoke(args=["matches", "rebuild"])
+
+            favourites = db.session.scalar(select(func.count(Favourite.id)))
+            rng = random.Random(args.seed)
+            profiles = [
+                db.session.get(Profile, rng.randint(1, size))
+                for _ in range(args.requests)
+            ]
+            headers = [
+                {"Authorization": f"Bearer {generate_token(profile.user_id_fk)}"}
+                for profile in profiles
+            ]
+
+            client = app.test_client()
+            endpoints = {
+                "get_profile_matches": [
+                    (f"/api/profiles/matches/{profile.id}?limit=20", header)
+                    for profile, header in zip(profiles, headers)
+                ],
+                "search_profiles": [
+                    (
+                        f"/api/search?sex={profile.sex}&race={rng.choice(RACES)}"
+                        f"&birth_year={profile.birth_year}",
+                        header,
+                    )
+                    for profile, header in zip(profiles, headers)
+                ],
+                "get_top_favourites": [
+                    ("/api/users/favourites/20", header) for header in headers
+                ],
+            }
+
+            return {
+                "size": size,
+                "favourites": favourites,
+                "populate_seconds": round(populate_seconds, 3),
+                "endpoints": {
+                    name: time_requests(client, requests)
+                    for name, requests in endpoints.items()
+                },
+            }
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--favourites", type=int, default=5)
+    parser.add_argument("--engine", default="index")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "engine": args.engine,
+        "requests": args.requests,
+        "seed": args.seed,
+        "results": [benchmark_size(size, args) for size in args.sizes],
+    }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
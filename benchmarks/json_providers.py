@@ -0,0 +1,94 @@
+"""
+Compare the time and size of JSON responses encoded by each JSON provider,
+and by Flask's default provider, for representative payloads.
+
+    python -m benchmarks.json_providers --profiles 500 --repeat 50
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from app import create_app
+from app.json_provider import JSON_PROVIDERS, orjson
+from app.models import Profile, User, db
+from app.serializers import profile_serializer
+from app.utils import generate_response
+from benchmarks.synthetic import populate
+
+
+def payloads(size):
+    """Build response payloads shaped like the hot endpoints' responses"""
+    profiles = db.session.scalars(
+        select(Profile).options(joinedload(Profile.user)).limit(size)
+    ).all()
+    serialize = profile_serializer()
+    card = profile_serializer(("id", "parish", "birth_year", "height", "user"))
+    users = db.session.scalars(select(User).limit(size)).all()
+
+    return {
+        "matches": generate_response(
+            data=[serialize(profile) for profile in profiles],
+            meta={"limit": size, "next_cursor": "WzMsIDEsIDIuNSwgNDJd"},
+        ),
+        "search": generate_response(
+            data=[card(profile) for profile in profiles[:20]],
+            message="Found 20 matching profiles",
+            meta={"limit": 20, "sort": "id", "next_cursor": "WzIwXQ"},
+        ),
+        "users": generate_response(data=[user.to_dict() for user in users]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app(
+        config_overrides={
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            "UPLOAD_FOLDER": tempfile.gettempdir(),
+        }
+    )
+
+    try:
+        with app.app_context():
+            db.create_all()
+            populate(args.profiles, seed=args.seed)
+
+            providers = {"flask": DefaultJSONProvider(app)}
+            for name, provider in JSON_PROVIDERS.items():
+                if name != "orjson" or orjson is not None:
+                    providers[name] = provider(app)
+
+            results = {}
+            for payload_name, payload in payloads(args.profiles).items():
+                timings = {}
+                for name, provider in providers.items():
+                    start = time.perf_counter()
+                    for _ in range(args.repeat):
+                        response = provider.response(payload)
+                    timings[name] = {
+                        "ms": (time.perf_counter() - start) * 1000 / args.repeat,
+                        "bytes": len(response.get_data()),
+                    }
+                results[payload_name] = timings
+
+            print(json.dumps({"profiles": args.profiles, **results}, indent=2))
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compare the rows transferred by the match query before and after scoring
+moved into SQL.
+
+    python -m benchmarks.match_rows --profiles 20000 --samples 200
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from app import create_app
+from app.matching import SqlMatchEngine, candidate_filters
+from app.models import Profile, db
+from benchmarks.synthetic import populate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", type=int, default=20000)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app(
+        config_overrides={
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            "UPLOAD_FOLDER": tempfile.gettempdir(),
+        }
+    )
+
+    try:
+        with app.app_context():
+            db.create_all()
+            populate(args.profiles, seed=args.seed)
+
+            rng = random.Random(args.seed)
+            sources = [
+                db.session.get(Profile, rng.randint(1, args.profiles))
+                for _ in range(args.samples)
+            ]
+
+            # Before: every candidate in the age/height window is hydrated
+            start = time.perf_counter()
+            rows_before = sum(
+                len(
+                    db.session.scalars(
+                        select(Profile).where(*candidate_filters(source))
+                    ).all()
+                )
+                for source in sources
+            )
+            seconds_before = time.perf_counter() - start
+
+            # After: only the IDs of real matches leave the database
+            engine = SqlMatchEngine()
+            start = time.perf_counter()
+            rows_after = sum(len(engine.find_matches(source)) for source in sources)
+            seconds_after = time.perf_counter() - start
+
+            print(
+                json.dumps(
+                    {
+                        "profiles": args.profiles,
+                        "samples": args.samples,
+                        "before": {
+                            "rows": rows_before,
+                            "rows_per_lookup": rows_before / args.samples,
+                            "seconds": seconds_before,
+                        },
+                        "after": {
+                            "rows": rows_after,
+                            "rows_per_lookup": rows_after / args.samples,
+                            "seconds": seconds_after,
+                        },
+                    },
+                    indent=2,
+                )
+            )
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    main()
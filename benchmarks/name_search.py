@@ -0,0 +1,69 @@
+"""
+Compare substring name search through the unindexed ILIKE with the
+database's trigram backend.
+
+    python -m benchmarks.name_search --users 1000000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from app import create_app
+from app.models import User, db
+from app.search import NAME_SEARCH_BACKENDS, get_name_search
+from benchmarks.synthetic import populate
+
+TERMS = ["4242", "McKenzie 1234", "ricardo wright", "Tamara Scott 99"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app(
+        config_overrides={
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            "UPLOAD_FOLDER": tempfile.gettempdir(),
+        }
+    )
+
+    try:
+        with app.app_context():
+            db.create_all()
+            populate(args.users, seed=args.seed)
+
+            backends = {"like": NAME_SEARCH_BACKENDS["like"]()}
+            indexed = get_name_search()
+            backends[indexed.name] = indexed
+
+            results = {}
+            for name, backend in backends.items():
+                timings = {}
+                for term in TERMS:
+                    query = select(User.id).where(backend.filter(term))
+                    start = time.perf_counter()
+                    for _ in range(args.repeat):
+                        found = len(db.session.scalars(query).all())
+                    timings[term] = {
+                        "users": found,
+                        "ms": (time.perf_counter() - start) * 1000 / args.repeat,
+                    }
+                results[name] = timings
+
+            print(json.dumps({"users": args.users, **results}, indent=2))
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    main()
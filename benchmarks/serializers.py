@@ -0,0 +1,139 @@
+"""
+Compare serializing profiles through ProfileWithUserSchema with the per-shape
+serializers used by the profile routes, and reading them as ORM instances
+with reading them as column tuples.
+
+    python -m benchmarks.serializers --profiles 500 --repeat 50
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, load_only
+
+from app import create_app
+from app.models import Profile, User, db
+from app.schemas import ProfileWithUserSchema
+from app.serializers import profile_column, profile_reader, profile_serializer
+from benchmarks.synthetic import populate
+
+# Response shapes: all fields, and a typical `fields=` selection
+SHAPES = {
+    "all": None,
+    "card": ("id", "parish", "birth_year", "height", "user"),
+}
+
+
+def marshmallow_dump(profiles, profile_fields):
+    """
+    The serialization path the routes used before per-shape serializers
+
+    The profile is copied into a dict first, so the schema reads `user_id_fk`
+    from the dict, where it is missing, and always dumped `user_id` as None.
+    """
+    profile_schema = ProfileWithUserSchema(many=True, only=profile_fields)
+    return profile_schema.dump(
+        [
+            {
+                **profile.to_dict(profile_fields),
+                "user": {
+                    "id": profile.user.id,
+                    "name": profile.user.name,
+                    "photo": profile.user.photo,
+                },
+            }
+            for profile in profiles
+        ]
+    )
+
+
+def shape_dump(profiles, profile_fields):
+    serialize = profile_serializer(profile_fields)
+    return [serialize(profile) for profile in profiles]
+
+
+def orm_read(profile_fields):
+    """
+    Load and serialize the profiles as Profile and User instances, loading
+    only the selected columns as the routes did before reading column tuples
+    """
+    db.session.expunge_all()
+    options = [joinedload(Profile.user)]
+    if profile_fields is not None:
+        columns = {"id", "user_id_fk"} | {
+            profile_column(field) for field in profile_fields if field != "user"
+        }
+        options = [
+            load_only(*[getattr(Profile, column) for column in columns]),
+            joinedload(Profile.user).load_only(User.id, User.name, User.photo),
+        ]
+    profiles = db.session.scalars(select(Profile).options(*options)).all()
+    return shape_dump(profiles, profile_fields)
+
+
+def row_read(profile_fields):
+    """Select and serialize the columns of the profiles, without the ORM"""
+    reader = profile_reader(profile_fields)
+    return reader.serialize(db.session.execute(reader.select()).all())
+
+
+def timed(function, repeat, *args):
+    """Return the average milliseconds of a call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app(
+        config_overrides={
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            "UPLOAD_FOLDER": tempfile.gettempdir(),
+        }
+    )
+
+    try:
+        with app.app_context():
+            db.create_all()
+            populate(args.profiles, seed=args.seed)
+            profiles = db.session.scalars(
+                select(Profile).options(joinedload(Profile.user))
+            ).all()
+
+            results = {}
+            for shape, profile_fields in SHAPES.items():
+                timings = {
+                    "marshmallow": timed(
+                        marshmallow_dump, args.repeat, profiles, profile_fields
+                    ),
+                    "per_shape": timed(
+                        shape_dump, args.repeat, profiles, profile_fields
+                    ),
+                    "orm_read": timed(orm_read, args.repeat, profile_fields),
+                    "row_read": timed(row_read, args.repeat, profile_fields),
+                }
+                timings["speedup"] = timings["marshmallow"] / timings["per_shape"]
+                timings["read_speedup"] = timings["orm_read"] / timings["row_read"]
+                results[shape] = timings
+
+            print(json.dumps({"profiles": len(profiles), **results}, indent=2))
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    main()
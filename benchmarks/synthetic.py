@@ -0,0 +1,229 @@
+import random
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app.models import Favourite, Profile, User, db, encode_lookup_fields
+
+PARISHES = [
+    "Kingston",
+    "St. Andrew",
+    "St. Catherine",
+    "Clarendon",
+    "Manchester",
+    "St. Elizabeth",
+    "Westmoreland",
+    "Hanover",
+    "St. James",
+    "Trelawny",
+    "St. Ann",
+    "St. Mary",
+    "Portland",
+    "St. Thomas",
+]
+RACES = ["Black", "Mixed", "Indian", "Chinese", "White", "Other"]
+CUISINES = ["Jamaican", "Italian", "Chinese", "Japanese", "Indian", "Mexican"]
+COLOURS = ["Blue", "Red", "Green", "Black", "Yellow", "Purple", "White"]
+SUBJECTS = ["Mathematics", "English", "Science", "History", "Art", "Geography"]
+# Interests are drawn with Zipf weights, so text search terms range from
+# very common to rare, like words in real profiles
+INTERESTS = [
+    "cooking",
+    "music",
+    "church",
+    "football",
+    "movies",
+    "reading",
+    "travel",
+    "dancing",
+    "fitness",
+    "cricket",
+    "beaches",
+    "gardening",
+    "swimming",
+    "hiking",
+    "photography",
+    "painting",
+    "gaming",
+    "volunteering",
+    "fishing",
+    "poetry",
+    "karaoke",
+    "yoga",
+    "baking",
+    "netball",
+    "chess",
+    "cycling",
+    "camping",
+    "sailing",
+    "pottery",
+    "astronomy",
+    "snorkelling",
+    "birdwatching",
+    "calligraphy",
+    "beekeeping",
+    "fencing",
+    "origami",
+    "archery",
+    "taxidermy",
+    "falconry",
+    "bobsledding",
+]
+INTEREST_WEIGHTS = [1 / rank for rank in range(1, len(INTERESTS) + 1)]
+FIRST_NAMES = [
+    "Aaliyah",
+    "Andre",
+    "Brianna",
+    "Carlton",
+    "Danielle",
+    "Dwayne",
+    "Jada",
+    "Jermaine",
+    "Kimberly",
+    "Kevin",
+    "Latoya",
+    "Marlon",
+    "Nadine",
+    "Omar",
+    "Shanice",
+    "Tyrone",
+    "Monique",
+    "Ricardo",
+    "Tamara",
+    "Xavier",
+]
+LAST_NAMES = [
+    "Brown",
+    "Campbell",
+    "Clarke",
+    "Francis",
+    "Gordon",
+    "Grant",
+    "Henry",
+    "Johnson",
+    "Lewis",
+    "McKenzie",
+    "Morgan",
+    "Reid",
+    "Robinson",
+    "Scott",
+    "Smith",
+    "Thomas",
+    "Walker",
+    "Williams",
+    "Wilson",
+    "Wright",
+]
+
+
+def random_interests(rng, count):
+    """Draw interests, common ones more often than rare ones"""
+    return rng.choices(INTERESTS, weights=INTEREST_WEIGHTS, k=count)
+
+
+def synthetic_biography(rng):
+    """Build a biography of a few sentences about random interests"""
+    return " ".join(
+        "I spend my weekends on {} and I am learning {}.".format(
+            *random_interests(rng, 2)
+        )
+        for _ in range(rng.randint(1, 10))
+    )
+
+
+def synthetic_profile(rng, user_id):
+    """Build the column values of one random profile"""
+    current_year = datetime.now(timezone.utc).year
+    birth_year = int(rng.gauss(current_year - 32, 9))
+    return {
+        "user_id_fk": user_id,
+        "description": "Enjoys {} and {}".format(*random_interests(rng, 2)),
+        "parish": rng.choice(PARISHES),
+        "biography": synthetic_biography(rng),
+        "sex": rng.choice(["Male", "Female"]),
+        "race": rng.choice(RACES),
+        "birth_year": min(max(birth_year, 1940), current_year - 18),
+        "height": round(rng.gauss(170, 10), 1),
+        "fav_cuisine": rng.choice(CUISINES),
+        "fav_colour": rng.choice(COLOURS),
+        "fav_school_subject": rng.choice(SUBJECTS),
+        "political": rng.random() < 0.4,
+        "religious": rng.random() < 0.6,
+        "family_oriented": rng.random() < 0.7,
+    }
+
+
+def populate(size, seed=0, batch_size=5000):
+    """
+    Bulk insert a synthetic population of users with one profile each
+
+    Args:
+        size (int): Number of users and profiles to create
+        seed (int): Seed for the random generator
+        batch_size (int): Rows per INSERT batch
+    """
+    rng = random.Random(seed)
+    # Hashing is deliberately slow, so every synthetic user shares one hash
+    password = generate_password_hash("password123")
+
+    for start in range(1, size + 1, batch_size):
+        user_ids = range(start, min(start + batch_size, size + 1))
+        db.session.execute(
+            insert(User),
+            [
+                {
+                    "id": user_id,
+                    "username": f"user{user_id}",
+                    "password": password,
+                    "name": (
+                        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} "
+                        f"{user_id}"
+                    ),
+                    "email": f"user{user_id}@example.com",
+                    "photo": None,
+                }
+                for user_id in user_ids
+            ],
+        )
+        db.session.execute(
+            insert(Profile),
+            [
+                encode_lookup_fields(synthetic_profile(rng, user_id))
+                for user_id in user_ids
+            ],
+        )
+        db.session.commit()
+
+
+def populate_favourites(size, per_user=5, seed=0, batch_size=5000):
+    """
+    Bulk insert favourites from every synthetic user
+
+    Popularity follows a power law, so a few profiles collect most of the
+    favourites as they would in a real deployment.
+
+    Args:
+        size (int): Number of users and profiles created by populate()
+        per_user (int): Maximum number of favourites per user
+        seed (int): Seed for the random generator
+        batch_size (int): Users per INSERT batch
+    """
+    rng = random.Random(seed)
+
+    for start in range(1, size + 1, batch_size):
+        rows = []
+        for user_id in range(start, min(start + batch_size, size + 1)):
+            favourites = set()
+            for _ in range(rng.randint(0, per_user)):
+                profile_id = min(int(rng.paretovariate(0.6)), size)
+                if profile_id != user_id:
+                    favourites.add(profile_id)
+            rows.extend(
+                {"user_id_fk": user_id, "fav_profile_id_fk": profile_id}
+                for profile_id in favourites
+            )
+
+        if rows:
+            db.session.execute(insert(Favourite), rows)
+        db.session.commit()
@@ -0,0 +1,103 @@
+"""
+Compare ranked full-text search over profile descriptions and biographies
+through the unindexed ILIKE with the database's full-text backend.
+
+    python -m benchmarks.text_search --profiles 1000000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from app import create_app
+from app.models import Profile, db
+from app.search import TEXT_SEARCH_BACKENDS, get_text_search, sort_search
+from benchmarks.synthetic import populate
+
+# From the most common synthetic interest to rare ones and a rare pair
+TERMS = ["cooking", "poetry", "falconry", "chess origami", "weekends"]
+
+
+def time_query(query, repeat):
+    """Run a query `repeat` times and return (rows, milliseconds per run)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = db.session.execute(query).all()
+    return rows, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app(
+        config_overrides={
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            "UPLOAD_FOLDER": tempfile.gettempdir(),
+        }
+    )
+
+    try:
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            populate(args.profiles, seed=args.seed)
+            populate_seconds = time.perf_counter() - start
+
+            backends = {"like": TEXT_SEARCH_BACKENDS["like"]()}
+            indexed = get_text_search()
+            backends[indexed.name] = indexed
+
+            results = {}
+            for name, backend in backends.items():
+                timings = {}
+                for term in TERMS:
+                    matches = select(Profile.id).where(backend.filter(term))
+                    (count,), count_ms = time_query(
+                        select(func.count()).select_from(matches.subquery()),
+                        args.repeat,
+                    )
+                    ranked, relevance = backend.rank(select(Profile.id), term)
+                    top, top_ms = time_query(
+                        sort_search(
+                            ranked.add_columns(relevance),
+                            "relevance",
+                            args.limit,
+                            relevance=relevance,
+                        ),
+                        args.repeat,
+                    )
+                    timings[term] = {
+                        "profiles": count[0],
+                        "count_ms": count_ms,
+                        "top_ms": top_ms,
+                        "top_ids": [row[0] for row in top[:5]],
+                    }
+                results[name] = timings
+
+            print(
+                json.dumps(
+                    {
+                        "profiles": args.profiles,
+                        "populate_seconds": populate_seconds,
+                        **results,
+                    },
+                    indent=2,
+                )
+            )
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    main()
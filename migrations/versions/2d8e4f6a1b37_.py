@@ -0,0 +1,61 @@
+"""add full-text search indexes on profile descriptions and biographies
+
+Revision ID: 2d8e4f6a1b37
+Revises: 7a3c5e9b2d14
+Create Date: 2026-10-17 18:05:33.904127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d8e4f6a1b37'
+down_revision = '7a3c5e9b2d14'
+branch_labels = None
+depends_on = None
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE profiles_text_fts USING fts5("
+    "description, biography, content='profiles', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER profiles_text_fts_ai AFTER INSERT ON profiles BEGIN "
+    "INSERT INTO profiles_text_fts(rowid, description, biography) "
+    "VALUES (new.id, new.description, new.biography); END",
+    "CREATE TRIGGER profiles_text_fts_ad AFTER DELETE ON profiles BEGIN "
+    "INSERT INTO profiles_text_fts(profiles_text_fts, rowid, description, biography) "
+    "VALUES ('delete', old.id, old.description, old.biography); END",
+    "CREATE TRIGGER profiles_text_fts_au AFTER UPDATE OF description, biography "
+    "ON profiles BEGIN "
+    "INSERT INTO profiles_text_fts(profiles_text_fts, rowid, description, biography) "
+    "VALUES ('delete', old.id, old.description, old.biography); "
+    "INSERT INTO profiles_text_fts(rowid, description, biography) "
+    "VALUES (new.id, new.description, new.biography); END",
+    # Index the profiles that already exist
+    "INSERT INTO profiles_text_fts(profiles_text_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'ix_profiles_text_search', 'profiles',
+                [sa.text("to_tsvector('english', description || ' ' || biography)")],
+                unique=False, postgresql_using='gin', postgresql_concurrently=True,
+            )
+    elif dialect == 'sqlite':
+        for statement in SQLITE_FTS:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_profiles_text_search', table_name='profiles', postgresql_concurrently=True)
+    elif dialect == 'sqlite':
+        for trigger in ('profiles_text_fts_ai', 'profiles_text_fts_ad', 'profiles_text_fts_au'):
+            op.execute(f'DROP TRIGGER {trigger}')
+        op.execute('DROP TABLE profiles_text_fts')
@@ -0,0 +1,107 @@
+"""dictionary-encode categorical profile columns into lookup tables
+
+Revision ID: 4b9d1f3c7a26
+Revises: 2d8e4f6a1b37
+Create Date: 2026-10-17 20:12:47.118395
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b9d1f3c7a26'
+down_revision = '2d8e4f6a1b37'
+branch_labels = None
+depends_on = None
+
+# (lookup table, profile column, value length)
+LOOKUPS = [
+    ('sexes', 'sex', 20),
+    ('races', 'race', 100),
+    ('parishes', 'parish', 100),
+    ('cuisines', 'fav_cuisine', 100),
+    ('colours', 'fav_colour', 50),
+    ('school_subjects', 'fav_school_subject', 100),
+]
+
+# SQLite rebuilds the profiles table to alter it, which drops its triggers
+SQLITE_TEXT_FTS_TRIGGERS = [
+    "CREATE TRIGGER profiles_text_fts_ai AFTER INSERT ON profiles BEGIN "
+    "INSERT INTO profiles_text_fts(rowid, description, biography) "
+    "VALUES (new.id, new.description, new.biography); END",
+    "CREATE TRIGGER profiles_text_fts_ad AFTER DELETE ON profiles BEGIN "
+    "INSERT INTO profiles_text_fts(profiles_text_fts, rowid, description, biography) "
+    "VALUES ('delete', old.id, old.description, old.biography); END",
+    "CREATE TRIGGER profiles_text_fts_au AFTER UPDATE OF description, biography "
+    "ON profiles BEGIN "
+    "INSERT INTO profiles_text_fts(profiles_text_fts, rowid, description, biography) "
+    "VALUES ('delete', old.id, old.description, old.biography); "
+    "INSERT INTO profiles_text_fts(rowid, description, biography) "
+    "VALUES (new.id, new.description, new.biography); END",
+]
+
+
+def _recreate_sqlite_triggers():
+    if op.get_context().dialect.name == 'sqlite':
+        for statement in SQLITE_TEXT_FTS_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    for table, column, length in LOOKUPS:
+        op.create_table(table,
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.String(length=length), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('value')
+        )
+        # Backfill the distinct values already in use
+        op.execute(
+            f'INSERT INTO {table} (value) '
+            f'SELECT DISTINCT {column} FROM profiles ORDER BY {column}'
+        )
+
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        for table, column, length in LOOKUPS:
+            batch_op.add_column(sa.Column(f'{column}_id', sa.Integer(), nullable=True))
+
+    # One UPDATE, so every profile row is rewritten once
+    op.execute('UPDATE profiles SET ' + ', '.join(
+        f'{column}_id = (SELECT id FROM {table} WHERE {table}.value = profiles.{column})'
+        for table, column, length in LOOKUPS
+    ))
+
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        batch_op.drop_index('ix_profiles_sex_race_birth_year')
+        for table, column, length in LOOKUPS:
+            batch_op.alter_column(f'{column}_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.create_foreign_key(f'profiles_{column}_id_fkey', table, [f'{column}_id'], ['id'])
+            batch_op.drop_column(column)
+        batch_op.create_index('ix_profiles_sex_race_birth_year', ['sex_id', 'race_id', 'birth_year'], unique=False)
+
+    _recreate_sqlite_triggers()
+
+
+def downgrade():
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        for table, column, length in LOOKUPS:
+            batch_op.add_column(sa.Column(column, sa.String(length=length), nullable=True))
+
+    op.execute('UPDATE profiles SET ' + ', '.join(
+        f'{column} = (SELECT value FROM {table} WHERE {table}.id = profiles.{column}_id)'
+        for table, column, length in LOOKUPS
+    ))
+
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        batch_op.drop_index('ix_profiles_sex_race_birth_year')
+        for table, column, length in LOOKUPS:
+            batch_op.alter_column(column, existing_type=sa.String(length=length), nullable=False)
+            batch_op.drop_constraint(f'profiles_{column}_id_fkey', type_='foreignkey')
+            batch_op.drop_column(f'{column}_id')
+        batch_op.create_index('ix_profiles_sex_race_birth_year', ['sex', 'race', 'birth_year'], unique=False)
+
+    for table, column, length in LOOKUPS:
+        op.drop_table(table)
+
+    _recreate_sqlite_triggers()
@@ -0,0 +1,38 @@
+"""add indexes for hot profile and favourite queries
+
+Revision ID: 5e7b0f3a9c61
+Revises: 8f2a6c4d1e53
+Create Date: 2026-10-17 13:05:47.220931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7b0f3a9c61'
+down_revision = '8f2a6c4d1e53'
+branch_labels = None
+depends_on = None
+
+# favourites.user_id_fk is already the leading column of unique_favourite
+INDEXES = [
+    ('ix_profiles_user_id_fk', 'profiles', ['user_id_fk']),
+    ('ix_profiles_birth_year_height', 'profiles', ['birth_year', 'height']),
+    ('ix_profiles_sex_race_birth_year', 'profiles', ['sex', 'race', 'birth_year']),
+    ('ix_favourites_fav_profile_id_fk', 'favourites', ['fav_profile_id_fk']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction on PostgreSQL,
+    # but avoids locking the tables against writes while the indexes build
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
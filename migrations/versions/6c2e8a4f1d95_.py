@@ -0,0 +1,43 @@
+"""add indexes for the age and height search sorts
+
+Revision ID: 6c2e8a4f1d95
+Revises: 4b9d1f3c7a26
+Create Date: 2026-10-17 21:34:08.516207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2e8a4f1d95'
+down_revision = '4b9d1f3c7a26'
+branch_labels = None
+depends_on = None
+
+# The profile ID makes each index match its keyset sort, so pages are read in
+# index order instead of being sorted
+INDEXES = [
+    ('ix_profiles_birth_year_id', 'profiles', ['birth_year', 'id']),
+    ('ix_profiles_height_id', 'profiles', ['height', 'id']),
+]
+# The match window is a range of birth years, which ix_profiles_birth_year_id
+# serves as well. Keeping both leaves SQLite, without table statistics, to
+# pick one of them by creation order.
+REPLACED_INDEX = ('ix_profiles_birth_year_height', 'profiles', ['birth_year', 'height'])
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+        name, table, _ = REPLACED_INDEX
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        name, table, columns = REPLACED_INDEX
+        op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,58 @@
+"""add trigram name search indexes
+
+Revision ID: 7a3c5e9b2d14
+Revises: 5e7b0f3a9c61
+Create Date: 2026-10-17 15:42:10.518304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3c5e9b2d14'
+down_revision = '5e7b0f3a9c61'
+branch_labels = None
+depends_on = None
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE users_name_fts USING fts5("
+    "name, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER users_name_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_name_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER users_name_fts_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_name_fts(users_name_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER users_name_fts_au AFTER UPDATE OF name ON users BEGIN "
+    "INSERT INTO users_name_fts(users_name_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); "
+    "INSERT INTO users_name_fts(rowid, name) VALUES (new.id, new.name); END",
+    # Index the users that already exist
+    "INSERT INTO users_name_fts(users_name_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'ix_users_name_trgm', 'users', ['name'], unique=False,
+                postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+            )
+    elif dialect == 'sqlite':
+        for statement in SQLITE_FTS:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_users_name_trgm', table_name='users', postgresql_concurrently=True)
+    elif dialect == 'sqlite':
+        for trigger in ('users_name_fts_ai', 'users_name_fts_ad', 'users_name_fts_au'):
+            op.execute(f'DROP TRIGGER {trigger}')
+        op.execute('DROP TABLE users_name_fts')
@@ -1,4 +1,4 @@
-import type { ApiResponse, CreateFavouriteDto, Favourite, Profile, ProfileDto, ProfileSearchParams, User } from './api.types';
+import type { ApiResponse, CreateFavouriteDto, Favourite, Profile, ProfileDto, ProfileSearchParams, ProfileSearchParamsDto, SearchFacets, User } from './api.types';
 
 import { API_URL } from '@/constants';
 import axios from 'axios';
@@ -60,3 +60,11 @@ export const searchProfiles = async (searchParams?: ProfileSearchParams) => {
 	});
 	return response.data;
 };
+
+// Counts per sex, race, parish and birth decade for a set of search filters
+export const getSearchFacets = async (searchParams?: ProfileSearchParamsDto) => {
+	const response = await axios.get<ApiResponse<SearchFacets>>(`${API_URL}/search/facets`, {
+		params: searchParams,
+	});
+	return response.data;
+};
@@ -109,6 +109,33 @@ export interface ApiResponse<T> {
 	message?: string;
 	data?: T;
 	errors?: Record<string, string[]>;
+	meta?: PageMeta;
+}
+
+// Keyset pagination details for list endpoints
+export interface PageMeta {
+	limit: number | null;
+	next_cursor: string | null;
+	sort?: SearchSort;
+	total_estimate?: number;
+	total_exact?: boolean;
+}
+
+// 'relevance' is the default, and only valid, with a text query.
+// 'age' lists the youngest first, 'height' the shortest first.
+export type SearchSort = 'id' | 'newest' | 'age' | 'height' | 'relevance';
+
+// Facet counts returned by /search/facets, most frequent value first
+export interface FacetCount<T> {
+	value: T;
+	count: number;
+}
+
+export interface SearchFacets {
+	sex: FacetCount<string>[];
+	race: FacetCount<string>[];
+	parish: FacetCount<string>[];
+	birth_decade: FacetCount<number>[];
 }
 
 export interface AuthResponse {
@@ -123,5 +150,17 @@ export interface ProfileSearchParams {
 	birth_year?: number;
 	sex?: string;
 	race?: string;
+	// Inclusive ranges, heights in cm
+	min_age?: number;
+	max_age?: number;
+	min_height?: number;
+	max_height?: number;
+	// Words to find in descriptions and biographies
+	q?: string;
 	limit?: number;
+	cursor?: string;
+	sort?: SearchSort;
+	count?: boolean;
+	// Comma separated profile fields to return, e.g. 'id,parish,user'
+	fields?: string;
 }